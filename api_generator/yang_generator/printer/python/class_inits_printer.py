@@ -50,6 +50,39 @@ def get_child_classes(clazz, one_class_per_module):
     return '%s' % (', '.join(m))
 
 
+def get_leaf_yang_name(clazz, prop):
+    yname = prop.stmt.arg
+    if all((prop.stmt.top.arg != clazz.stmt.top.arg,
+            hasattr(prop.stmt.top, 'i_aug_targets') and
+            clazz.stmt.top in prop.stmt.top.i_aug_targets)):
+        yname = ':'.join([prop.stmt.top.arg, prop.stmt.arg])
+    return yname
+
+
+def get_type_name(prop_type):
+    if prop_type.name == 'string':
+        return 'str'
+    elif prop_type.name == 'leafref':
+        return 'str'
+    elif prop_type.name == 'decimal64':
+        return 'str'
+    elif prop_type.name == 'union':
+        return 'str'
+    elif prop_type.name == 'binary':
+        return 'str'
+    elif prop_type.name == 'instance-identifier':
+        return 'str'
+    elif isinstance(prop_type, Bits):
+        return 'bits'
+    elif isinstance(prop_type, Class) and prop_type.is_identity():
+        return 'identityref'
+    elif isinstance(prop_type, Enum):
+        return 'enumeration'
+    elif isinstance(prop_type, DataType):
+        return 'str'
+    return prop_type.name
+
+
 class ClassInitsPrinter(object):
 
     def __init__(self, ctx, module_namespace_lookup, one_class_per_module, identity_subclasses):
@@ -121,11 +154,7 @@ class ClassInitsPrinter(object):
             elif isinstance(prop.property_type, Bits):
                 declaration_stmt =  'self.%s = Bits()' % leaf_name
 
-            yname = prop.stmt.arg
-            if all((prop.stmt.top.arg != clazz.stmt.top.arg,
-                    hasattr(prop.stmt.top, 'i_aug_targets') and
-                    clazz.stmt.top in prop.stmt.top.i_aug_targets)):
-                yname = ':'.join([prop.stmt.top.arg, prop.stmt.arg])
+            yname = get_leaf_yang_name(clazz, prop)
 
             ptypes = get_ptypes(prop, prop.property_type, prop.stmt.search_one('type'), self.one_class_per_module,
                                 self.identity_subclasses)
@@ -191,27 +220,7 @@ class ClassInitsPrinter(object):
         self.ctx.bline()
 
     def _get_type_name(self, prop_type):
-        if prop_type.name == 'string':
-            return 'str'
-        elif prop_type.name == 'leafref':
-            return 'str'
-        elif prop_type.name == 'decimal64':
-            return 'str'
-        elif prop_type.name == 'union':
-            return 'str'
-        elif prop_type.name == 'binary':
-            return 'str'
-        elif prop_type.name == 'instance-identifier':
-            return 'str'
-        elif isinstance(prop_type, Bits):
-            return 'bits'
-        elif isinstance(prop_type, Class) and prop_type.is_identity():
-            return 'identityref'
-        elif isinstance(prop_type, Enum):
-            return 'enumeration'
-        elif isinstance(prop_type, DataType):
-            return 'str'
-        return prop_type.name
+        return get_type_name(prop_type)
 
 
 class ClassSetAttrPrinter(object):
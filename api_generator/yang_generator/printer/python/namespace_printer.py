@@ -2,13 +2,33 @@
  namespace_printer.py
 
  Print capabilities for bundle package.
+
+ ENTITY_LOOKUP and IDENTITY_LOOKUP are printed into one shard module per YANG module
+ (_yang_ns_shards/<module>.py), which are loaded lazily by the tables in _yang_ns.py.
 """
 
+from collections import OrderedDict
+
 from yang_generator.printer.file_printer import FilePrinter
-from yang_generator.api_model import get_property_name, Class
+from yang_generator.api_model import get_property_name, snake_case, Class
 from yang_generator.common import get_module_name
 
 
+def get_yang_ns_shards(packages, bundle_name):
+    """
+    Returns OrderedDict{module_name: (shard_name, [packages])}
+    """
+    shards = OrderedDict()
+    for p in packages:
+        if p.bundle_name != bundle_name:
+            continue
+        module_name = get_module_name(p.stmt)
+        if module_name not in shards:
+            shards[module_name] = (snake_case(module_name), [])
+        shards[module_name][1].append(p)
+    return shards
+
+
 class NamespacePrinter(FilePrinter):
     def __init__(self, ctx, one_class_per_module):
         super().__init__(ctx)
@@ -18,10 +38,16 @@ class NamespacePrinter(FilePrinter):
 
     def print_output(self, packages, bundle_name):
         self.packages = packages = [p for p in packages if p.bundle_name == bundle_name]
+        self._print_imports()
         self._print_bundle_name(bundle_name)
         self._print_capabilities(packages)
-        self._print_entity_lookup(packages)
         self._print_namespace_lookup(packages)
+        self._print_namespace_prefix_lookup(packages)
+        self._print_shards(get_yang_ns_shards(packages, bundle_name))
+        self._print_sharded_lookups()
+
+    def print_shard_output(self, packages):
+        self._print_entity_lookup(packages)
         self._print_identity_lookup(packages)
 
     def _get_imports(self, packages):
@@ -32,6 +58,10 @@ class NamespacePrinter(FilePrinter):
                     imports.add(e.get_py_mod_name())
         return imports
 
+    def _print_imports(self):
+        self.ctx.writeln('from yangkit.utilities.yang_ns import EntityLookup, IdentityLookup')
+        self.ctx.bline()
+
     def _print_bundle_name(self, bundle_name):
         self.ctx.writeln('BUNDLE_NAME = "{}"'.format(bundle_name))
         self.ctx.bline()
@@ -87,6 +117,34 @@ class NamespacePrinter(FilePrinter):
         self.ctx.writeln('}')
         self.ctx.bline()
 
+    def _print_namespace_prefix_lookup(self, packages):
+        self.ctx.writeln('NAMESPACE_PREFIX_LOOKUP = {')
+        self.ctx.lvl_inc()
+        for p in packages:
+            ns = p.stmt.search_one('namespace')
+            # submodule
+            if ns is None:
+                continue
+            self.ctx.writeln('"{}": "{}",'.format(ns.arg, p.stmt.arg))
+        self.ctx.lvl_dec()
+        self.ctx.writeln('}')
+        self.ctx.bline()
+
+    def _print_shards(self, shards):
+        self.ctx.writeln('_SHARDS = {')
+        self.ctx.lvl_inc()
+        for module_name, (shard_name, _) in shards.items():
+            self.ctx.writeln('"{}": "{}",'.format(module_name, shard_name))
+        self.ctx.lvl_dec()
+        self.ctx.writeln('}')
+        self.ctx.bline()
+
+    def _print_sharded_lookups(self):
+        self.ctx.writeln('ENTITY_LOOKUP = EntityLookup(__package__, "ENTITY_LOOKUP", _SHARDS, NAMESPACE_PREFIX_LOOKUP)')
+        self.ctx.bline()
+        self.ctx.writeln('IDENTITY_LOOKUP = IdentityLookup(__package__, "IDENTITY_LOOKUP", _SHARDS, NAMESPACE_PREFIX_LOOKUP)')
+        self.ctx.bline()
+
     def _print_identity_lookup(self, packages):
         packages = sorted(packages, key=lambda p: p.name)
 
@@ -11,7 +11,8 @@ from yang_generator.common import get_rst_file_name
 
 from .import_test_printer import ImportTestPrinter
 from .module_printer import ModulePrinter
-from .namespace_printer import NamespacePrinter
+from .namespace_printer import NamespacePrinter, get_yang_ns_shards
+from .schema_index_printer import SchemaIndexPrinter
 from .init_file_printer import InitPrinter
 from ..doc import DocPrinter
 from yang_generator.printer.language_bindings_printer import LanguageBindingsPrinter, _EmitArgs
@@ -33,6 +34,7 @@ class PythonBindingsPrinter(LanguageBindingsPrinter):
     def print_files(self):
         self._print_init_file(self.models_dir)
         self._print_yang_ns_file()
+        self._print_schema_index_file()
         self._print_modules()
         self._print_import_tests_file()
 
@@ -89,6 +91,18 @@ class PythonBindingsPrinter(LanguageBindingsPrinter):
                         emit_yang_ns,
                         _EmitArgs(self.ypy_ctx, packages, (self.bundle_name, False)))
 
+        shards_dir = get_yang_ns_shards_dir_name(self.models_dir)
+        self.initialize_output_directory(shards_dir, True)
+        self._print_init_file(shards_dir)
+        for shard_name, shard_packages in get_yang_ns_shards(packages, self.bundle_name).values():
+            self.print_file(get_yang_ns_shard_file_name(shards_dir, shard_name),
+                            emit_yang_ns_shard,
+                            _EmitArgs(self.ypy_ctx, shard_packages, False))
+
+    def _print_schema_index_file(self):
+        SchemaIndexPrinter(self.module_namespace_lookup).print_output(
+            self.packages, self.bundle_name, get_schema_index_file_name(self.models_dir))
+
     def _print_import_tests_file(self):
         self.print_file(get_import_test_file_name(self.test_dir),
                         emit_importests,
@@ -135,6 +149,18 @@ def get_yang_ns_file_name(path):
     return path + '/_yang_ns.py'
 
 
+def get_yang_ns_shards_dir_name(path):
+    return path + '/_yang_ns_shards'
+
+
+def get_yang_ns_shard_file_name(path, shard_name):
+    return '%s/%s.py' % (path, shard_name)
+
+
+def get_schema_index_file_name(path):
+    return path + '/_schema_index.marshal'
+
+
 def get_import_test_file_name(path):
     return path + '/import_tests.py'
 
@@ -168,6 +194,10 @@ def emit_yang_ns(ctx, packages, extra_args):
     NamespacePrinter(ctx, one_class_per_module).print_output(packages, bundle_name)
 
 
+def emit_yang_ns_shard(ctx, packages, one_class_per_module):
+    NamespacePrinter(ctx, one_class_per_module).print_shard_output(packages)
+
+
 def emit_importests(ctx, packages):
     ImportTestPrinter(ctx).print_import_tests(packages)
 
@@ -0,0 +1,71 @@
+"""
+ schema_index_printer.py
+
+ Print compiled schema index for bundle package.
+"""
+
+import marshal
+
+from yang_generator.api_model import Class
+from yang_generator.common import get_module_name, get_qualified_yang_name
+from .class_inits_printer import get_leaf_yang_name, get_type_name
+
+SCHEMA_INDEX_VERSION = 1
+
+
+class SchemaIndexPrinter(object):
+    """
+    Prints the schema index of a bundle as a marshal'd dict.
+
+    The index maps every schema path (segment paths without key predicates, e.g.
+    "test-if:interfaces/interface/counters") to a tuple:
+        (python module, class qualified name, yang keyword, module name, namespace,
+         key yang names, {leaf yang name: (attribute, ytype, is_leaf_list)}, child segment names)
+    """
+
+    def __init__(self, module_namespace_lookup):
+        self.module_namespace_lookup = module_namespace_lookup
+        self.nodes = {}
+
+    def print_output(self, packages, bundle_name, file_name):
+        packages = [p for p in packages if p.bundle_name == bundle_name]
+        for package in packages:
+            for clazz in _get_data_classes(package):
+                self._add_node('%s:%s' % (package.stmt.arg, clazz.stmt.arg), clazz)
+
+        schema_index = {
+            'version': SCHEMA_INDEX_VERSION,
+            'bundle_name': bundle_name,
+            'nodes': self.nodes,
+        }
+        with open(file_name, 'wb') as file_descriptor:
+            marshal.dump(schema_index, file_descriptor)
+
+    def _add_node(self, path, clazz):
+        leafs = {}
+        children = []
+        for prop in clazz.properties():
+            ptype = prop.property_type
+            if isinstance(ptype, Class) and not ptype.is_identity():
+                child_name = get_qualified_yang_name(ptype)
+                children.append(child_name)
+                self._add_node('%s/%s' % (path, child_name), ptype)
+            elif ptype is not None:
+                ytype = 'str' if prop.stmt.keyword == 'anyxml' else get_type_name(ptype)
+                leafs[get_leaf_yang_name(clazz, prop)] = (prop.name, ytype, bool(prop.is_many))
+
+        module_name = get_module_name(clazz.stmt)
+        self.nodes[path] = (
+            clazz.get_py_mod_name(),
+            clazz.qn(),
+            clazz.stmt.keyword,
+            module_name,
+            self.module_namespace_lookup.get(module_name, ''),
+            tuple(key.stmt.arg for key in clazz.get_key_props()),
+            leafs,
+            tuple(children),
+        )
+
+
+def _get_data_classes(package):
+    return [e for e in package.owned_elements if isinstance(e, Class) and not e.is_identity()]
@@ -16,5 +16,6 @@ setup(
     author_email='cafy-support@cisco.com',
     url='https://github.com/yang-infra/yangkit',
     install_requires=INSTALL_REQUIREMENTS,
+    extras_require={'orjson': ['orjson']},
     packages=find_packages()
 )
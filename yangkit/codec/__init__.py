@@ -1,3 +1,7 @@
 from .codec import Codec
+from .async_codec import AsyncCodec
+from .subtree_filter import SubtreeFilter
+from .projection import Projection
+from .telemetry import TelemetryIngestor, TelemetryStats
 
-__all__ = ["Codec"]
+__all__ = ["Codec", "AsyncCodec", "SubtreeFilter", "Projection", "TelemetryIngestor", "TelemetryStats"]
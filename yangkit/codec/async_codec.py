@@ -0,0 +1,161 @@
+import asyncio
+import weakref
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from yangkit.utilities.logger import log
+from yangkit.errors import YInvalidArgumentError
+from .codec import Codec
+
+# jobs submitted to the pool at once by an AsyncCodec, by default
+DEFAULT_MAX_IN_FLIGHT = 64
+
+
+class AsyncCodec(object):
+    """
+    asyncio interface of Codec: encodes and decodes run on a pool of threads or processes, so that
+    the event loop keeps serving other devices meanwhile.
+
+    At most max_in_flight jobs of an event loop are submitted to the pool at once; the coroutines of the other
+    jobs wait for a slot, which gives backpressure to producers and keeps the pool queue short. Cancelling
+    a coroutine (e.g. with asyncio.wait_for) cancels its job if it has not started; a running job cannot be
+    interrupted, its result is dropped and its slot is released when it ends.
+
+    Worker processes run the decoders in parallel, at the cost of pickling the payloads and the entities
+    (see Entity.__getstate__); threads share the entities but decode one at a time, as the decoders hold the GIL.
+
+    Example:
+        async with AsyncCodec(workers=4, processes=True) as codec:
+            interfaces = await codec.decode(payload, Interfaces(), "XML")
+    """
+
+    def __init__(self, executor=None, workers=None, processes=False, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        :param executor: concurrent.futures.Executor running the jobs, e.g. a pool shared with other code;
+                         it is not shut down by close. A pool is created on first use otherwise.
+        :param workers: number of threads or processes of the created pool; default of the pool class if None
+        :param processes: creates a ProcessPoolExecutor instead of a ThreadPoolExecutor
+        :param max_in_flight: maximum number of jobs submitted to the pool and not ended
+        """
+        if executor is not None and not isinstance(executor, Executor):
+            error_msg = "Argument 'executor' should be a concurrent.futures.Executor"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+        if not isinstance(max_in_flight, int) or max_in_flight < 1:
+            error_msg = f"Invalid 'max_in_flight' {max_in_flight}. Expected a positive int"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        self.max_in_flight = max_in_flight
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._workers = workers
+        self._processes = processes
+        self._in_flight = 0
+        self._closed = False
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def in_flight(self):
+        """
+        Number of jobs submitted to the pool and not ended
+        """
+        return self._in_flight
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Runs function(*args, **kwargs) on the pool and returns its result; function and its arguments
+        must be picklable for a process pool
+        """
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        try:
+            future = self._get_executor().submit(functools.partial(function, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release, semaphore)
+            except RuntimeError:
+                # the loop is closed
+                pass
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    async def encode(self, entity, encoding, optype, pretty_print=False, as_bytes=False, granularity=None,
+                     structured_paths=False):
+        """
+        Runs Codec.encode on the pool. The entities must not be changed until the payload is returned.
+        """
+        return await self.run(Codec.encode, entity, encoding, optype, pretty_print, as_bytes,
+                              granularity=granularity, structured_paths=structured_paths)
+
+    async def decode(self, payload, model, encoding, is_action_response=False, projection=None):
+        """
+        Runs Codec.decode on the pool
+        """
+        return await self.run(Codec.decode, payload, model, encoding, is_action_response, projection)
+
+    async def encode_many(self, entities, encoding, optype, pretty_print=False, as_bytes=False, granularity=None,
+                          structured_paths=False):
+        """
+        Runs Codec.encode_many on the pool, as one job
+        """
+        return await self.run(Codec.encode_many, list(entities), encoding, optype, pretty_print, as_bytes,
+                              granularity=granularity, structured_paths=structured_paths)
+
+    async def decode_many(self, payloads, model, encoding, projection=None):
+        """
+        Runs Codec.decode_many on the pool, as one job
+        """
+        return await self.run(Codec.decode_many, list(payloads), model, encoding, projection)
+
+    async def decode_all(self, payload, bundle_name, encoding, projection=None):
+        """
+        Runs Codec.decode_all on the pool
+        """
+        return await self.run(Codec.decode_all, payload, bundle_name, encoding, projection)
+
+    async def close(self):
+        """
+        Shuts down the pool created by the AsyncCodec, waiting for its running jobs to end
+        """
+        self._closed = True
+        executor, self._executor = self._executor, None
+        if executor is not None and self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _get_executor(self):
+        if self._closed:
+            error_msg = "AsyncCodec is closed"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+        if self._executor is None:
+            pool_class = ProcessPoolExecutor if self._processes else ThreadPoolExecutor
+            self._executor = pool_class(max_workers=self._workers)
+        return self._executor
+
+    def _get_semaphore(self):
+        """
+        Returns the semaphore of the running event loop; an AsyncCodec can be used by several loops
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+        return semaphore
+
+    def _release(self, semaphore):
+        self._in_flight -= 1
+        semaphore.release()
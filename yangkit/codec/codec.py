@@ -1,10 +1,18 @@
+import pickle
+from lxml import etree
 from yangkit.utilities.logger import log
 from yangkit.types import Entity, YList
-from yangkit.errors import YInvalidArgumentError
+from yangkit.errors import YCodecError, YInvalidArgumentError
 from .xml_encoder import XmlEncoder
-from .xml_decoder import XmlDecoder
+from .xml_decoder import XmlDecoder, PARALLEL_CHUNK_SIZE
 from .json_encoder import JsonEncoder
 from .json_decoder import JsonDecoder
+from .subtree_filter import SubtreeFilter
+from .projection import get_projection
+from .encoder_plan import clear_fragments
+
+# number of payloads or entities of a batch processed by a job of the executor, by default
+BATCH_CHUNK_SIZE = 256
 
 
 class Codec(object):
@@ -16,68 +24,173 @@ class Codec(object):
     SUPPORTED_OPERATION_TYPES = ["create", "read", "update", "delete", "action"]
 
     @staticmethod
-    def encode(entity, encoding, optype):
+    def encode(entity, encoding, optype, pretty_print=False, as_bytes=False, fragment_cache=False,
+               granularity=None, structured_paths=False):
         """
         Encode entity or entities to XML/JSON payload(s).
         :param entity: yangkit.types.Entity or list(yangkit.types.Entity)
         :param encoding: represents EncodingFormat (XML or JSON)
         :param optype: "create", "read", "update" or "delete"
+        :param pretty_print: XML only; indents the payload. Compact payload is returned by default.
+        :param as_bytes: XML only; returns utf-8 encoded bytes instead of str, for transports working in bytes.
+        :param fragment_cache: caches the encoded list entries on the entities, so that re-encoding a mostly
+                               unchanged entity costs in proportion to the changed list entries.
+                               Assigning a leaf or child (or appending to a YList), or changing a leaf-list
+                               in place, invalidates the cache of the entry holding it; in-place changes of Bits
+                               values are not detected.
+                               Codec.clear_fragment_cache releases the memory of the cache.
+        :param granularity: JSON only; merges the updates of the entities into the smallest set of update paths,
+                            split per 'container', list 'entry' or 'leaf'; delete paths are deduplicated
+                            (see JsonEncoder.encode_minimal). One update per entity by default.
+        :param structured_paths: JSON only; returns the paths as gNMI path dicts
+                                 {"origin": module, "elem": [{"name": .., "key": {..}}, ..]} built from the
+                                 entity hierarchy, instead of xpath strings (see gnmi_path.get_gnmi_path).
 
         Returns:
             Payload in XML or JSON format.
             The type of return corresponds to the type of the 'entity'.
         """
 
-        if encoding not in Codec.SUPPORTED_ENCODING_FORMATS:
-            error_msg = f"""Invalid 'encoding' format. Supported formats: {Codec.SUPPORTED_ENCODING_FORMATS}."""
-            log.error(error_msg)
-            raise YInvalidArgumentError(error_msg)
+        Codec._check_encoding(encoding)
+
+        Codec._check_optype(optype)
 
-        if optype not in Codec.SUPPORTED_OPERATION_TYPES:
-            error_msg = f"""Invalid 'operation' type. Supported types: {Codec.SUPPORTED_OPERATION_TYPES}."""
+        if not isinstance(entity, (list, Entity, YList)):
+            error_msg = """Invalid 'entity' type. Expected types: yangkit.types.Entity; yangkit.types.YList; list(yangkit.types.Entity)."""
             log.error(error_msg)
             raise YInvalidArgumentError(error_msg)
 
         if encoding == "XML":
-            encoder = XmlEncoder
-        elif encoding == "JSON":
-            encoder = JsonEncoder
+            # config wrapper is part of the element tree, the payload is serialized once
+            return XmlEncoder.encode_payload(entity, optype,
+                                             wrap_config=Codec._is_edit_optype(optype),
+                                             pretty_print=pretty_print,
+                                             as_bytes=as_bytes,
+                                             fragment_cache=fragment_cache)
 
         if isinstance(entity, list):
-            ret_encoded = encoder.encode_list(entity, optype)
-        elif isinstance(entity, (Entity, YList)):
-            ret_encoded = encoder.encode(entity, optype)
-        else:
-            error_msg = """Invalid 'entity' type. Expected types: yangkit.types.Entity; yangkit.types.YList; list(yangkit.types.Entity)."""
+            return JsonEncoder.encode_list(entity, optype, fragment_cache, granularity, structured_paths)
+        return JsonEncoder.encode(entity, optype, fragment_cache, granularity, structured_paths)
+
+    @staticmethod
+    def encode_many(entities, encoding, optype, pretty_print=False, as_bytes=False, fragment_cache=False,
+                    granularity=None, structured_paths=False, executor=None, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Encode a batch of entities, each to its own payload as Codec.encode does. The arguments are validated
+        once; the serializer, the namespace modules of the bundles and the encoders of the entity classes are
+        resolved once per batch (once per chunk with an executor) by XmlEncoder.encode_many
+        and JsonEncoder.encode_many.
+        :param entities: iterable of yangkit.types.Entity or yangkit.types.YList
+        :param encoding: represents EncodingFormat (XML or JSON)
+        :param optype: "create", "read", "update" or "delete"
+        :param pretty_print: XML only; indents the payloads
+        :param as_bytes: XML only; returns utf-8 encoded bytes instead of str
+        :param fragment_cache: caches the encoded list entries on the entities, see encode; the entities
+                               encoded by the workers of an executor are copies, whose cache is dropped
+        :param granularity: JSON only; merges the updates of each entity into the smallest set of update paths,
+                            see encode
+        :param structured_paths: JSON only; returns the paths as gNMI path dicts, see encode
+        :param executor: concurrent.futures.Executor encoding the batch in chunks of chunk_size entities, e.g.
+                         a ProcessPoolExecutor, to which the entities are pickled; it is not shut down.
+                         The batch is encoded in the calling thread if None.
+        :param chunk_size: number of entities encoded by a job of executor
+
+        Returns:
+            list of the payloads in entity order; the payload of an entity which cannot be encoded is replaced
+            by the exception raised for it, and the other entities are still encoded.
+        """
+
+        Codec._check_encoding(encoding)
+        Codec._check_optype(optype)
+        Codec._check_chunk_size(chunk_size)
+
+        entities = list(entities)
+        args = (encoding, optype, pretty_print, as_bytes, fragment_cache, granularity, structured_paths)
+        if executor is None or len(entities) <= chunk_size:
+            return _encode_batch(entities, *args)
+        return _map_batch(executor, _encode_batch, entities, chunk_size, *args)
+
+    @staticmethod
+    def clear_fragment_cache(entity):
+        """
+        Drops the fragments cached by Codec.encode(fragment_cache=True) on entity and its descendants.
+        :param entity: yangkit.types.Entity
+        """
+        if not isinstance(entity, Entity):
+            error_msg = """Invalid 'entity' type. Expected types: yangkit.types.Entity."""
             log.error(error_msg)
             raise YInvalidArgumentError(error_msg)
+        clear_fragments(entity)
 
-        if encoding == "XML" and Codec._is_edit_optype(optype):
-            ret_encoded = encoder.prepend_config(ret_encoded)
+    @staticmethod
+    def encode_to_stream(sink, entity, encoding, optype, entries=None, json_backend=None, structured_paths=False):
+        """
+        Encode entity to XML or JSON payload, written incrementally to sink.
+        Memory use is bounded by one entity's leafs (one list entry's json for JSON)
+        instead of the size of the payload.
 
-        if encoding == "XML":
-            ret_encoded = encoder.get_pretty(ret_encoded)
-        
-        return ret_encoded
+        :param sink: file path or binary file-like object (file, socket.makefile('wb'), io.BytesIO, ..)
+        :param entity: yangkit.types.Entity or yangkit.types.YList
+        :param encoding: represents EncodingFormat (XML or JSON)
+        :param optype: "create", "read", "update" or "delete"; JSON supports "create", "update" and "delete"
+        :param entries: optional iterable of list entries, encoded under the ancestors of
+                        'entity' (the YList they belong to) without being appended to it.
+        :param json_backend: JSON only; 'orjson', 'json' or function(value) returning bytes.
+                             orjson is used if it is installed, the standard library json otherwise.
+        :param structured_paths: JSON only; writes gNMI path objects instead of xpath strings, see encode
+
+        The JSON payload is {"update": [{"path": xpath, "val": json}, ..], "delete": [xpath, ..]},
+        holding the update and delete paths returned by encode.
+        """
+
+        Codec._check_encoding(encoding)
+
+        Codec._check_optype(optype, Codec.SUPPORTED_OPERATION_TYPES[:-1])
+
+        if encoding == "JSON":
+            JsonEncoder.encode_to_stream(sink, entity, optype, entries, json_backend, structured_paths)
+            return
+
+        XmlEncoder.encode_to_stream(sink, entity, optype, entries,
+                                    wrap_config=Codec._is_edit_optype(optype))
+
+    @staticmethod
+    def encode_filter(targets, bundle_name=None, pretty_print=False, as_bytes=False):
+        """
+        Encode read targets to a single minimal NETCONF subtree filter.
+        :param targets: yangkit.types.Entity, yangkit.types.YList, absolute path, or a list of them.
+                        Targets of different subtrees and modules are merged into one '<filter>'.
+        :param bundle_name: bundle of the path targets, e.g. 'cisco_ios_xr'
+        :param pretty_print: indents the payload. Compact payload is returned by default.
+        :param as_bytes: returns utf-8 encoded bytes instead of str.
+
+        Returns:
+            '<filter type="subtree">' payload for '<get>' or '<get-config>'.
+        """
+        return SubtreeFilter(bundle_name).add(targets).to_string(pretty_print, as_bytes)
 
     @staticmethod
-    def decode(payload, model, encoding, is_action_response=False):
+    def decode(payload, model, encoding, is_action_response=False, projection=None):
         """
         Decode payload in XML or JSON format to yangkit.types.Entity
 
-        :param payload: payload in XML or JSON format.
+        :param payload: payload in XML or JSON format; str, or utf-8 encoded bytes, bytearray or memoryview.
+                        Encoded XML payloads are parsed without decoding to str.
+                        An XML payload can also be an already parsed lxml element.
+                        All the updates of a gNMI response under the top-level container of model are decoded.
         :param model: An instance of yangkit.types.Entity representing the type of decoded object
         :param encoding: represents EncodingFormat (XML or JSON)
         :param is_action_response: True, if payload is action operation response; False otherwise
+        :param projection: yangkit.codec.Projection, or iterable of schema paths and leaf names, e.g.
+                           ["openconfig-interfaces:interfaces/interface/state/counters", "name"];
+                           only they are decoded, the other members of the payload are skipped.
+                           Not applied to action responses.
         Returns: An instance of yangkit.types.Entity class.
         """
 
-        if encoding not in Codec.SUPPORTED_ENCODING_FORMATS:
-            error_msg = f"""Invalid 'encoding' format. Supported formats: {Codec.SUPPORTED_ENCODING_FORMATS}."""
-            log.error(error_msg)
-            raise YInvalidArgumentError(error_msg)
+        Codec._check_encoding(encoding)
 
-        if not payload:
+        if not etree.iselement(payload) and not payload:
             log.error("payload is empty")
             raise YInvalidArgumentError("payload is empty")
 
@@ -86,17 +199,180 @@ class Codec(object):
             log.error(error_msg)
             raise YInvalidArgumentError(error_msg)
 
+        projection = get_projection(projection)
+
         if encoding == "XML":
             decoder = XmlDecoder
+            # the reply is parsed once, its data element is decoded as it is
+            payload = decoder.data_element_in_rpc_reply(payload)
         elif encoding == "JSON":
             decoder = JsonDecoder
-
-        payload = decoder.data_in_rpc_reply(payload)
+            if is_action_response:
+                payload = decoder.data_in_rpc_reply(payload)
 
         if is_action_response:
             return decoder.decode_action_response(payload, model)
 
-        return decoder.decode(payload, model)
+        return decoder.decode(payload, model, projection)
+
+    @staticmethod
+    def decode_many(payloads, model, encoding, projection=None, executor=None, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Decode a batch of payloads of the same model, e.g. the replies of many devices, each as Codec.decode
+        does. The arguments are validated once; the top-level class, the namespaces of its bundle and the
+        projection are resolved once per batch (once per chunk with an executor), and the parsers are reused.
+
+        :param payloads: iterable of payloads in XML or JSON format, see decode; lxml elements can not be sent
+                         to worker processes
+        :param model: An instance of yangkit.types.Entity representing the type of decoded objects
+        :param encoding: represents EncodingFormat (XML or JSON)
+        :param projection: yangkit.codec.Projection, or iterable of schema paths and leaf names to be decoded
+        :param executor: concurrent.futures.Executor decoding the batch in chunks of chunk_size payloads, e.g.
+                         a ProcessPoolExecutor, from which the entities are pickled back; it is not shut down.
+                         The batch is decoded in the calling thread if None.
+        :param chunk_size: number of payloads decoded by a job of executor
+        Returns: list of yangkit.types.Entity in payload order; the entity of a payload which cannot be decoded
+                 is replaced by its YCodecError, and the other payloads are still decoded.
+        """
+
+        Codec._check_encoding(encoding)
+        Codec._check_chunk_size(chunk_size)
+
+        if not isinstance(model, Entity):
+            error_msg = f"""'model' should be an Entity object"""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        payloads = list(payloads)
+        projection = get_projection(projection)
+        decoder = XmlDecoder if encoding == "XML" else JsonDecoder
+        if executor is None or len(payloads) <= chunk_size:
+            return decoder.decode_many(payloads, model, projection)
+        return _map_batch(executor, decoder.decode_many, payloads, chunk_size, model, projection)
+
+    @staticmethod
+    def decode_all(payload, bundle_name, encoding, projection=None):
+        """
+        Decode all the top-level containers of a reply, e.g. of a full-datastore get-config
+        or of a multi-path gNMI Get, from a single parse.
+        :param payload: rpc-reply in XML format, or gNMI response in JSON format; str, or utf-8 encoded bytes,
+                        bytearray or memoryview; lxml element for XML and JSON object for JSON are accepted
+        :param bundle_name: bundle of the top-level classes, e.g. 'cisco_ios_xr'
+        :param encoding: represents EncodingFormat (XML or JSON)
+        :param projection: yangkit.codec.Projection, or iterable of schema paths and leaf names to be decoded
+        Returns: yangkit.types.EntityCollection of the top-level entities; containers of modules which are not
+                 in the bundle are skipped.
+        """
+
+        Codec._check_encoding(encoding)
+
+        if not etree.iselement(payload) and not payload:
+            log.error("payload is empty")
+            raise YInvalidArgumentError("payload is empty")
+
+        if not isinstance(bundle_name, str) or not bundle_name:
+            error_msg = """'bundle_name' should be the name of a bundle, e.g. 'cisco_ios_xr'"""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if encoding == "XML":
+            return XmlDecoder.decode_all(payload, bundle_name, get_projection(projection))
+        return JsonDecoder.decode_all(payload, bundle_name, get_projection(projection))
+
+    @staticmethod
+    def decode_parallel(payload, model, encoding="XML", workers=None, chunk_size=PARALLEL_CHUNK_SIZE, executor=None,
+                        projection=None):
+        """
+        Decode a large XML payload to yangkit.types.Entity, with the entries of the top-level lists
+        decoded in chunks by a pool of worker processes.
+        :param payload: payload in XML format; str, or utf-8 encoded bytes, bytearray or memoryview, or lxml element
+        :param model: An instance of yangkit.types.Entity representing the type of decoded object
+        :param encoding: represents EncodingFormat (only XML is supported)
+        :param workers: number of worker processes; os.cpu_count() if None
+        :param chunk_size: number of list entries decoded by a worker at once
+        :param executor: concurrent.futures.ProcessPoolExecutor to be reused instead of a new pool
+        :param projection: yangkit.codec.Projection, or iterable of schema paths and leaf names to be decoded
+        Returns: An instance of yangkit.types.Entity class, as Codec.decode.
+        """
+
+        Codec._check_encoding(encoding, ["XML"])
+
+        if not etree.iselement(payload) and not payload:
+            log.error("payload is empty")
+            raise YInvalidArgumentError("payload is empty")
+
+        if not isinstance(model, Entity):
+            error_msg = f"""'model' should be an Entity object"""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        payload = XmlDecoder.data_element_in_rpc_reply(payload)
+        return XmlDecoder.decode_parallel(payload, model, workers, chunk_size, executor, get_projection(projection))
+
+    @staticmethod
+    def decode_stream(source, model, encoding="XML", projection=None):
+        """
+        Decode the entries of a list in an XML or JSON payload incrementally, with memory bounded by one entry.
+        Entries are yielded as soon as they are parsed and are not appended to a YList.
+        :param source: file path, utf-8 encoded bytes, binary file-like object (e.g. socket.makefile('rb'))
+                       or iterable of bytes chunks
+        :param model: yangkit.types.YList of the entries (e.g. Interfaces().interface), or an entry of the list
+        :param encoding: represents EncodingFormat (XML or JSON)
+        :param projection: yangkit.codec.Projection, or iterable of schema paths and leaf names
+                           to be decoded in the entries
+        Returns: generator of yangkit.types.Entity; the parent of an entry holds the keys of its ancestors.
+        """
+
+        Codec._check_encoding(encoding)
+
+        if not isinstance(model, (Entity, YList)):
+            error_msg = """Invalid 'model' type. Expected types: yangkit.types.YList; yangkit.types.Entity."""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if encoding == "JSON":
+            return JsonDecoder.decode_stream(source, model, get_projection(projection))
+        return XmlDecoder.decode_stream(source, model, get_projection(projection))
+
+    @staticmethod
+    def _check_encoding(encoding, encodings=None):
+        """
+        Raises YInvalidArgumentError if encoding is not one of encodings
+
+        :param encoding: represents EncodingFormat
+        :param encodings: supported formats; SUPPORTED_ENCODING_FORMATS if None
+        """
+        encodings = encodings or Codec.SUPPORTED_ENCODING_FORMATS
+        if encoding not in encodings:
+            error_msg = f"""Invalid 'encoding' format. Supported formats: {encodings}."""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+    @staticmethod
+    def _check_optype(optype, optypes=None):
+        """
+        Raises YInvalidArgumentError if optype is not one of optypes
+
+        :param optype: operation type
+        :param optypes: supported operation types; SUPPORTED_OPERATION_TYPES if None
+        """
+        optypes = optypes or Codec.SUPPORTED_OPERATION_TYPES
+        if optype not in optypes:
+            error_msg = f"""Invalid 'operation' type. Supported types: {optypes}."""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+    @staticmethod
+    def _check_chunk_size(chunk_size):
+        """
+        Raises YInvalidArgumentError if chunk_size is not a positive int
+
+        :param chunk_size: number of items of a batch processed by a job of an executor
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            error_msg = f"Invalid 'chunk_size' {chunk_size}. Expected a positive int"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
 
     @staticmethod
     def _is_edit_optype(optype):
@@ -108,3 +384,46 @@ class Codec(object):
         if optype == 'create' or optype == 'update' or optype == 'delete':
             return True
         return False
+
+
+def _encode_batch(entities, encoding, optype, pretty_print, as_bytes, fragment_cache, granularity, structured_paths):
+    """
+    Encodes the entities of Codec.encode_many, which validated the arguments; runs in the workers of its executor
+    """
+    if encoding == "XML":
+        return XmlEncoder.encode_many(entities, optype, Codec._is_edit_optype(optype), pretty_print, as_bytes,
+                                      fragment_cache)
+    return JsonEncoder.encode_many(entities, optype, fragment_cache, granularity, structured_paths)
+
+
+def _map_batch(executor, function, items, chunk_size, *args):
+    """
+    Runs function(chunk, *args) on executor for the chunks of chunk_size items and returns the concatenated
+    results in item order; the results of a chunk whose job fails (e.g. as its items can not be pickled)
+    are the YCodecError of the failure
+    """
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    futures = [executor.submit(_run_batch, function, chunk, *args) for chunk in chunks]
+    results = []
+    for chunk, future in zip(chunks, futures):
+        try:
+            results.extend(future.result())
+        except Exception as error:
+            log.error(error)
+            results.extend(YCodecError(error) for _ in chunk)
+    return results
+
+
+def _run_batch(function, items, *args):
+    """
+    Runs the batch function of a chunk in a worker of the executor; the exceptions of the results which can not
+    be pickled back (e.g. lxml parse errors) are replaced by a YCodecError of their message
+    """
+    results = function(items, *args)
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            try:
+                pickle.dumps(result)
+            except Exception:
+                results[index] = YCodecError(str(result))
+    return results
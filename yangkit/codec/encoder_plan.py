@@ -0,0 +1,189 @@
+from yangkit.utilities.logger import log
+from yangkit.types import Entity, YList, YLeaf, YLeafList, Bits
+from yangkit.types.types import FRAGMENTS_ATTRIBUTE, track_leaf_lists
+from yangkit.filters import YFilter
+
+PLANS_ATTRIBUTE = '_encoder_plans'
+
+
+class EncoderSource(object):
+    """
+    Source code of an encoder function, generated for one Entity class
+    """
+
+    def __init__(self, header):
+        self.lines = [header]
+        self.level = 1
+
+    def writeln(self, line):
+        self.lines.append('    ' * self.level + line)
+
+    def lvl_inc(self):
+        self.level += 1
+
+    def lvl_dec(self):
+        self.level -= 1
+
+    def compile(self, filename, global_names):
+        """
+        Compiles the source and returns the function it defines
+
+        :param filename: name shown in tracebacks, e.g. '<XML create encoder of test_if.Interfaces>'
+        :param global_names: dict of the names (constants, helpers) used by the source
+        """
+        source = '\n'.join(self.lines) + '\n'
+        code = compile(source, filename, 'exec')
+        namespace = dict(global_names)
+        exec(code, namespace)
+        return namespace['encode']
+
+
+def get_encoder(entity, encoding, optype, compile_encoder):
+    """
+    Returns the encoder function compiled for the class of entity, encoding and optype.
+    Encoders are compiled once and cached on the class.
+
+    :param entity: Entity object
+    :param encoding: 'XML' or 'JSON'
+    :param optype: operation type
+    :param compile_encoder: function(entity, optype) compiling the encoder, called on first use
+    """
+    clazz = entity.__class__
+    plans = clazz.__dict__.get(PLANS_ATTRIBUTE)
+    if plans is None:
+        plans = {}
+        setattr(clazz, PLANS_ATTRIBUTE, plans)
+
+    key = (encoding, optype)
+    encoder = plans.get(key)
+    if encoder is None:
+        log.debug(f"Compiling {encoding} '{optype}' encoder of {clazz.__module__}.{clazz.__qualname__}")
+        encoder = compile_encoder(entity, optype)
+        plans[key] = encoder
+    return encoder
+
+
+def get_leaf_attributes(entity):
+    """
+    Returns the leaf and leaf-list attribute names of entity, in Entity._leafs order
+    """
+    return list(entity._leafs)
+
+
+def get_child_attributes(entity):
+    """
+    Returns list of tuple(attribute name, is_list) for the children of entity,
+    in the order of Entity.get_children()
+    """
+    children = []
+    for name, value in entity.__dict__.items():
+        if isinstance(value, YList):
+            children.append((name, True))
+        elif name in entity._children_name_map and name != '_top_entity':
+            children.append((name, False))
+    return children
+
+
+def leaf_has_data(leaf_tuple, value):
+    """
+    Returns True if the value of a leaf attribute makes its entity have data, as in Entity.has_data
+
+    :param leaf_tuple: entry of Entity._leafs for the attribute
+    :param value: attribute value, not None
+    """
+    if isinstance(value, YFilter):
+        return True
+    leaf = leaf_tuple[0] if isinstance(leaf_tuple, tuple) else leaf_tuple
+    if isinstance(leaf, YLeaf):
+        return not isinstance(value, Bits) or bool(value.get_bitmap())
+    if isinstance(leaf, YLeafList):
+        return bool(value)
+    return False
+
+
+def write_entity_has_data(source, entity):
+    """
+    Writes the checks of Entity.has_data which do not depend on leafs or children to 'data'
+    """
+    source.writeln("data = bool(d.get('is_presence_container')) or "
+                   "(isinstance(yfilter, YFilter) and yfilter is not NOT_SET)")
+    if '_top_entity' in entity.__dict__:
+        source.writeln("top_entity = d['_top_entity']")
+        source.writeln("if isinstance(top_entity, Entity) and top_entity.has_data():")
+        source.writeln("    data = True")
+
+
+def get_fragment(entity, key):
+    """
+    Returns the encoded fragment cached on entity under key; None if there is none.
+    Fragments are dropped by types.invalidate_fragments when entity or one of its descendants changes.
+
+    :param entity: Entity object
+    :param key: tuple(encoding, optype, ..) the fragment was encoded with
+    """
+    fragments = entity.__dict__.get(FRAGMENTS_ATTRIBUTE)
+    if fragments is None:
+        return None
+    return fragments.get(key)
+
+
+def set_fragment(entity, key, fragment):
+    """
+    Caches the encoded fragment of entity under key.
+    The descendants of entity must be marked, see mark_fragments.
+
+    :param entity: Entity object
+    :param key: tuple(encoding, optype, ..) the fragment was encoded with
+    :param fragment: encoded fragment; None only marks entity, as mark_fragments
+    """
+    fragments = entity.__dict__.get(FRAGMENTS_ATTRIBUTE)
+    if fragments is None:
+        fragments = entity.__dict__[FRAGMENTS_ATTRIBUTE] = {}
+        track_leaf_lists(entity)
+    if fragment is not None:
+        fragments[key] = fragment
+
+
+def mark_fragments(entity, recursive=False):
+    """
+    Marks entity as being below a cached fragment, so that its changes invalidate the fragments of its ancestors.
+    Every descendant of an entity holding fragments is marked.
+
+    :param entity: Entity object
+    :param recursive: marks the descendants of entity too, for entities whose children are not encoded
+    """
+    if FRAGMENTS_ATTRIBUTE not in entity.__dict__:
+        entity.__dict__[FRAGMENTS_ATTRIBUTE] = {}
+        track_leaf_lists(entity)
+    if recursive:
+        for name, value in entity.__dict__.items():
+            if isinstance(value, YList):
+                for child in value:
+                    mark_fragments(child, True)
+            elif isinstance(value, Entity) and name != '_top_entity' and name != 'parent':
+                mark_fragments(value, True)
+
+
+def clear_fragments(entity):
+    """
+    Drops the encoded fragments cached on entity and all its descendants, releasing their memory
+
+    :param entity: Entity object
+    """
+    if entity.__dict__.pop(FRAGMENTS_ATTRIBUTE, None) is None:
+        return
+    for name, value in entity.__dict__.items():
+        if isinstance(value, YList):
+            for child in value:
+                clear_fragments(child)
+        elif isinstance(value, Entity) and name != '_top_entity' and name != 'parent':
+            clear_fragments(value)
+
+
+ENCODER_GLOBALS = {
+    'Entity': Entity,
+    'YFilter': YFilter,
+    'NOT_SET': YFilter.not_set,
+    'MERGE': YFilter.merge,
+    'DELETE': YFilter.delete,
+}
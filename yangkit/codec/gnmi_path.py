@@ -0,0 +1,142 @@
+from yangkit.types import Empty
+from yangkit.types.types import GNMI_PATH_ATTRIBUTE
+from yangkit.utilities.entity import parse_key_predicate_items, segmentalize
+
+_elem_names = {}
+
+
+def get_gnmi_path(entity, leaf_name=None):
+    """
+    Returns the gNMI path of entity, or of one of its leafs, as a dict
+    {"origin": module of the top-level container, "elem": [{"name": .., "key": {key leaf name: value}}, ..]},
+    the structure of gNMI Path messages; keys are omitted for containers and keyless list entries.
+    The elems are built from the entity hierarchy, without formatting and parsing a path string, and are
+    cached on every entity of the path; a cached path is reused while the parent and the keys of the entity
+    are the same. The elem dicts are shared by the paths and must not be modified.
+
+    :param entity: Entity object
+    :param leaf_name: YANG name of a leaf of entity, e.g. 'mtu', or of a leaf-list item, e.g. 'tags[.="a"]'
+    """
+    origin, elems = _get_elems(entity)
+    elems = list(elems)
+    if leaf_name is not None:
+        elems.append(_parse_elem(leaf_name))
+    return {"origin": origin, "elem": elems}
+
+
+def format_gnmi_path(path):
+    """
+    Returns the path string of a gNMI path dict, as JsonEncoder._format_xpath formats it,
+    e.g. "openconfig-interfaces:interfaces/interface[name=1/1/c1/2]"
+    """
+    segments = [format_elem(elem) for elem in path["elem"]]
+    if path.get("origin") and segments:
+        segments[0] = f"{path['origin']}:{segments[0]}"
+    return '/'.join(segments)
+
+
+def format_elem(elem):
+    """
+    Returns the path segment of a gNMI path elem {"name": .., "key": {..}}, e.g. "interface[name=1/1/c1/2]"
+    """
+    keys = elem.get("key")
+    if keys:
+        return elem["name"] + ''.join(f"[{key}={value}]" for key, value in keys.items())
+    return elem["name"]
+
+
+def _get_elems(entity):
+    """
+    Returns tuple(origin, tuple of the elem dicts) of the path of entity, from its cache when it is valid
+    """
+    d = entity.__dict__
+    parent = d.get('parent')
+    key_values = tuple(d[name] for name in d['ylist_key_names']) if d['ylist_key_names'] else None
+    if parent is None and not entity.is_top_level_class:
+        return _get_detached_elems(entity, key_values)
+
+    parent_path = _get_elems(parent) if parent is not None else None
+    cached = d.get(GNMI_PATH_ATTRIBUTE)
+    if cached is not None and cached[0] is parent_path and cached[1] == key_values:
+        return cached[2]
+
+    if parent_path is None:
+        origin, _, name = _get_elem_name(entity).rpartition(':')
+        path = (origin, ({"name": name},))
+    else:
+        path = (parent_path[0], parent_path[1] + (_get_elem(entity, key_values),))
+    d[GNMI_PATH_ATTRIBUTE] = (parent_path, key_values, path)
+    return path
+
+
+def _get_detached_elems(entity, key_values):
+    """
+    Returns the path of an entity without parent: the path of its ancestors is approximated by the one
+    of the generated class (see Entity.get_absolute_path), and is not cached
+    """
+    elem = _get_elem(entity, key_values)
+    absolute_path = entity._get_absolute_path()
+    segment_path = entity._segment_path()
+    if not absolute_path.endswith(segment_path) or absolute_path == segment_path:
+        return '', (elem,)
+    origin, elems = _parse_path(absolute_path[:-len(segment_path)].rstrip('/'))
+    return origin, elems + (elem,)
+
+
+def _get_elem(entity, key_values):
+    elem = {"name": _get_elem_name(entity)}
+    if key_values is not None:
+        keys = {_get_key_leaf_name(entity, attr): _format_key_value(value)
+                for attr, value in zip(entity.ylist_key_names, key_values) if value is not None}
+        if keys:
+            elem["key"] = keys
+    return elem
+
+
+def _get_elem_name(entity):
+    """
+    Returns the name of entity in its path, prefixed with its module for top-level containers and augmentations
+    """
+    clazz = entity.__class__
+    name = _elem_names.get(clazz)
+    if name is None:
+        name = _elem_names[clazz] = entity._segment_path().split('[', 1)[0]
+    return name
+
+
+def _get_key_leaf_name(entity, attr):
+    leaf = entity._leafs[attr]
+    leaf = leaf[0] if isinstance(leaf, tuple) else leaf
+    return leaf.name
+
+
+def _format_key_value(value):
+    """
+    Returns a key value as in Entity.get_segment_path
+    """
+    if isinstance(value, Empty):
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return format(value)
+
+
+def _parse_elem(segment):
+    """
+    Returns the elem dict of a path segment, e.g. "interface[name='Eth1']"
+    """
+    name, key_items = parse_key_predicate_items(segment)
+    elem = {"name": name}
+    keys = {key: value for key, value in key_items if value != 'None'}
+    if keys:
+        elem["key"] = keys
+    return elem
+
+
+def _parse_path(path):
+    """
+    Returns tuple(origin, tuple of the elem dicts) of an absolute path string
+    """
+    elems = [_parse_elem(segment) for segment in segmentalize(path)]
+    origin, _, elems[0]["name"] = elems[0]["name"].rpartition(':')
+    return origin, tuple(elems)
@@ -0,0 +1,44 @@
+import json
+from yangkit.utilities.logger import log
+from yangkit.errors import YInvalidArgumentError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _stdlib_dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(value):
+    return orjson.dumps(value)
+
+
+# serializers of json values to utf-8 encoded bytes, by backend name
+JSON_BACKENDS = {'json': _stdlib_dumps}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = _orjson_dumps
+
+# backend used when none is given; the fastest one available
+DEFAULT_JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def get_json_backend(backend=None):
+    """
+    Returns the function serializing a json value (dict, list, str, ..) to compact utf-8 encoded bytes
+
+    :param backend: name of a backend in JSON_BACKENDS, e.g. 'orjson' (installed separately) or 'json'
+                    (standard library); function(value) returning bytes; None for DEFAULT_JSON_BACKEND
+    """
+    if backend is None:
+        backend = DEFAULT_JSON_BACKEND
+    if callable(backend):
+        return backend
+    dumps = JSON_BACKENDS.get(backend)
+    if dumps is None:
+        error_msg = f"Invalid json backend '{backend}'. Available backends: {sorted(JSON_BACKENDS)}"
+        log.error(error_msg)
+        raise YInvalidArgumentError(error_msg)
+    return dumps
@@ -1,6 +1,21 @@
 import re
-from yangkit.types import Entity
-from yangkit.utilities.entity import get_internal_node, get_top_level_class, segmentalize
+import json
+import codecs
+from yangkit.types import Entity, EntityCollection, YList
+from yangkit.types.types import create_entity
+from yangkit.utilities.logger import log
+from yangkit.errors import YCodecError, YInvalidArgumentError
+from yangkit.utilities.entity import get_internal_node, get_top_level_class, get_top_level_class_of_name, \
+    get_ylist_entry, parse_key_predicate_items, segmentalize
+from yangkit.utilities.schema_index import to_schema_path
+from .projection import get_projection, SKIP
+from .xml_decoder import _iter_chunks
+from .gnmi_path import format_elem
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"')
+_raw_decode = json.JSONDecoder().raw_decode
 
 
 class JsonDecoder:
@@ -9,61 +24,308 @@ class JsonDecoder:
     """
 
     @staticmethod
-    def decode(path_val, model):
+    def decode(path_val, model, projection=None):
         """
         Decodes JSON payload and returns a child container
         with the same absolute path as the provided model.
 
-        :param path_val: Tuple(path, JSONObject)
+        :param path_val: {"path": .., "val": ..} update, or gNMI response (see decode_all) whose updates
+                         of the top-level container of model are all decoded into the same entity;
+                         JSON object, or JSON text as str, or utf-8 encoded bytes, bytearray or memoryview
         :param model: Entity object; required to find the bundle name
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
         """
-        path, val = path_val["path"], path_val["val"]
+        path_val = _load_json(path_val)
         top_entity = get_top_level_class(model)
+        try:
+            JsonDecoder._decode_payload(path_val, top_entity, get_projection(projection))
+        except Exception as error:
+            log.error(error)
+            raise YCodecError(error)
+        return get_internal_node(top_entity, model.get_absolute_path())
+
+    @staticmethod
+    def decode_many(payloads, model, projection=None):
+        """
+        Decodes a batch of JSON payloads of the same model, each as decode does. The top-level class and
+        the projection are resolved once for the batch, and the top-level entities are copies of the template
+        of the class (see types.create_entity) instead of new instances.
 
-        if path and val:
-            entity = JsonDecoder._decode_path_to_entity(path, top_entity)
-            JsonDecoder._decode_json(val, entity)
+        :param payloads: iterable of {"path": .., "val": ..} updates or gNMI responses; JSON objects, or JSON
+                         text as str, or utf-8 encoded bytes, bytearray or memoryview
+        :param model: Entity object; required to find the bundle name
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+        :return: list of the decoded entities in payload order; the entity of a payload which cannot be
+                 decoded is replaced by its YCodecError, and the other payloads are still decoded
+        """
+        top_class = get_top_level_class(model).__class__
+        model_path = model.get_absolute_path()
+        projection = get_projection(projection)
+
+        results = []
+        for payload in payloads:
+            try:
+                if not payload:
+                    raise YInvalidArgumentError("payload is empty")
+                top_entity = create_entity(top_class)
+                JsonDecoder._decode_payload(_load_json(payload), top_entity, projection)
+                results.append(get_internal_node(top_entity, model_path))
+            except Exception as error:
+                error.payload = payload
+                log.error(error)
+                results.append(YCodecError(error))
+        return results
+
+    @staticmethod
+    def _decode_payload(path_val, top_entity, projection):
+        """
+        Decodes a loaded {"path": .., "val": ..} update or gNMI response into top_entity
+
+        :param path_val: JSON object
+        :param top_entity: top-level entity of the model
+        :param projection: Projection or None
+        """
+        top_module, _, top_name = top_entity.get_segment_path().rpartition(':')
+        if "notification" in path_val or "update" in path_val:
+            path_cache = {}
+            for module_name, yang_name, segments, val in JsonDecoder._iter_updates(path_val):
+                if yang_name != top_name or (module_name and module_name != top_module):
+                    log.debug(f"Update of '{module_name}:{yang_name}' is not in '{top_module}:{top_name}'; "
+                              "update skipped")
+                    continue
+                JsonDecoder._decode_update(segments, val, top_entity, projection, path_cache)
         else:
-            entity = top_entity
+            path, val = path_val["path"], path_val["val"]
+            if path and val:
+                module_name, _, yang_name = segmentalize(path)[0].split('[')[0].rpartition(':')
+                if yang_name != top_name or (module_name and module_name != top_module):
+                    log.debug(f"Update of '{path}' is not in '{top_module}:{top_name}'; update skipped")
+                    return
+                entity = JsonDecoder._decode_path_to_entity(path, top_entity)
+                JsonDecoder._decode_json(val, entity, projection and projection.get_state(path))
 
-        return get_internal_node(top_entity, model.get_absolute_path())
+    @staticmethod
+    def decode_all(response_json, bundle_name, projection=None):
+        """
+        Decodes every update of every notification of a gNMI response, e.g. of a multi-path Get,
+        from a single parse. The top-level class of each update is looked up in the bundle's ENTITY_LOOKUP
+        by the module of the first path segment, or by the origin of the update or of the notification
+        prefix; updates of modules which are not in the bundle are skipped.
+        Updates of the same top-level container are decoded into the same entity; the entities resolved
+        for the paths are cached during the decode, so that updates under a common path (e.g. the leafs of
+        the same list entry) do not resolve it again.
+
+        :param response_json: gNMI response; JSON object, or JSON text as str, or utf-8 encoded
+                              bytes, bytearray or memoryview
+        :param bundle_name: bundle of the classes, e.g. 'openconfig'
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+        :return: EntityCollection of the top-level entities, in response order
+        """
+        response_json = _load_json(response_json)
+        projection = get_projection(projection)
+        entities = EntityCollection()
+        top_entities = {}
+        path_cache = {}
+        for module_name, yang_name, segments, val in JsonDecoder._iter_updates(response_json):
+            top_entity = top_entities.get((module_name, yang_name))
+            if top_entity is None:
+                top_entity = get_top_level_class_of_name(bundle_name, module_name, yang_name)
+                if top_entity is None:
+                    log.debug(f"'{module_name}:{yang_name}' is not a top level container in bundle "
+                              f"'{bundle_name}'; update skipped")
+                    continue
+                top_entities[(module_name, yang_name)] = top_entity
+                entities.append(top_entity)
+
+            try:
+                JsonDecoder._decode_update(segments, val, top_entity, projection, path_cache)
+            except Exception as error:
+                log.error(error)
+                raise YCodecError(error)
+
+        return entities
+
+    @staticmethod
+    def _iter_updates(response_json):
+        """
+        Yields tuple(module name, top-level yang name, path segments, val) for every update of every notification
+        of a gNMI response, a notification or an update. The prefix of the notification is prepended to the path;
+        the first segment is prefixed with the origin of the update or of the prefix if it has no module.
+        """
+        notifications = response_json.get("notification") if isinstance(response_json, dict) else None
+        if notifications is None:
+            # a single notification, or a single update
+            notifications = [response_json if "update" in response_json else {"update": [response_json]}]
+
+        for notification in notifications:
+            prefix, origin = JsonDecoder._get_path_and_origin(notification.get("prefix"))
+            prefix_segments = segmentalize(prefix) if prefix else []
+            for update in notification.get("update") or []:
+                resolved = JsonDecoder._get_update_segments(prefix_segments, origin, update.get("path"))
+                if resolved is not None:
+                    yield resolved + (update.get("val"),)
+
+    @staticmethod
+    def _get_update_segments(prefix_segments, prefix_origin, path):
+        """
+        Returns tuple(module name, top-level yang name, segments) of the absolute path of an update or delete
+        path under a notification prefix; None if the path is empty. The first segment is prefixed with
+        the origin of the path or of the prefix if it has no module.
+
+        :param prefix_segments: segments of the notification prefix
+        :param prefix_origin: origin of the notification prefix
+        :param path: gNMI path, see _get_path_and_origin
+        """
+        if isinstance(path, dict) and path.get("elem"):
+            # segments of the elems, without formatting and splitting the path
+            segments = prefix_segments + [format_elem(elem) for elem in path["elem"]]
+            origin = path.get("origin")
+        else:
+            path, origin = JsonDecoder._get_path_and_origin(path)
+            segments = prefix_segments + segmentalize(path) if path else list(prefix_segments)
+        if not segments:
+            return None
+        root_segment = segments[0].split('[')[0]
+        if ':' in root_segment:
+            module_name, yang_name = root_segment.split(':', 1)
+        else:
+            module_name, yang_name = origin or prefix_origin, root_segment
+            if module_name:
+                segments[0] = f"{module_name}:{segments[0]}"
+        return module_name, yang_name, segments
+
+    @staticmethod
+    def decode_stream(source, model, projection=None):
+        """
+        Decodes the entries of a list as they are parsed, yielding each entry as soon as its object closes.
+        The text is read in chunks; an entry is parsed once it is complete in the buffer and is released
+        after it is decoded, so memory is bounded by one entry, whatever the size of the payload.
+        Entries are not appended to a YList; ancestors of the entries are created with their keys set,
+        but hold no other data.
+
+        The entries are found in a gNMI response (notifications with their prefix before their updates),
+        in a single {"path": .., "val": ..} update, or in a RESTCONF document of module-qualified members.
+        The "val" of an update that comes before its "path" is read whole before it is walked.
+        An update whose path goes into an entry is decoded to an entry holding the update only.
+
+        :param source: file path, utf-8 encoded bytes (bytearray, memoryview), binary file-like object,
+                       or iterable of bytes chunks
+        :param model: YList of the entries (e.g. Interfaces().interface) or an entry of the list
+                      attached to its parent; only its schema path is used
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+                           in the entries
+        """
+        if isinstance(model, YList):
+            entry_model = get_ylist_entry(model)
+        elif isinstance(model, Entity) and (model.ylist_key_names or model.ylist_key is not None):
+            entry_model = model
+        else:
+            error_msg = "Argument 'model' should be a YList or an entry of a list"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        walker = _EntryWalker(_JsonReader(_iter_chunks(source)), entry_model, get_projection(projection))
+        return walker.walk_document()
+
+    @staticmethod
+    def _get_path_and_origin(path):
+        """
+        Returns (path string, origin) of a gNMI path given as a string, or as a dict with "origin"
+        and either a "path" string or "elem", the list of {"name": .., "key": {..}}
+        """
+        if isinstance(path, dict):
+            elems = path.get("elem")
+            if elems:
+                return '/'.join(format_elem(elem) for elem in elems), path.get("origin")
+            return path.get("path") or "", path.get("origin")
+        return path or "", None
 
     @staticmethod
-    def _decode_path_to_entity(path, top_entity):
+    def _decode_update(segments, val, top_entity, projection, path_cache=None):
+        """
+        Decodes the value of an update into the entity of its path under top_entity;
+        a scalar or leaf-list value is set to the leaf at the end of the path
+
+        :param segments: segments of the absolute path of the update
+        :param path_cache: dict caching the entities of the paths, see _decode_path_to_entity
+        """
+        if isinstance(val, dict):
+            entity = JsonDecoder._decode_path_to_entity(segments, top_entity, path_cache)
+            JsonDecoder._decode_json(val, entity, projection and projection.get_state('/'.join(segments)))
+            return
+
+        if len(segments) < 2 or val is None:
+            return
+        entity = JsonDecoder._decode_path_to_entity(segments[:-1], top_entity, path_cache)
+        leaf_name = segments[-1]
+        if projection is not None and projection.get_state('/'.join(segments)) is not None:
+            return
+        if isinstance(val, list):
+            # the values of a previous update of the leaf-list are replaced
+            JsonDecoder._clear_leaf_list(entity, leaf_name)
+        for value in (val if isinstance(val, list) else [val]):
+            if type(value) == bool:
+                value = "true" if value else "false"
+            entity.set_value(leaf_name, value)
+
+    @staticmethod
+    def _decode_path_to_entity(path, top_entity, path_cache=None):
         """
         Retuns an internal node from top_entity with absolute path same as "path"
 
-        :param path: represents "path" in json payload
+        :param path: represents "path" in json payload; absolute path, or its segments
         :param top_entity: top-level entity object
+        :param path_cache: dict of the entities resolved for the paths (from the top-level segment) in
+                           the same decode; entities found or created are added to it
         """
-        segments = segmentalize(path)
+        segments = segmentalize(path) if isinstance(path, str) else path
         entity = top_entity
+        sub_path = segments[0]
         for segment in segments[1:]:
+            if path_cache is not None:
+                sub_path = f"{sub_path}/{segment}"
+                child = path_cache.get(sub_path)
+                if child is not None:
+                    entity = child
+                    continue
             if '[' in segment:
-                attr, child = entity.get_child_by_name(segment.split('[')[0], "")
+                yang_name, keys = parse_key_predicate_items(segment)
+                attr, child = entity.get_child_by_name(yang_name, "")
                 ylist = getattr(entity, attr)
-                keys = re.findall(r'\[(.*?)\]', segment)
-                for key in keys:
-                    k, v = key.split("=")
-                    child.set_value(k, v)
-                ylist.append(child)
+                for key_name, key_value in keys:
+                    child.set_value(key_name, key_value)
+                key = ylist._key(child) if keys else None
+                if key is not None and ylist.has_key(key):
+                    # entry of a previous update
+                    child = ylist._entity_map[key]
+                else:
+                    ylist.append(child)
             else:
                 _, child = entity.get_child_by_name(segment, segment)
             entity = child
+            if path_cache is not None:
+                path_cache[sub_path] = child
         return entity
 
     @staticmethod
-    def _decode_json(val_json, entity: Entity):
+    def _decode_json(val_json, entity: Entity, projection=None):
         """
         Populates the entity object by traversing the JSON object in a reccursive manner
 
         :param val_json: JSON object
         :param entity: Enitity object
+        :param projection: ProjectionState of entity; None decodes the whole object
         """
         for k, v in val_json.items():
+            child_projection = None
+            if projection is not None:
+                child_projection = projection.select(entity, k)
+                if child_projection is SKIP:
+                    continue
+
             if type(v) == dict:
                 _, child = entity.get_child_by_name(k, k)
-                JsonDecoder._decode_json(v, child)
+                JsonDecoder._decode_json(v, child, child_projection)
             elif type(v) == list:
                 attr, child = entity.get_child_by_name(k, k)
                 if attr and child:
@@ -71,10 +333,11 @@ class JsonDecoder:
                     for ylist_item in v:
                         #creating new instance/object for each entry in yList
                         attr, child = entity.get_child_by_name(k, k)
-                        JsonDecoder._decode_json(ylist_item, child)
-                        getattr(entity, attr).append(child)
+                        child = JsonDecoder._get_list_entry(getattr(entity, attr), child, ylist_item)
+                        JsonDecoder._decode_json(ylist_item, child, child_projection)
                 else:
-                    # yleaf list
+                    # yleaf list; the values of a merged previous update are replaced
+                    JsonDecoder._clear_leaf_list(entity, k)
                     for yleaf_list_item in v:
                         entity.set_value(k, yleaf_list_item)
             else:
@@ -82,13 +345,447 @@ class JsonDecoder:
                     v = "true" if v else "false"
                 entity.set_value(k, v)
 
+    @staticmethod
+    def _clear_leaf_list(entity, name):
+        """
+        Drops the values of the leaf-list of entity named name, with or without its module prefix
+        """
+        name = name.rpartition(':')[2]
+        for attr, leaf in entity._leafs.items():
+            if (leaf[0] if isinstance(leaf, tuple) else leaf).name == name and entity.__dict__[attr]:
+                entity.__dict__[attr] = []
+
+    @staticmethod
+    def _get_list_entry(ylist, entry, entry_json):
+        """
+        Returns the entry of ylist with the keys of entry_json, e.g. of a previous update of the same decode,
+        into which entry_json is merged; entry is appended with these keys if there is none
+
+        :param ylist: YList of the entries
+        :param entry: new entry of ylist
+        :param entry_json: JSON object of the entry
+        """
+        for key in entry.ylist_key_names:
+            leaf = entry._leafs[key]
+            key_name = (leaf[0] if isinstance(leaf, tuple) else leaf).name
+            if key_name in entry_json:
+                entry.set_value(key_name, _to_leaf_value(entry_json[key_name]))
+        key = ylist._key(entry)
+        if entry.ylist_key_names and ylist.has_key(key):
+            return ylist._entity_map[key]
+        ylist.append(entry)
+        return entry
+
     @staticmethod
     def data_in_rpc_reply(response_json):
         """
-        Returns data inside the gNMI response
+        Returns the first update of the gNMI response; Codec.decode decodes all of them with decode
 
-        :param response_json: gNMI response 
+        :param response_json: gNMI response; JSON object, or JSON text as str, or utf-8 encoded
+                              bytes, bytearray or memoryview
         """
+        response_json = _load_json(response_json)
         if "notification" in response_json:
             return response_json["notification"][0]["update"][0]
         return response_json
+
+
+class _JsonReader(object):
+    """
+    Pull reader of a JSON text read in chunks. Values are parsed by json.JSONDecoder.raw_decode
+    once they are complete in the buffer; objects and arrays can also be walked member by member
+    or skipped without being parsed.
+    """
+
+    def __init__(self, chunks):
+        """
+        :param chunks: iterator of utf-8 encoded bytes chunks
+        """
+        self.chunks = chunks
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        """
+        Appends the next chunk to the buffer, dropping the text before pos
+
+        :return: False at the end of the text
+        """
+        while not self.eof:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+                text = self.text_decoder.decode(b'', True)
+            else:
+                text = self.text_decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        return False
+
+    def _error(self, message):
+        error_msg = f"Invalid JSON payload: {message}"
+        log.error(error_msg)
+        return YCodecError(error_msg)
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character; '' at the end of the text
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                return ''
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise self._error(f"expected '{character}' at '{self.buffer[self.pos:self.pos + 40]}'")
+        self.pos += 1
+
+    def read_value(self):
+        """
+        Parses and returns the next value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may go on in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as error:
+                if self.eof:
+                    raise self._error(error)
+            # incomplete value; the pending text is at least doubled before parsing again
+            pending = len(self.buffer) - self.pos
+            while len(self.buffer) - self.pos < 2 * pending and self._read():
+                pass
+
+    def skip_value(self):
+        """
+        Skips the next value; objects and arrays are scanned without being parsed
+        """
+        if self.peek() not in ('{', '['):
+            self.read_value()
+            return
+
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._read():
+                    raise self._error("unexpected end")
+                continue
+            character = match.group()
+            if character == '"':
+                string_end = _STRING_END.match(self.buffer, match.end())
+                if string_end is None:
+                    # the string goes on in the next chunk
+                    self.pos = match.start()
+                    if not self._read():
+                        raise self._error("unterminated string")
+                    continue
+                self.pos = string_end.end()
+                continue
+            self.pos = match.end()
+            depth += 1 if character in ('{', '[') else -1
+            if depth == 0:
+                return
+
+    def iter_object(self):
+        """
+        Yields the member names of the next object. At each step the reader is at the value of the member,
+        which must be read or skipped before the next step.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            name = self.read_value()
+            self.expect(':')
+            yield name
+            character = self.peek()
+            self.pos += 1
+            if character == '}':
+                return
+            if character != ',':
+                raise self._error(f"expected ',' or '}}' at '{self.buffer[self.pos - 1:self.pos + 40]}'")
+
+    def iter_array(self):
+        """
+        Yields once per item of the next array, with the reader at the item, which must be read or skipped
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            character = self.peek()
+            self.pos += 1
+            if character == ']':
+                return
+            if character != ',':
+                raise self._error(f"expected ',' or ']' at '{self.buffer[self.pos - 1:self.pos + 40]}'")
+
+
+class _EntryWalker(object):
+    """
+    Walks a JSON document with a _JsonReader down to the entries of a list; the members
+    which are not on the path of the list are skipped
+    """
+
+    def __init__(self, reader, entry_model, projection):
+        self.reader = reader
+        self.schema_path = to_schema_path(entry_model.get_absolute_path())
+        self.target = [_get_local_name(segment) for segment in segmentalize(self.schema_path)]
+        self.entry_model = entry_model
+        self.projection = projection
+        self.entry_projection = projection and projection.get_state(self.schema_path)
+        self.ancestors_key = None
+        self.parent_entity = None
+
+    def walk_document(self):
+        if self.reader.peek() != '{':
+            raise self.reader._error("expected an object")
+        yield from self._walk_envelope([])
+        if self.reader.peek():
+            raise self.reader._error(f"unexpected text at '{self.reader.buffer[self.reader.pos:self.reader.pos + 40]}'")
+
+    def _walk_envelope(self, prefix):
+        """
+        Walks a gNMI response, notification or update object, or a RESTCONF document
+
+        :param prefix: segments of the notification prefix, list of tuple(member name, dict of keys)
+        """
+        reader = self.reader
+        path = None
+        # "val" read before "path", as JSON members are not ordered
+        pending_val = None
+        has_updates = False
+        for name in reader.iter_object():
+            if name in ('notification', 'update') and reader.peek() == '[':
+                has_updates = True
+                for _ in reader.iter_array():
+                    if reader.peek() == '{':
+                        yield from self._walk_envelope(prefix)
+                    else:
+                        reader.skip_value()
+            elif name == 'prefix':
+                prefix_segments = _parse_path(reader.read_value())
+                if has_updates and prefix_segments:
+                    raise reader._error("'prefix' of a notification after its updates is not supported")
+                prefix = prefix_segments
+            elif name == 'path':
+                path = _parse_path(reader.read_value())
+            elif name == 'val':
+                if path is None:
+                    pending_val = (reader.read_value(),)
+                else:
+                    yield from self._walk_val(prefix + path)
+            elif ':' in name:
+                yield from self._walk_data([(name, {})])
+            else:
+                reader.skip_value()
+
+        if pending_val is not None:
+            yield from self._walk_read_val(prefix + (path or []), pending_val[0])
+
+    def _walk_read_val(self, segments, val):
+        """
+        Walks the value of an update which was read before the path of the update
+        """
+        reader = self.reader
+        self.reader = _JsonReader(iter([json.dumps(val).encode('utf-8')]))
+        try:
+            yield from self._walk_val(segments)
+        finally:
+            self.reader = reader
+
+    def _walk_val(self, segments):
+        """
+        Walks the value of an update at the path of segments
+        """
+        reader = self.reader
+        depth = len(self.target)
+        if not segments:
+            if reader.peek() != '{':
+                reader.skip_value()
+                return
+            for name in reader.iter_object():
+                yield from self._walk_data([(name, {})])
+        elif len(segments) > depth or (len(segments) == depth and segments[-1][1]):
+            # update of one entry, or of a node in an entry
+            val = reader.read_value()
+            entry = self._decode_update(segments, val)
+            if entry is not None:
+                yield entry
+        else:
+            yield from self._walk_data(segments)
+
+    def _walk_data(self, segments):
+        """
+        Walks the data node at the path of segments, yielding the entries below it
+        """
+        reader = self.reader
+        depth = len(segments)
+        if not self._is_on_path(segments):
+            reader.skip_value()
+            return
+
+        character = reader.peek()
+        if depth == len(self.target):
+            if character == '[':
+                for _ in reader.iter_array():
+                    entry = self._decode_entry(segments, reader.read_value())
+                    if entry is not None:
+                        yield entry
+            else:
+                entry = self._decode_entry(segments, reader.read_value())
+                if entry is not None:
+                    yield entry
+        elif character == '[':
+            # entries of an ancestor list
+            name, keys = segments[-1]
+            for _ in reader.iter_array():
+                if reader.peek() == '{':
+                    yield from self._walk_object(segments[:-1] + [(name, dict(keys))])
+                else:
+                    reader.skip_value()
+        elif character == '{':
+            yield from self._walk_object(segments)
+        else:
+            reader.skip_value()
+
+    def _walk_object(self, segments):
+        """
+        Walks the object of an ancestor of the entries; its leafs are kept as the keys of the ancestor
+        """
+        reader = self.reader
+        keys = segments[-1][1]
+        child_name = self.target[len(segments)]
+        for name in reader.iter_object():
+            if _get_local_name(name) == child_name:
+                yield from self._walk_data(segments + [(name, {})])
+            elif reader.peek() in ('{', '['):
+                reader.skip_value()
+            else:
+                value = reader.read_value()
+                if value is not None:
+                    keys[name] = _to_leaf_value(value)
+
+    def _is_on_path(self, segments):
+        return len(segments) <= len(self.target) and \
+               all(_get_local_name(name) == target for (name, _), target in zip(segments, self.target))
+
+    def _get_parent_entity(self, segments):
+        """
+        Returns the parent entity of the entries, created with the keys of its list ancestors;
+        None for a top-level list. The ancestors are created again only when they change.
+        """
+        key = tuple((name, tuple(keys.items())) for name, keys in segments[:-1])
+        if key != self.ancestors_key:
+            self.ancestors_key = key
+            self.parent_entity = None
+            if segments[:-1]:
+                entity = get_top_level_class(self.entry_model)
+                for name, keys in segments[1:-1]:
+                    attr, child = entity.get_child_by_name(name, name)
+                    if attr is None or child is None:
+                        break
+                    if isinstance(getattr(entity, attr), YList):
+                        for key_name, value in keys.items():
+                            child.set_value(key_name, value)
+                    entity = child
+                self.parent_entity = entity
+        return self.parent_entity
+
+    def _decode_entry(self, segments, entry_json):
+        """
+        Decodes the object of a list entry to a new entry of the list
+
+        :return: Entity object; None if entry_json is not an object
+        """
+        if not isinstance(entry_json, dict):
+            return None
+        parent_entity = self._get_parent_entity(segments)
+        if parent_entity is None:
+            entry = get_top_level_class(self.entry_model)
+        else:
+            name = segments[-1][0]
+            _, entry = parent_entity.get_child_by_name(name, name)
+            if entry is None:
+                return None
+        try:
+            JsonDecoder._decode_json(entry_json, entry, self.entry_projection)
+        except Exception as error:
+            log.error(error)
+            raise YCodecError(error)
+        return entry
+
+    def _decode_update(self, segments, val):
+        """
+        Decodes the value of an update into an entry or into a node of an entry
+
+        :return: the entry; None if the update is not below the list, or the path has no keys for the entry
+        """
+        depth = len(self.target)
+        if not self._is_on_path(segments[:depth]):
+            return None
+        if not segments[depth - 1][1]:
+            log.debug(f"Update path '{_format_segments(segments)}' has no keys for the entries of "
+                      f"'{self.schema_path}'; update skipped")
+            return None
+
+        top_entity = get_top_level_class(self.entry_model)
+        path = _format_segments(segments)
+        try:
+            JsonDecoder._decode_update(segmentalize(path), val, top_entity, self.projection)
+        except Exception as error:
+            log.error(error)
+            raise YCodecError(error)
+        return JsonDecoder._decode_path_to_entity(_format_segments(segments[:depth]), top_entity)
+
+
+def _load_json(response_json):
+    if isinstance(response_json, memoryview):
+        response_json = response_json.tobytes()
+    if isinstance(response_json, (str, bytes, bytearray)):
+        response_json = json.loads(response_json)
+    return response_json
+
+
+def _parse_path(path):
+    """
+    Returns the segments of a gNMI path (see JsonDecoder._get_path_and_origin),
+    as list of tuple(member name, dict of keys); the origin is not needed, as names are matched by local name
+    """
+    path, _ = JsonDecoder._get_path_and_origin(path)
+    segments = []
+    for segment in segmentalize(path):
+        if segment:
+            name, key_items = parse_key_predicate_items(segment)
+            segments.append((name, dict(key_items)))
+    return segments
+
+
+def _format_segments(segments):
+    return '/'.join(name + ''.join(f"[{key}={value}]" for key, value in keys.items()) for name, keys in segments)
+
+
+def _get_local_name(name):
+    return name.split('[')[0].rpartition(':')[2]
+
+
+def _to_leaf_value(value):
+    if type(value) == bool:
+        return "true" if value else "false"
+    return value
@@ -1,68 +1,258 @@
+import os
 import re
 import json
 import logging
-from yangkit.types import YList
+import contextlib
+from yangkit.errors import YInvalidArgumentError
+from yangkit.types import Entity, YList
 from yangkit.filters import YFilter
+from yangkit.types.types import get_leaf_name_data
 from yangkit.utilities.entity import get_bundle_name, get_bundle_yang_ns, find_prefix_in_namespace_lookup, segmentalize
+from .encoder_plan import EncoderSource, ENCODER_GLOBALS, get_encoder, get_leaf_attributes, get_child_attributes, \
+    leaf_has_data, write_entity_has_data, get_fragment, set_fragment, mark_fragments
+from .json_backend import get_json_backend
+from .gnmi_path import get_gnmi_path, format_elem
 
 log = logging.getLogger("yangkit")
 
+# bytes buffered by encode_to_stream before they are written to the sink
+STREAM_BUFFER_SIZE = 1 << 16
+
+# update granularities of encode_minimal, from the coarsest
+GRANULARITIES = ('container', 'entry', 'leaf')
+
+_member_plans = {}
+
+
 class JsonEncoder(object):
     """
     JSON Encoder Class
     """
 
     @staticmethod
-    def encode(entity, optype):
+    def encode(entity, optype, fragment_cache=False, granularity=None, structured_paths=False):
         """
         Converts an Entity object to JSON payload
 
         :param entity: Entity Object
         :param optype: Operation type
+        :param fragment_cache: caches the json object of every list entry on the entry, and reuses it
+                               in the next payloads instead of encoding the entry again, until the entry
+                               or one of its descendants is assigned (see types.invalidate_fragments).
+                               The cached objects are shared between payloads and must not be modified.
+                               Leaf-lists changed in place drop the cache too (see types.track_leaf_lists);
+                               in-place changes of Bits values are not detected, assign a new value instead.
+                               encoder_plan.clear_fragments releases the cache.
+        :param granularity: 'container', 'entry' or 'leaf' for the minimal update paths, see encode_list
+        :param structured_paths: returns the paths as gNMI path dicts {"origin": .., "elem": [..]}
+                                 built from the entity hierarchy (see gnmi_path.get_gnmi_path)
+                                 instead of xpath strings
         """
 
         if isinstance(entity, YList):
-            return JsonEncoder.encode_list(entity.entities(), optype)
+            return JsonEncoder.encode_list(entity.entities(), optype, fragment_cache, granularity, structured_paths)
 
         if not _is_edit_optype(optype):
-            return JsonEncoder._format_xpath(entity.get_absolute_path())
+            return _format_path(entity, None, structured_paths)
 
-        original_yfilter = _attach_yfilter(entity, optype)
-        top_entity = JsonEncoder._traverse_to_top_entity(entity)
+        if granularity is not None:
+            return JsonEncoder.encode_list([entity], optype, fragment_cache, granularity, structured_paths)
 
-        root, update_paths, delete_paths = {}, [], []
-        xpath = JsonEncoder._format_xpath(top_entity.get_absolute_path())
-        JsonEncoder._encode_helper(top_entity, root, delete_paths, optype)
+        return JsonEncoder._encode_update(entity, optype, fragment_cache, structured_paths)
 
-        entity.yfilter = original_yfilter
+    @staticmethod
+    def encode_many(entities, optype, fragment_cache=False, granularity=None, structured_paths=False):
+        """
+        Converts each Entity object or YList of a batch to its own update and delete paths, as encode does.
+        The granularity is validated and the encoder of each entity class is resolved once for the batch.
 
-        if root:
-            update_paths.append((xpath, root))
-        return update_paths, delete_paths
+        :param entities: iterable of Entity Objects or YLists
+        :param optype: Operation type
+        :param fragment_cache: reuses the json of unchanged list entries, see encode
+        :param granularity: 'container', 'entry' or 'leaf' for the minimal update paths, see encode_list
+        :param structured_paths: returns gNMI path dicts instead of xpath strings, see encode
+        :return: list of the payloads in entity order; the payload of an entity which cannot be encoded
+                 is replaced by the exception raised for it, and the other entities are still encoded
+        """
+        if granularity is not None and granularity not in GRANULARITIES:
+            error_msg = f"Invalid granularity '{granularity}'. Supported granularities: {list(GRANULARITIES)}"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        encoders = {}
+        payloads = []
+        for entity in entities:
+            try:
+                if not isinstance(entity, (Entity, YList)):
+                    error_msg = """Invalid 'entity' type. Expected types: yangkit.types.Entity; yangkit.types.YList."""
+                    log.error(error_msg)
+                    raise YInvalidArgumentError(error_msg)
+                if isinstance(entity, YList) or granularity is not None or not _is_edit_optype(optype):
+                    payloads.append(JsonEncoder.encode(entity, optype, fragment_cache, granularity, structured_paths))
+                else:
+                    payloads.append(JsonEncoder._encode_update(entity, optype, fragment_cache, structured_paths,
+                                                               encoders))
+            except Exception as error:
+                payloads.append(error)
+        return payloads
 
     @staticmethod
-    def encode_list(entities, optype):
+    def encode_list(entities, optype, fragment_cache=False, granularity=None, structured_paths=False):
         """
         Converts an list of Entity objects to JSON payload
 
         :param entity: Entity Object
         :param optype: Operation type
+        :param fragment_cache: reuses the json of unchanged list entries, see encode
+        :param granularity: None for one update per entity; otherwise the smallest set of update paths
+                            expressing the entities, see encode_minimal:
+                            'container' for one update per top-level container,
+                            'entry' for one update per list entry and per container holding leafs,
+                            'leaf' for one update per leaf or leaf-list
+        :param structured_paths: returns gNMI path dicts instead of xpath strings, see encode
         """
 
         if not _is_edit_optype(optype):
             get_paths = []
             for entity in entities:
-                get_paths.append(JsonEncoder._format_xpath(entity.get_absolute_path()))
+                get_paths.append(_format_path(entity, None, structured_paths))
             return get_paths
 
+        if granularity is not None:
+            return JsonEncoder.encode_minimal(entities, optype, granularity, fragment_cache, structured_paths)
+
         update_paths, delete_paths = [], []
         for entity in entities:
-            update_paths_, delete_paths_ = JsonEncoder.encode(entity, optype)
+            update_paths_, delete_paths_ = JsonEncoder.encode(entity, optype, fragment_cache,
+                                                              structured_paths=structured_paths)
             update_paths.extend(update_paths_)
             delete_paths.extend(delete_paths_)
 
         return update_paths, delete_paths
 
+    @staticmethod
+    def encode_minimal(entities, optype, granularity, fragment_cache=False, structured_paths=False):
+        """
+        Converts a list of Entity objects to the smallest set of update and delete paths expressing them,
+        e.g. for one gNMI SetRequest. The entities under the same top entity (the list entry or top-level
+        container encode climbs to) are encoded together once. The updates are merged under their
+        top-level container, the entries of a list being merged by their keys; the leafs of later updates
+        win. The merged json is then split into updates at the granularity.
+        Delete paths are deduplicated, the paths below another delete path are dropped and the rest is ordered
+        from the shallowest.
+
+        :param entities: list of Entity objects
+        :param optype: 'create', 'update' or 'delete'
+        :param granularity: 'container', 'entry' or 'leaf'; entries of keyless lists, which have no path,
+                            stay in the update of their parent
+        :param fragment_cache: reuses the json of unchanged list entries, see encode
+        :param structured_paths: returns gNMI path dicts instead of xpath strings, see encode
+        :return: tuple(list of tuple(xpath, json), list of delete xpaths)
+        """
+        if granularity not in GRANULARITIES:
+            error_msg = f"Invalid granularity '{granularity}'. Supported granularities: {list(GRANULARITIES)}"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        groups = {}
+        for entity in _iter_entities(entities):
+            top_entity = JsonEncoder._traverse_to_top_entity(entity)
+            group = groups.setdefault(id(top_entity), (top_entity, []))[1]
+            if all(member is not entity for member in group):
+                group.append(entity)
+
+        merged, indexes, delete_paths = {}, {}, []
+        for top_entity, group in groups.values():
+            original_yfilters = [_attach_yfilter(entity, optype) for entity in group]
+            root = {}
+            JsonEncoder._encode_helper(top_entity, root, delete_paths, optype, fragment_cache)
+            for entity, original_yfilter in zip(group, original_yfilters):
+                entity.yfilter = original_yfilter
+            if root:
+                _merge_update(merged, top_entity, JsonEncoder._format_xpath(top_entity.get_absolute_path()),
+                              root, indexes)
+
+        update_paths = []
+        for top_segment, (clazz, node) in merged.items():
+            updates = []
+            _split_update((), node, clazz, granularity, updates)
+            update_paths.extend((_join_path(top_segment, elems, structured_paths), value) for elems, value in updates)
+
+        xpaths = _format_delete_paths(delete_paths, False)
+        if not structured_paths:
+            return update_paths, _minimize_delete_paths(xpaths)
+        targets = dict(zip(reversed(xpaths), reversed(delete_paths)))
+        return update_paths, _format_delete_paths([targets[xpath] for xpath in _minimize_delete_paths(xpaths)], True)
+
+    @staticmethod
+    def encode_to_stream(sink, entity, optype, entries=None, backend=None, structured_paths=False):
+        """
+        Writes the json payload of an Entity object to sink as utf-8 encoded bytes, in the json form
+        of the updates and deletes of a gNMI SetRequest:
+        {"update": [{"path": xpath, "val": json}, ..], "delete": [xpath, ..]}
+        The values are the ones returned by encode. Container members are written as soon as they are encoded;
+        list entries are encoded one by one by the compiled encoders, serialized and released, so memory
+        use is bounded by the json of one list entry instead of the size of the payload.
+
+        :param sink: file path or binary file-like object, e.g. open(path, 'wb') or socket.makefile('wb')
+        :param entity: Entity Object or YList
+        :param optype: 'create', 'update' or 'delete'
+        :param entries: optional iterable (e.g. generator) of list entries to be encoded under
+                        the ancestors of 'entity', which must be the YList they belong to.
+                        Entries are encoded one by one and are not appended to the YList.
+        :param backend: json backend serializing the values, see json_backend.get_json_backend;
+                        orjson if it is installed, the standard library json otherwise
+        :param structured_paths: writes gNMI path objects instead of xpath strings, see encode
+        """
+
+        if not isinstance(entity, (Entity, YList)):
+            error_msg = """Invalid 'entity' type. Expected types: yangkit.types.Entity; yangkit.types.YList; """
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if entries is not None and not isinstance(entity, YList):
+            error_msg = "Argument 'entity' should be the YList holding 'entries'"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if not _is_edit_optype(optype):
+            error_msg = f"Streaming json encode is not supported for '{optype}'"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        dumps = get_json_backend(backend)
+        if entries is None:
+            entries = entity if isinstance(entity, YList) else [entity]
+
+        with _open_sink(sink) as stream:
+            writer = _JsonStreamWriter(stream)
+            delete_paths, deleted = [], []
+            separator = b''
+            writer.write(b'{"update":[')
+            for item in entries:
+                detached = isinstance(entity, YList) and item.parent is None
+                if detached:
+                    item.parent = entity.parent
+                try:
+                    original_yfilter = _attach_yfilter(item, optype)
+                    top_entity = JsonEncoder._traverse_to_top_entity(item)
+                    path = _format_path(top_entity, None, structured_paths)
+                    opening = separator + b'{"path":' + dumps(path) + b',"val":{'
+                    _, written = _stream_entity(top_entity, writer, opening, delete_paths, optype, dumps)
+                    item.yfilter = original_yfilter
+                    # formatted now, as entries may be reused by their generator
+                    deleted.extend(_format_delete_paths(delete_paths, structured_paths))
+                    delete_paths.clear()
+                finally:
+                    if detached:
+                        # the entries are left detached, as they were passed
+                        item.parent = None
+                if written:
+                    writer.write(b'}')
+                    separator = b','
+            writer.write(b'],"delete":' + dumps(deleted) + b'}')
+            writer.flush()
+
     @staticmethod
     def _traverse_to_top_entity(entity):
         """
@@ -75,53 +265,50 @@ class JsonEncoder(object):
         return entity
 
     @staticmethod
-    def _encode_helper(entity, root, delete_paths, optype):
+    def _encode_update(entity, optype, fragment_cache=False, structured_paths=False, encoders=None):
         """
-        Populates the root element by parsing entity in a reccursive manner
+        Encodes the update of an Entity object from the top entity it belongs to, see encode
 
-        :param entity: Entity object to be encoded
-        :param root: root of json
-        :param optype: Operation type
-        :param is_filter: Bool
+        :param entity: Entity Object
+        :param optype: 'create', 'update' or 'delete'
+        :param fragment_cache: reuses the json of unchanged list entries
+        :param structured_paths: returns gNMI path dicts instead of xpath strings
+        :param encoders: dict(class: encoder) of the batch being encoded, see encode_many
+        :return: tuple(list of tuple(path, json), list of delete paths)
         """
-        if not entity.has_data():
-            return
+        original_yfilter = _attach_yfilter(entity, optype)
+        top_entity = JsonEncoder._traverse_to_top_entity(entity)
 
-        if entity.yfilter == YFilter.delete:
-            delete_paths.append(JsonEncoder._format_xpath(entity.get_absolute_path()))
-            return
+        root, update_paths, delete_paths = {}, [], []
+        path = _format_path(top_entity, None, structured_paths)
+        JsonEncoder._encode_helper(top_entity, root, delete_paths, optype, fragment_cache, encoders)
 
-        # creates leaf elements
-        for name_value in entity.get_name_leaf_data():
-            leaf_name = name_value[0]
-            leaf_data = name_value[1]
+        entity.yfilter = original_yfilter
 
-            if leaf_data.yfilter == YFilter.delete:
-                delete_paths.append(JsonEncoder._format_xpath(f"{entity.get_absolute_path()}/{leaf_name}"))
-            elif leaf_data.is_set:
-                JsonEncoder._create_leaf_ele(leaf_name, leaf_data, root)
+        if root:
+            update_paths.append((path, root))
+        return update_paths, _format_delete_paths(delete_paths, structured_paths)
 
-        for _, child in entity.get_children().items():
-            # appends child json to root
-            child_elem = {}
-            JsonEncoder._encode_helper(child, child_elem, delete_paths, optype)
-            if child_elem:
-                # add prefix to child name if child's prefix is different from that of parent
-                bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(child))
-                prefix, _ = find_prefix_in_namespace_lookup(child.get_segment_path(), bundle_yang_ns)
-                if prefix:
-                    child_name_with_prefix = f"{prefix}:{child.yang_name}"
-                else:
-                    child_name_with_prefix = child.yang_name
+    @staticmethod
+    def _encode_helper(entity, root, delete_paths, optype, fragment_cache=False, encoders=None):
+        """
+        Populates the root element with the encoder compiled for the class of entity,
+        which encodes its children in a reccursive manner
+
+        :param entity: Entity object to be encoded
+        :param root: root of json
+        :param optype: Operation type
+        :param fragment_cache: reuses the json of unchanged list entries
+        :param encoders: dict(class: encoder) caching the encoders of a batch, see encode_many
+        """
+        if encoders is None:
+            encode = get_encoder(entity, 'JSON', optype, _compile_encoder)
+        else:
+            encode = encoders.get(entity.__class__)
+            if encode is None:
+                encode = encoders[entity.__class__] = get_encoder(entity, 'JSON', optype, _compile_encoder)
+        encode(entity, root, delete_paths, fragment_cache)
 
-                if hasattr(child, "ylist_key") and child.ylist_key is not None:
-                    # ylist item
-                    if not child_name_with_prefix in root:
-                        root[child_name_with_prefix] = []
-                    root[child_name_with_prefix].append(child_elem)
-                else:
-                    root[child_name_with_prefix] = child_elem
-    
     @staticmethod
     def _create_leaf_ele(leaf_name, leaf_data, parent_json):
         """
@@ -185,6 +372,413 @@ class JsonEncoder(object):
         return json.dumps(json_obj, indent=4)
 
 
+def _compile_encoder(entity, optype):
+    """
+    Compiles the encoder of the class of entity. Member name, leaf order and child order
+    are resolved once and hard-coded; the output is the one of the reflective encoding of
+    get_name_leaf_data() and get_children(). Entity.has_data() is computed bottom-up while
+    encoding, the members of an entity without data are discarded.
+
+    :param entity: Entity object
+    :param optype: Operation type
+    :return: function(entity, root, delete_paths, fragment_cache) returning has_data; its 'member_name'
+             attribute is the name of the entity in the json of its parent
+    """
+    member_name = _get_member_name(entity)
+
+    global_names = dict(ENCODER_GLOBALS, OPTYPE=optype, _encode_leaf=_encode_leaf, _encode_child=_encode_child,
+                        mark_fragments=mark_fragments)
+
+    source = EncoderSource('def encode(entity, root, delete_paths, fragment_cache):')
+    source.writeln("d = entity.__dict__")
+    source.writeln("yfilter = d['yfilter']")
+    source.writeln("if yfilter is DELETE:")
+    source.writeln("    if not entity.has_data():")
+    source.writeln("        if fragment_cache:")
+    source.writeln("            # the children are not encoded, but their changes can give data to entity")
+    source.writeln("            mark_fragments(entity, True)")
+    source.writeln("        return False")
+    source.writeln("    delete_paths.append((entity, None))")
+    source.writeln("    return True")
+    source.writeln("leafs = d['_leafs']")
+    source.writeln("logger = d['_logger']")
+    write_entity_has_data(source, entity)
+
+    for name in get_leaf_attributes(entity):
+        source.writeln(f"value = d[{name!r}]")
+        source.writeln("if value is not None:")
+        source.writeln(f"    data = _encode_leaf(entity, root, delete_paths, leafs[{name!r}], {name!r}, value, logger) "
+                       "or data")
+
+    for name, is_list in get_child_attributes(entity):
+        if is_list:
+            source.writeln(f"for child in d[{name!r}]:")
+            source.writeln("    if isinstance(child, Entity):")
+            source.writeln("        data = _encode_child(child, root, delete_paths, OPTYPE, fragment_cache) or data")
+        else:
+            source.writeln(f"value = d[{name!r}]")
+            source.writeln("if isinstance(value, Entity):")
+            source.writeln("    data = _encode_child(value, root, delete_paths, OPTYPE, fragment_cache) or data")
+
+    source.writeln("if not data:")
+    source.writeln("    root.clear()")
+    source.writeln("return data")
+
+    clazz = entity.__class__
+    encode = source.compile(f'<JSON {optype} encoder of {clazz.__module__}.{clazz.__qualname__}>', global_names)
+    encode.member_name = member_name
+    return encode
+
+
+def _get_member_name(entity):
+    """
+    Returns the name of entity in the json of its parent
+    """
+    # add prefix to member name if it is in the segment path
+    bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(entity))
+    prefix, _ = find_prefix_in_namespace_lookup(entity.get_segment_path(), bundle_yang_ns)
+    return f"{prefix}:{entity.yang_name}" if prefix else entity.yang_name
+
+
+def _get_member_plan(clazz):
+    """
+    Returns dict(member name: tuple(class, key leaf names)) of the container and list children
+    of an entity class; the key leaf names are None for containers. Entity classes are instantiated
+    once per process to read their members.
+    """
+    plan = _member_plans.get(clazz)
+    if plan is None:
+        entity = clazz()
+        plan = {}
+        for attr, child_clazz in entity._child_classes.values():
+            child = child_clazz()
+            key_names = None
+            if isinstance(entity.__dict__.get(attr), YList):
+                key_names = tuple(_get_leaf_name(child._leafs[key]) for key in child.ylist_key_names)
+            plan[_get_member_name(child)] = (child_clazz, key_names)
+        _member_plans[clazz] = plan
+    return plan
+
+
+def _get_leaf_name(leaf_tuple):
+    leaf = leaf_tuple[0] if isinstance(leaf_tuple, tuple) else leaf_tuple
+    return leaf.name
+
+
+def _merge_update(merged, top_entity, xpath, root, indexes):
+    """
+    Merges the json of an update into the json of its top-level container in merged
+
+    :param merged: dict(top-level segment: tuple(class, json))
+    :param top_entity: entity encoded to root
+    :param xpath: path of top_entity
+    :param root: json of top_entity
+    :param indexes: dict(id of a json list: dict(key values: entry)), see _get_list_entry
+    """
+    segments = segmentalize(xpath)
+    root_entity = top_entity
+    while root_entity.parent is not None:
+        root_entity = root_entity.parent
+    clazz, node = merged.setdefault(segments[0], (root_entity.__class__, {}))
+    for segment in segments[1:]:
+        member = segment.split('[')[0]
+        clazz, key_names = _get_member_plan(clazz)[member]
+        if key_names is None:
+            node = node.setdefault(member, {})
+        else:
+            keys = dict(key.split('=', 1) for key in re.findall(r'\[(.*?)\]', segment))
+            node = _get_list_entry(node.setdefault(member, []), key_names,
+                                   tuple(keys.get(name) for name in key_names), indexes)
+    _merge_json(node, root, clazz, indexes)
+
+
+def _merge_json(node, value, clazz, indexes):
+    """
+    Merges the json of an entity of class clazz into node; the json is copied, as it may be a cached fragment
+    """
+    plan = _get_member_plan(clazz)
+    for member, member_value in value.items():
+        child_clazz, key_names = plan.get(member, (None, None))
+        if child_clazz is None:
+            # leaf or leaf-list
+            node[member] = member_value
+        elif key_names is None:
+            _merge_json(node.setdefault(member, {}), member_value, child_clazz, indexes)
+        else:
+            entries = node.setdefault(member, [])
+            for entry_value in member_value:
+                entry = _get_list_entry(entries, key_names, tuple(entry_value.get(name) for name in key_names),
+                                        indexes)
+                _merge_json(entry, entry_value, child_clazz, indexes)
+
+
+def _get_list_entry(entries, key_names, key_values, indexes):
+    """
+    Returns the entry of a json list with key_values, appending it if there is none;
+    entries of keyless lists are always appended
+    """
+    index = indexes.setdefault(id(entries), {})
+    entry = index.get(key_values) if key_names else None
+    if entry is None:
+        entry = {name: value for name, value in zip(key_names, key_values) if value is not None}
+        entries.append(entry)
+        index[key_values] = entry
+    return entry
+
+
+def _split_update(elems, node, clazz, granularity, update_paths):
+    """
+    Appends the updates of the json of the node at elems (gNMI path elems below the top-level container)
+    to update_paths, split at granularity
+    """
+    if granularity == 'container' or not node:
+        update_paths.append((elems, node))
+        return
+
+    plan = _get_member_plan(clazz)
+    own, nested = {}, []
+    for member, value in node.items():
+        child_clazz, key_names = plan.get(member, (None, None))
+        if child_clazz is None:
+            if granularity == 'leaf':
+                nested.append((elems + ({"name": member},), value, None, False))
+            else:
+                own[member] = value
+        elif key_names is None:
+            nested.append((elems + ({"name": member},), value, child_clazz, False))
+        elif not key_names:
+            # entries of a keyless list have no path
+            own[member] = value
+        else:
+            for entry in value:
+                elem = {"name": member, "key": {name: entry[name] for name in key_names if name in entry}}
+                nested.append((elems + (elem,), entry, child_clazz, True))
+
+    if own:
+        update_paths.append((elems, own))
+    for child_elems, value, child_clazz, is_entry in nested:
+        if child_clazz is None or (is_entry and granularity == 'entry'):
+            update_paths.append((child_elems, value))
+        else:
+            _split_update(child_elems, value, child_clazz, granularity, update_paths)
+
+
+def _join_path(top_segment, elems, structured_paths):
+    """
+    Returns the path of the elems below a top-level container, as xpath or as gNMI path dict
+    """
+    if structured_paths:
+        origin, _, name = top_segment.rpartition(':')
+        return {"origin": origin, "elem": [{"name": name}] + list(elems)}
+    return '/'.join([top_segment] + [format_elem(elem) for elem in elems])
+
+
+def _format_path(entity, leaf_name, structured_paths):
+    """
+    Returns the path of entity, or of its leaf leaf_name, as xpath or as gNMI path dict
+    """
+    if structured_paths:
+        return get_gnmi_path(entity, leaf_name)
+    path = entity.get_absolute_path()
+    return JsonEncoder._format_xpath(f"{path}/{leaf_name}" if leaf_name is not None else path)
+
+
+def _format_delete_paths(delete_paths, structured_paths):
+    """
+    Returns the paths of the deleted nodes collected by the encoders
+
+    :param delete_paths: list of tuple(entity, leaf name or None)
+    """
+    return [_format_path(entity, leaf_name, structured_paths) for entity, leaf_name in delete_paths]
+
+
+def _iter_entities(entities):
+    """
+    Yields the entities of a list, and the entries of its YLists
+    """
+    for entity in entities:
+        if isinstance(entity, YList):
+            yield from entity.entities()
+        else:
+            yield entity
+
+
+def _minimize_delete_paths(delete_paths):
+    """
+    Returns the delete paths without duplicates and without the paths below another delete path,
+    from the shallowest; paths of the same depth keep their order
+    """
+    paths = set(delete_paths)
+    minimal = {}
+    for path in delete_paths:
+        segments = segmentalize(path)
+        if path not in minimal and \
+                not any('/'.join(segments[:index]) in paths for index in range(1, len(segments))):
+            minimal[path] = len(segments)
+    return sorted(minimal, key=minimal.get)
+
+
+def _encode_child(child, root, delete_paths, optype, fragment_cache=False):
+    """
+    Encodes a child entity with the encoder compiled for its class and appends its json to root
+
+    :return: True if child has data
+    """
+    encode = get_encoder(child, 'JSON', optype, _compile_encoder)
+    if fragment_cache and child.ylist_key is not None:
+        # list entry; the json is cached only if it has no delete paths, which depend on the keys of ancestors
+        key = ('JSON', optype)
+        fragment = get_fragment(child, key)
+        if fragment is not None:
+            child_elem, data = fragment
+        else:
+            child_elem = {}
+            delete_count = len(delete_paths)
+            data = encode(child, child_elem, delete_paths, fragment_cache)
+            set_fragment(child, key, (child_elem, data) if len(delete_paths) == delete_count else None)
+    else:
+        child_elem = {}
+        data = encode(child, child_elem, delete_paths, fragment_cache)
+        if fragment_cache:
+            mark_fragments(child)
+
+    if child_elem:
+        if child.ylist_key is not None:
+            # ylist item
+            root.setdefault(encode.member_name, []).append(child_elem)
+        else:
+            root[encode.member_name] = child_elem
+    return data
+
+
+def _stream_entity(entity, writer, opening, delete_paths, optype, dumps):
+    """
+    Writes the json object of a container (or of the top entity) member by member, with the checks
+    of the compiled encoder; list entries are encoded by the compiled encoders. Nothing is written
+    before the first member, so that objects left empty by encode are omitted: 'opening' is written
+    before it, e.g. b',"name":{', together with the leafs of entity.
+
+    :param entity: Entity object
+    :param writer: _JsonStreamWriter
+    :param opening: bytes preceding the first member of the object
+    :param delete_paths: list of the deleted nodes, as tuple(entity, leaf name or None)
+    :param optype: Operation type
+    :param dumps: function serializing json values to bytes
+    :return: tuple(True if entity has data, True if the object is written)
+    """
+    d = entity.__dict__
+    yfilter = d['yfilter']
+    if yfilter is YFilter.delete:
+        if not entity.has_data():
+            return False, False
+        delete_paths.append((entity, None))
+        return True, False
+
+    data = bool(d.get('is_presence_container')) or (isinstance(yfilter, YFilter) and yfilter is not YFilter.not_set)
+    top_entity = d.get('_top_entity')
+    if isinstance(top_entity, Entity) and top_entity.has_data():
+        data = True
+
+    leafs, logger, members = d['_leafs'], d['_logger'], {}
+    for name in get_leaf_attributes(entity):
+        value = d[name]
+        if value is not None:
+            data = _encode_leaf(entity, members, delete_paths, leafs[name], name, value, logger) or data
+
+    # the leafs are written with the first child, or at the end
+    pending = opening + dumps(members)[1:-1] if members else opening
+    separator = b',' if members else b''
+    opened = False
+    for name, is_list in get_child_attributes(entity):
+        if is_list:
+            in_array = False
+            for child in d[name]:
+                if not isinstance(child, Entity):
+                    continue
+                encode = get_encoder(child, 'JSON', optype, _compile_encoder)
+                child_json = {}
+                data = encode(child, child_json, delete_paths, False) or data
+                if not child_json:
+                    continue
+                if in_array:
+                    writer.write(b',' + dumps(child_json))
+                else:
+                    writer.write(pending + separator + dumps(encode.member_name) + b':[' + dumps(child_json))
+                    pending, separator, opened, in_array = b'', b',', True, True
+            if in_array:
+                writer.write(b']')
+        else:
+            value = d[name]
+            if isinstance(value, Entity):
+                member_name = get_encoder(value, 'JSON', optype, _compile_encoder).member_name
+                child_opening = pending + separator + dumps(member_name) + b':{'
+                child_data, written = _stream_entity(value, writer, child_opening, delete_paths, optype, dumps)
+                data = child_data or data
+                if written:
+                    pending, separator, opened = b'', b',', True
+
+    if opened:
+        writer.write(b'}')
+        return data, True
+    if data and members:
+        writer.write(pending + b'}')
+        return data, True
+    return data, False
+
+
+class _JsonStreamWriter(object):
+    """
+    Writes bytes to a binary stream in chunks of STREAM_BUFFER_SIZE
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= STREAM_BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write(bytes(self.buffer))
+            self.buffer.clear()
+
+
+@contextlib.contextmanager
+def _open_sink(sink):
+    """
+    Opens sink for writing if it is a file path; file-like objects are left open
+    """
+    if isinstance(sink, (str, os.PathLike)):
+        with open(sink, 'wb') as stream:
+            yield stream
+    else:
+        yield sink
+
+
+def _encode_leaf(entity, root, delete_paths, leaf_tuple, name, value, logger):
+    """
+    Adds the json of a leaf or leaf-list attribute to root, or its path to delete_paths
+
+    :param entity: Entity object
+    :param root: json of entity
+    :param delete_paths: list of the deleted nodes, as tuple(entity, leaf name or None)
+    :param leaf_tuple: entry of Entity._leafs for the attribute
+    :param name: attribute name
+    :param value: attribute value, not None
+    :param logger: logger of the entity
+    :return: True if the attribute makes the entity have data
+    """
+    for leaf_name, leaf_data in get_leaf_name_data(leaf_tuple, name, value, logger):
+        if leaf_data.yfilter == YFilter.delete:
+            delete_paths.append((entity, leaf_name))
+        elif leaf_data.is_set:
+            JsonEncoder._create_leaf_ele(leaf_name, leaf_data, root)
+    return leaf_has_data(leaf_tuple, value)
+
+
 def _is_edit_optype(optype):
     """
     Checks whether the operation is edit-config or not
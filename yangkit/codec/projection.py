@@ -0,0 +1,186 @@
+from yangkit.utilities.logger import log
+from yangkit.errors import YInvalidArgumentError
+from yangkit.utilities.entity import segmentalize
+from yangkit.utilities.schema_index import to_schema_path
+
+# decision of ProjectionState.select for a member which is not decoded
+SKIP = False
+
+_leaf_names_below = {}
+
+
+class Projection(object):
+    """
+    Set of schema paths and leaf names to be decoded; the other members of a payload are skipped,
+    without creating their entities or converting their values.
+
+    A schema path, e.g. "Cisco-IOS-XR-ifmgr-oper:interface-properties/data-nodes/data-node/system-view",
+    selects its node with the whole subtree; key predicates in the path are ignored.
+    A leaf name, e.g. "interface-name", selects the leafs (and nodes) of that name anywhere in the tree.
+    The keys of decoded list entries are always decoded, so that entries can be identified.
+
+    Example:
+        projection = Projection(["openconfig-interfaces:interfaces/interface/state/counters", "name"])
+        interfaces = Codec.decode(payload, Interfaces(), "XML", projection=projection)
+    """
+
+    def __init__(self, items):
+        """
+        :param items: iterable of schema paths and leaf names
+        """
+        if isinstance(items, str):
+            items = [items]
+
+        self.names = set()
+        self._paths = {}
+        for item in items:
+            if not isinstance(item, str) or not item:
+                error_msg = f"Invalid projection item '{item}'. Expected a schema path or a leaf name"
+                log.error(error_msg)
+                raise YInvalidArgumentError(error_msg)
+            if '/' in item or ':' in item:
+                self._add_path(item)
+            else:
+                self.names.add(item)
+
+        if not self.names and not self._paths:
+            error_msg = "Projection is empty"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        self._names_state = ProjectionState(self, None)
+
+    def _add_path(self, path):
+        """
+        Adds a schema path to the trie of paths, which maps local names to the trie of the child nodes;
+        None marks a selected subtree
+        """
+        segments = segmentalize(to_schema_path(path))
+        trie = self._paths
+        for segment in segments[:-1]:
+            name = _get_local_name(segment)
+            if name in trie and trie[name] is None:
+                # an ancestor is already selected
+                return
+            trie = trie.setdefault(name, {})
+        trie[_get_local_name(segments[-1])] = None
+
+    def get_state(self, absolute_path):
+        """
+        Returns the ProjectionState of the entity at absolute_path; None if its whole subtree is selected
+
+        :param absolute_path: absolute path of the entity, e.g. the one of the top-level container
+        """
+        trie = self._paths
+        for segment in segmentalize(to_schema_path(absolute_path)):
+            name = _get_local_name(segment)
+            if name in self.names:
+                return None
+            if trie is not None and name in trie:
+                trie = trie[name]
+                if trie is None:
+                    return None
+            else:
+                trie = None
+        return ProjectionState(self, trie) if trie is not None else self._names_state
+
+
+class ProjectionState(object):
+    """
+    Projection in effect at a node of the decoded tree. The decisions are cached per entity class
+    and member name; the states of the child nodes are shared by all the entities they apply to.
+    """
+
+    def __init__(self, projection, trie):
+        """
+        :param projection: Projection
+        :param trie: trie of the paths below the node; None if the node is not on a projection path
+        """
+        self.projection = projection
+        self.trie = trie
+        self._decisions = {}
+
+    def select(self, entity, name):
+        """
+        Returns the decision for the member of entity named name: None to decode the member
+        with its whole subtree, SKIP to skip it, or the ProjectionState of the child node
+
+        :param entity: Entity object being decoded
+        :param name: member name, as '{namespace}name' XML tag, 'prefix:name' or 'name'
+        """
+        key = (entity.__class__, name)
+        try:
+            return self._decisions[key]
+        except KeyError:
+            decision = self._decisions[key] = self._resolve(entity, _get_local_name(name))
+            return decision
+
+    def _resolve(self, entity, name):
+        names, trie = self.projection.names, self.trie
+        on_path = trie is not None and name in trie
+
+        for attr, leaf in entity._leafs.items():
+            leaf = leaf[0] if isinstance(leaf, tuple) else leaf
+            if _get_local_name(leaf.name) == name:
+                key_names = getattr(entity, 'ylist_key_names', None) or []
+                if name in names or (on_path and trie[name] is None) or attr in key_names:
+                    return None
+                return SKIP
+
+        clazz = _get_child_class(entity, name)
+        if clazz is None:
+            # not a member of entity; skipped by the decoder anyway
+            return SKIP
+        if name in names:
+            return None
+        if on_path:
+            return None if trie[name] is None else ProjectionState(self.projection, trie[name])
+        if names & _get_leaf_names_below(clazz):
+            return self.projection._names_state
+        return SKIP
+
+
+def _get_local_name(name):
+    """
+    Strips the namespace of an lxml tag, or the prefix of a YANG name, from name
+    """
+    return name.rpartition('}')[2].rpartition(':')[2]
+
+
+def _get_child_class(entity, name):
+    """
+    Returns the class of the container or list child of entity whose local name is name; None if there is none
+    """
+    for yang_name, (_, clazz) in entity._child_classes.items():
+        if _get_local_name(yang_name) == name:
+            return clazz
+    return None
+
+
+def _get_leaf_names_below(clazz):
+    """
+    Returns the local names of the leafs and leaf-lists of the subtree of an entity class.
+    Entity classes are instantiated once per process to read their members.
+    """
+    leaf_names = _leaf_names_below.get(clazz)
+    if leaf_names is None:
+        entity = clazz()
+        leaf_names = set()
+        for leaf in entity._leafs.values():
+            leaf = leaf[0] if isinstance(leaf, tuple) else leaf
+            leaf_names.add(_get_local_name(leaf.name))
+        for _, child_clazz in entity._child_classes.values():
+            leaf_names.update(_get_leaf_names_below(child_clazz))
+        leaf_names = _leaf_names_below[clazz] = frozenset(leaf_names)
+    return leaf_names
+
+
+def get_projection(projection):
+    """
+    Returns projection as a Projection object; None if projection is None
+
+    :param projection: Projection, or iterable of schema paths and leaf names
+    """
+    if projection is None or isinstance(projection, Projection):
+        return projection
+    return Projection(projection)
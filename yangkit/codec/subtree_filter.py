@@ -0,0 +1,290 @@
+from lxml import etree
+from yangkit.utilities.logger import log
+from yangkit.types import Entity, YList
+from yangkit.filters import YFilter
+from yangkit.errors import YInvalidArgumentError
+from yangkit.utilities.entity import segmentalize, parse_key_predicate_items, get_top_level_class_of_path, \
+    get_ylist_entry
+from yangkit.utilities.schema_index import get_schema_index, SchemaLeaf
+from .xml_encoder import XmlEncoder, NETCONF_NS, _NamespaceContext
+
+FILTER_TAG = '{' + NETCONF_NS + '}filter'
+
+
+class SubtreeFilter(object):
+    """
+    Builds one NETCONF subtree filter (RFC 6241, section 6) out of several read targets.
+
+    Every target is reduced to its minimal subtree: containment nodes for its ancestors,
+    content match nodes for list keys and set leafs, and a selection node for the target itself
+    (or for the leafs marked with YFilter.read). Targets from different subtrees and modules
+    are merged into a single '<filter>' element; a target that is already selected
+    by another one is dropped.
+
+    Example:
+        subtree_filter = SubtreeFilter(bundle_name='cisco_ios_xr')
+        subtree_filter.add(interface_entity)
+        subtree_filter.add("Cisco-IOS-XR-ifmgr-cfg:interface-configurations/interface-configuration[active='act'][interface-name='Gi0/0/0/0']/description")
+        payload = subtree_filter.to_string()
+    """
+
+    def __init__(self, bundle_name=None):
+        """
+        :param bundle_name: bundle of the path targets, e.g. 'cisco_ios_xr'; not needed for Entity targets
+        """
+        self.bundle_name = bundle_name
+        self._nodes = []
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def add(self, target):
+        """
+        Adds a read target to the filter
+
+        :param target: Entity object, YList, absolute path of a container, list or leaf, or a list of them.
+                       Keys of list segments in paths become content match nodes;
+                       a list segment without keys selects all the entries of the list, or the nodes
+                       below it in all the entries, e.g. "test-if:interfaces/interface/mtu".
+        :return: self
+        """
+        if isinstance(target, list):
+            for item in target:
+                self.add(item)
+            return self
+
+        if isinstance(target, str):
+            target = self._get_path_entity(target)
+
+        if isinstance(target, YList) and not len(target):
+            # an entry without keys selects all the entries
+            target = get_ylist_entry(target)
+
+        if not isinstance(target, (Entity, YList)):
+            error_msg = """Invalid 'target' type. Expected types: yangkit.types.Entity; yangkit.types.YList; str."""
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        element = XmlEncoder.encode_element(target, 'read')
+        _merge_node(self._nodes, _FilterNode.from_element(element))
+        return self
+
+    def to_element(self):
+        """
+        Returns the '<filter type="subtree">' lxml element, which can be appended to a '<get>'
+        or '<get-config>' element
+        """
+        ns_context = _NamespaceContext()
+        for node in self._nodes:
+            node.allocate_identity_prefixes(ns_context)
+
+        nsmap = {None: NETCONF_NS}
+        for name_space, prefix in ns_context.identity_prefixes.items():
+            nsmap[prefix] = name_space
+
+        element = etree.Element(FILTER_TAG, nsmap=nsmap)
+        element.set('type', 'subtree')
+        for node in self._nodes:
+            node.write(element, NETCONF_NS, ns_context)
+        return element
+
+    def to_string(self, pretty_print=False, as_bytes=False):
+        """
+        Returns the '<filter type="subtree">' payload
+
+        :param pretty_print: indents the payload; compact otherwise
+        :param as_bytes: returns utf-8 encoded bytes instead of str
+        """
+        return XmlEncoder.to_string(self.to_element(), pretty_print, as_bytes)
+
+    def _get_path_entity(self, path):
+        """
+        Creates the entity of an absolute path, with the keys of its list segments set.
+        A leaf at the end of path is set to YFilter.read.
+        The path is validated against the bundle's schema index, if any, before any class is instantiated.
+
+        :param path: absolute path
+        """
+        if not self.bundle_name:
+            error_msg = f"'bundle_name' is required for the path target '{path}'"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        schema_object = None
+        schema_index = get_schema_index(self.bundle_name)
+        if schema_index is not None:
+            schema_object = schema_index.validate_path(path)
+
+        entity = get_top_level_class_of_path(self.bundle_name, path)
+        segments = segmentalize(path)
+        for index, segment in enumerate(segments[1:], 1):
+            yang_name, key_items = parse_key_predicate_items(segment)
+            attr, child = entity.get_child_by_name(yang_name, "")
+            if child is not None:
+                if isinstance(getattr(entity, attr), YList):
+                    for key_name, key_value in key_items:
+                        child.set_value(key_name, key_value)
+                    if not key_items and index == len(segments) - 1:
+                        # all the entries of the list
+                        return getattr(entity, attr)
+                    # an entry without keys selects the nodes below it in all the entries (RFC 6241 6.2.5)
+                    getattr(entity, attr).append(child)
+                entity = child
+                continue
+
+            if isinstance(schema_object, SchemaLeaf) and index == len(segments) - 1:
+                leaf_attr = schema_object.attr
+            else:
+                leaf_attr = _get_leaf_attribute(entity, yang_name)
+            if leaf_attr is None or index != len(segments) - 1:
+                error_msg = f"'{segment}' of '{path}' is not a child of '{entity.yang_name}'"
+                log.error(error_msg)
+                raise YInvalidArgumentError(error_msg)
+            setattr(entity, leaf_attr, YFilter.read)
+
+        return entity
+
+
+class _FilterNode(object):
+    """
+    Node of a subtree filter. Content match nodes are the leafs with a value.
+    """
+
+    def __init__(self, tag, text=None, text_ns=None):
+        """
+        :param tag: '{namespace}name' of the node
+        :param text: value of a content match node
+        :param text_ns: namespace of the identityref value in text, which has no prefix
+        """
+        self.tag = tag
+        self.text = text
+        self.text_ns = text_ns
+        self.children = []
+
+    @staticmethod
+    def from_element(element):
+        """
+        Creates the node tree of an lxml element. Tags are qualified with the default namespace
+        in effect, as the encoder creates unqualified tags under default namespace declarations.
+        Prefixed identityref values are stored with their namespace, so that values of
+        different documents compare equal. Leafs with an empty value are skipped.
+
+        :param element: lxml element
+        """
+        tag = element.tag
+        default_ns = element.nsmap.get(None)
+        if default_ns and not tag.startswith('{'):
+            tag = f'{{{default_ns}}}{tag}'
+
+        text = element.text
+        text_ns = None
+        if text and ':' in text:
+            prefix, value = text.split(':', 1)
+            if prefix in element.nsmap:
+                text, text_ns = value, element.nsmap[prefix]
+
+        node = _FilterNode(tag, text, text_ns)
+        for child in element:
+            if child.text == '' and not len(child):
+                # leaf without value, e.g. an unset Bits leaf; it is neither a content match nor a selection
+                continue
+            _merge_node(node.children, _FilterNode.from_element(child))
+        return node
+
+    @property
+    def is_content_match(self):
+        return self.text is not None and not self.children
+
+    @property
+    def is_selection(self):
+        return self.text is None and not self.children
+
+    @property
+    def selects_all(self):
+        """
+        True if the node selects its whole subtree, i.e. it has no selection or containment child nodes
+        """
+        return all(child.is_content_match for child in self.children)
+
+    @property
+    def key(self):
+        """
+        Tag and content match conditions; nodes can be merged only if their keys are the same
+        """
+        matches = frozenset((child.tag, child.text, child.text_ns) for child in self.children if child.is_content_match)
+        return self.tag, self.text, self.text_ns, matches
+
+    def allocate_identity_prefixes(self, ns_context):
+        if self.text_ns is not None:
+            ns_context.get_identity_prefix(self.text_ns)
+        for child in self.children:
+            child.allocate_identity_prefixes(ns_context)
+
+    def write(self, parent, parent_ns, ns_context):
+        """
+        Creates the element of the node under parent
+
+        :param parent: lxml element
+        :param parent_ns: default namespace in effect at parent
+        :param ns_context: _NamespaceContext holding the identityref prefixes declared on the filter
+        """
+        ns = etree.QName(self.tag).namespace
+        nsmap = {None: ns} if ns and ns != parent_ns else {}
+        element = etree.SubElement(parent, self.tag, nsmap=nsmap)
+        if self.text_ns is not None:
+            element.text = f'{ns_context.get_identity_prefix(self.text_ns)}:{self.text}'
+        else:
+            element.text = self.text
+        for child in self.children:
+            child.write(element, ns or parent_ns, ns_context)
+
+
+def _merge_node(nodes, node):
+    """
+    Merges node into the sibling nodes
+
+    :param nodes: list of _FilterNode
+    :param node: _FilterNode
+    """
+    if node.is_content_match:
+        if all(sibling.key != node.key for sibling in nodes):
+            nodes.append(node)
+        return
+
+    if any(sibling.is_selection and sibling.tag == node.tag for sibling in nodes):
+        # already selected
+        return
+
+    if node.is_selection:
+        # selects all the other nodes of the same name
+        nodes[:] = [sibling for sibling in nodes if sibling.is_content_match or sibling.tag != node.tag]
+        nodes.append(node)
+        return
+
+    key = node.key
+    for sibling in nodes:
+        if not sibling.is_content_match and sibling.key == key:
+            break
+    else:
+        nodes.append(node)
+        return
+
+    if sibling.selects_all:
+        return
+    if node.selects_all:
+        sibling.children = node.children
+        return
+    for child in node.children:
+        if not child.is_content_match:
+            _merge_node(sibling.children, child)
+
+
+def _get_leaf_attribute(entity, yang_name):
+    """
+    Returns the attribute name of the leaf or leaf-list named yang_name; None if entity has no such leaf
+    """
+    for attr, leaf_tuple in entity._leafs.items():
+        leaf = leaf_tuple[0] if isinstance(leaf_tuple, tuple) else leaf_tuple
+        if leaf.name == yang_name or leaf.name.split(':')[-1] == yang_name.split(':')[-1]:
+            return attr
+    return None
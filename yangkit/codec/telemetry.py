@@ -0,0 +1,501 @@
+import json
+import time
+from yangkit.types import Entity, EntityCollection, YList
+from yangkit.types.types import create_entity, invalidate_fragments
+from yangkit.utilities.logger import log
+from yangkit.errors import YCodecError, YInvalidArgumentError
+from yangkit.utilities.entity import get_top_level_class_of_name, parse_key_predicate_items, segmentalize, \
+    _find_ylist_entry
+from .json_decoder import JsonDecoder, _load_json, _to_leaf_value
+
+_leaf_attrs = {}
+_child_attrs = {}
+
+
+class TelemetryStats(object):
+    """
+    Counters of a TelemetryIngestor. Latencies are in nanoseconds: the update latency is the time to apply
+    an update or delete to the tree, the delay is the time from the timestamp of a notification to its
+    ingestion (meaningful only for live streams, with synchronized clocks).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Sets all the counters to zero
+        """
+        self.notifications = 0
+        self.updates = 0
+        self.deletes = 0
+        self.skipped = 0
+        self.errors = 0
+        self.update_time_ns = 0
+        self.last_update_ns = 0
+        self.max_update_ns = 0
+        self.last_delay_ns = None
+        self.max_delay_ns = None
+        self.started = None
+
+    @property
+    def applied(self):
+        """
+        Number of updates and deletes applied to the trees
+        """
+        return self.updates + self.deletes
+
+    @property
+    def mean_update_ns(self):
+        """
+        Mean time to apply an update or delete
+        """
+        return self.update_time_ns / self.applied if self.applied else 0.0
+
+    @property
+    def throughput(self):
+        """
+        Updates and deletes applied per second of processing time
+        """
+        return self.applied * 1e9 / self.update_time_ns if self.update_time_ns else 0.0
+
+    @property
+    def rate(self):
+        """
+        Updates and deletes applied per second since the first notification
+        """
+        if self.started is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started
+        return self.applied / elapsed if elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'notifications': self.notifications,
+            'updates': self.updates,
+            'deletes': self.deletes,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'mean_update_ns': self.mean_update_ns,
+            'last_update_ns': self.last_update_ns,
+            'max_update_ns': self.max_update_ns,
+            'last_delay_ns': self.last_delay_ns,
+            'max_delay_ns': self.max_delay_ns,
+            'throughput': self.throughput,
+            'rate': self.rate,
+        }
+
+    def __str__(self):
+        return ', '.join(f"{name}: {value}" for name, value in self.as_dict().items())
+
+
+class TelemetryIngestor(object):
+    """
+    Applies a stream of gNMI notifications (e.g. of a Subscribe) to live entity trees, one per device.
+
+    A notification is a dict with an optional "prefix" (whose "target" names the device), "timestamp",
+    "update" (list of {"path": .., "val": ..}) and "delete" (list of paths); paths are strings or
+    {"origin": .., "elem": [..]} dicts, as in JsonDecoder. SubscribeResponse dicts wrapping a notification
+    in "update" are accepted; "sync_response" messages are ignored.
+
+    Updates are merged into the trees: a value replaces the value of its leaf or leaf-list, and the json
+    of a container or list entry is merged into the existing entity, list entries being matched by their keys.
+    A delete removes its leaf, container content, list entry or list. The entities resolved for update paths
+    are cached per device, so that the updates of the same node (e.g. the counters of an interface sampled
+    every few seconds) find it with a dict lookup.
+
+    Example:
+        ingestor = TelemetryIngestor('openconfig')
+        ingestor.ingest(TelemetryIngestor.iter_replay('subscription.jsonl'))
+        interfaces = ingestor.get_entities('router-1')
+        print(ingestor.stats)
+    """
+
+    def __init__(self, bundle_name, strict=False):
+        """
+        :param bundle_name: bundle of the classes of the trees, e.g. 'openconfig'
+        :param strict: raise YCodecError for an update which cannot be applied, instead of counting
+                       it in stats.errors and going on
+        """
+        self.bundle_name = bundle_name
+        self.strict = strict
+        self.stats = TelemetryStats()
+        self._trees = {}
+
+    def apply(self, notification, device=None):
+        """
+        Applies the updates and deletes of a notification to the tree of its device
+
+        :param notification: notification or SubscribeResponse; dict, or JSON text as str, or utf-8 encoded
+                             bytes, bytearray or memoryview
+        :param device: name of the device; the target of the notification prefix by default
+        :return: number of updates and deletes applied
+        """
+        notification = _load_json(notification)
+        if not isinstance(notification, dict):
+            error_msg = "Argument 'notification' should be a JSON object"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+        if isinstance(notification.get("update"), dict):
+            # SubscribeResponse
+            notification = notification["update"]
+        elif "sync_response" in notification:
+            return 0
+
+        stats = self.stats
+        if stats.started is None:
+            stats.started = time.perf_counter()
+        stats.notifications += 1
+
+        prefix = notification.get("prefix")
+        if device is None and isinstance(prefix, dict):
+            device = prefix.get("target")
+        tree = self._trees.get(device)
+        if tree is None:
+            tree = self._trees[device] = _DeviceTree()
+
+        timestamp = notification.get("timestamp")
+        if timestamp is not None:
+            timestamp = int(timestamp)
+            stats.last_delay_ns = delay = time.time_ns() - timestamp
+            if stats.max_delay_ns is None or delay > stats.max_delay_ns:
+                stats.max_delay_ns = delay
+            tree.timestamp = timestamp
+
+        prefix_path, prefix_origin = JsonDecoder._get_path_and_origin(prefix)
+        prefix_segments = segmentalize(prefix_path) if prefix_path else []
+
+        applied = 0
+        for path in notification.get("delete") or []:
+            applied += self._apply(tree, prefix_segments, prefix_origin, path, None, True)
+        for update in notification.get("update") or []:
+            applied += self._apply(tree, prefix_segments, prefix_origin, update.get("path"), update.get("val"),
+                                   False)
+        return applied
+
+    def ingest(self, notifications, device=None):
+        """
+        Applies an iterable of notifications, e.g. a subscription stream or iter_replay
+
+        :param notifications: iterable of notifications, see apply
+        :param device: name of the device; the target of the notification prefixes by default
+        :return: number of updates and deletes applied
+        """
+        applied = 0
+        for notification in notifications:
+            applied += self.apply(notification, device)
+        return applied
+
+    async def aingest(self, notifications, device=None):
+        """
+        Applies an async iterable (or an iterable) of notifications; returns when it is exhausted
+
+        :param notifications: async iterable of notifications, see apply
+        :param device: name of the device; the target of the notification prefixes by default
+        :return: number of updates and deletes applied
+        """
+        if not hasattr(notifications, '__aiter__'):
+            return self.ingest(notifications, device)
+        applied = 0
+        async for notification in notifications:
+            applied += self.apply(notification, device)
+        return applied
+
+    def get_entities(self, device=None):
+        """
+        Returns the EntityCollection of the top-level entities of the tree of a device, in order of arrival
+
+        :param device: name of the device, as given to apply or in the notification prefixes
+        """
+        tree = self._trees.get(device)
+        return tree.entities if tree is not None else EntityCollection()
+
+    def get_timestamp(self, device=None):
+        """
+        Returns the timestamp of the last notification applied to the tree of a device; None if there is none
+        """
+        tree = self._trees.get(device)
+        return tree.timestamp if tree is not None else None
+
+    def devices(self):
+        """
+        Returns the names of the devices with a tree
+        """
+        return list(self._trees)
+
+    def reset(self, device=None):
+        """
+        Drops the tree of a device, or the trees of all the devices if device is None
+        """
+        if device is None:
+            self._trees.clear()
+        else:
+            self._trees.pop(device, None)
+
+    @staticmethod
+    def iter_replay(path):
+        """
+        Yields the notifications of a replay file: one JSON object per line (blank lines are skipped),
+        which is a notification, a SubscribeResponse, or a gNMI response whose notifications are yielded in order
+
+        :param path: path of the replay file, e.g. a subscription stream recorded with one response per line
+        """
+        with open(path, encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except ValueError as error:
+                    error_msg = f"Invalid JSON at line {line_number} of replay file '{path}': {error}"
+                    log.error(error_msg)
+                    raise YCodecError(error_msg)
+                if isinstance(message, dict) and "notification" in message:
+                    yield from message["notification"]
+                else:
+                    yield message
+
+    def _apply(self, tree, prefix_segments, prefix_origin, path, val, is_delete):
+        """
+        Applies an update or a delete; returns 1 if it was applied, 0 if it was skipped
+        """
+        start = time.perf_counter_ns()
+        try:
+            resolved = JsonDecoder._get_update_segments(prefix_segments, prefix_origin, path)
+            if resolved is None:
+                applied = False
+            else:
+                module_name, yang_name, segments = resolved
+                if any("'" in segment or '"' in segment for segment in segments):
+                    segments = [_normalize_segment(segment) for segment in segments]
+                if is_delete:
+                    applied = self._apply_delete(tree, module_name, yang_name, segments)
+                else:
+                    applied = self._apply_update(tree, module_name, yang_name, segments, val)
+        except Exception as error:
+            error_msg = f"Failed to apply {'delete' if is_delete else 'update'} of path '{path}': {error}"
+            log.error(error_msg)
+            if self.strict:
+                raise YCodecError(error_msg)
+            self.stats.errors += 1
+            return 0
+
+        stats = self.stats
+        if not applied:
+            stats.skipped += 1
+            return 0
+        stats.last_update_ns = elapsed = time.perf_counter_ns() - start
+        stats.update_time_ns += elapsed
+        if elapsed > stats.max_update_ns:
+            stats.max_update_ns = elapsed
+        if is_delete:
+            stats.deletes += 1
+        else:
+            stats.updates += 1
+        return 1
+
+    def _get_top_entity(self, tree, module_name, yang_name, create):
+        top_entity = tree.top_entities.get((module_name, yang_name))
+        if top_entity is None and create:
+            top_entity = get_top_level_class_of_name(self.bundle_name, module_name, yang_name)
+            if top_entity is None:
+                log.debug(f"'{module_name}:{yang_name}' is not a top level container in bundle "
+                          f"'{self.bundle_name}'; update skipped")
+                return None
+            tree.top_entities[(module_name, yang_name)] = top_entity
+            tree.entities.append(top_entity)
+        return top_entity
+
+    def _apply_update(self, tree, module_name, yang_name, segments, val):
+        top_entity = self._get_top_entity(tree, module_name, yang_name, True)
+        if top_entity is None or val is None:
+            return False
+
+        if isinstance(val, dict):
+            entity = JsonDecoder._decode_path_to_entity(segments, top_entity, tree.path_cache)
+            _merge_json(val, entity)
+            return True
+
+        if len(segments) < 2:
+            return False
+        # the parent of a sampled leaf is usually cached under its whole path
+        entity = tree.path_cache.get('/'.join(segments[:-1])) if len(segments) > 2 else top_entity
+        if entity is None:
+            entity = JsonDecoder._decode_path_to_entity(segments[:-1], top_entity, tree.path_cache)
+        attr = _get_leaf_attr(entity, segments[-1])
+        if attr is None:
+            log.debug(f"'{segments[-1]}' is not a leaf of '{entity.yang_name}'; update skipped")
+            return False
+        _set_leaf(entity, attr, val)
+        return True
+
+    def _apply_delete(self, tree, module_name, yang_name, segments):
+        top_entity = self._get_top_entity(tree, module_name, yang_name, False)
+        if top_entity is None:
+            return False
+
+        if len(segments) == 1:
+            del tree.top_entities[(module_name, yang_name)]
+            tree.entities.pop(top_entity)
+            tree.drop_paths(segments[0])
+            return True
+
+        parent = tree.find_entity(top_entity, segments[:-1])
+        if parent is None:
+            return False
+        name, key_items = parse_key_predicate_items(segments[-1])
+        attr = _get_leaf_attr(parent, name)
+        if attr is not None:
+            parent.__dict__[attr] = [] if isinstance(parent.__dict__[attr], list) else None
+            invalidate_fragments(parent)
+            return True
+
+        attr = _get_child_attr(parent, name)
+        if attr is None:
+            return False
+        child = parent.__dict__[attr]
+        if isinstance(child, YList):
+            if key_items:
+                entry = _find_ylist_entry(child, [value for _, value in key_items])
+                if entry is None:
+                    return False
+                invalidate_fragments(parent)
+                child._entity_map.pop(entry.ylist_key)
+            else:
+                child.clear()
+        elif isinstance(child, Entity):
+            container = create_entity(child.__class__)
+            container.parent = parent
+            setattr(parent, attr, container)
+        tree.drop_paths('/'.join(segments))
+        return True
+
+
+class _DeviceTree(object):
+    """
+    Entity tree of a device: its top-level entities, the timestamp of its last notification and the entities
+    resolved for the update paths (see JsonDecoder._decode_path_to_entity)
+    """
+
+    def __init__(self):
+        self.top_entities = {}
+        self.entities = EntityCollection()
+        self.timestamp = None
+        self.path_cache = {}
+
+    def find_entity(self, top_entity, segments):
+        """
+        Returns the entity of the absolute path segments; None if it is not in the tree. No entity is created.
+        """
+        entity = top_entity
+        sub_path = segments[0]
+        for segment in segments[1:]:
+            sub_path = f"{sub_path}/{segment}"
+            child = self.path_cache.get(sub_path)
+            if child is None:
+                name, key_items = parse_key_predicate_items(segment)
+                attr = _get_child_attr(entity, name)
+                child = entity.__dict__.get(attr) if attr is not None else None
+                if isinstance(child, YList):
+                    child = _find_ylist_entry(child, [value for _, value in key_items])
+                if child is None:
+                    return None
+            entity = child
+        return entity
+
+    def drop_paths(self, path):
+        """
+        Drops the cached entities of path and of the paths below it; the entries of a list path
+        ('.../interface[name=..]') are below the path of the list
+        """
+        below = (f"{path}/", f"{path}[")
+        for cached_path in [cached_path for cached_path in self.path_cache
+                            if cached_path == path or cached_path.startswith(below)]:
+            del self.path_cache[cached_path]
+
+
+def _merge_json(val_json, entity):
+    """
+    Merges a JSON object into entity: leaf and leaf-list values are replaced, containers are merged
+    and list entries are merged into the existing entries with the same keys
+    """
+    for name, value in val_json.items():
+        attr = _get_leaf_attr(entity, name)
+        if attr is not None:
+            _set_leaf(entity, attr, value)
+        elif type(value) == dict:
+            _, child = entity.get_child_by_name(name, name)
+            if child is not None:
+                _merge_json(value, child)
+        elif type(value) == list:
+            for entry_json in value:
+                attr, entry = entity.get_child_by_name(name, name)
+                if entry is None:
+                    break
+                ylist = entity.__dict__[attr]
+                for key in entry.ylist_key_names:
+                    key_name = _get_leaf_object(entry._leafs[key]).name
+                    if key_name in entry_json:
+                        entry.set_leaf_value(key, _to_leaf_value(entry_json[key_name]))
+                key = ylist._key(entry)
+                if entry.ylist_key_names and ylist.has_key(key):
+                    entry = ylist._entity_map[key]
+                else:
+                    ylist.append(entry)
+                _merge_json(entry_json, entry)
+
+
+def _set_leaf(entity, attr, value):
+    """
+    Sets the value of a leaf, or replaces the values of a leaf-list
+    """
+    if isinstance(entity.__dict__[attr], list):
+        entity.__dict__[attr] = []
+        for item in (value if isinstance(value, list) else [value]):
+            entity.set_leaf_value(attr, _to_leaf_value(item))
+    else:
+        entity.set_leaf_value(attr, _to_leaf_value(value))
+
+
+def _get_leaf_attr(entity, name):
+    """
+    Returns the attribute of the leaf or leaf-list of entity whose local name is the local name of name;
+    None if there is none
+    """
+    key = (entity.__class__, name)
+    try:
+        return _leaf_attrs[key]
+    except KeyError:
+        local_name = name.rpartition(':')[2]
+        attr = _leaf_attrs[key] = next((attr for attr, leaf in entity._leafs.items()
+                                        if _get_leaf_object(leaf).name.rpartition(':')[2] == local_name), None)
+        return attr
+
+
+def _get_child_attr(entity, name):
+    """
+    Returns the attribute of the container or list child of entity whose local name is the local name of name;
+    None if there is none
+    """
+    key = (entity.__class__, name)
+    try:
+        return _child_attrs[key]
+    except KeyError:
+        local_name = name.rpartition(':')[2]
+        attr = _child_attrs[key] = next((attr for yang_name, (attr, _) in entity._child_classes.items()
+                                         if yang_name.rpartition(':')[2] == local_name), None)
+        return attr
+
+
+def _get_leaf_object(leaf):
+    return leaf[0] if isinstance(leaf, tuple) else leaf
+
+
+def _normalize_segment(segment):
+    """
+    Strips the quotes of the key values of a segment, so that its entity is cached under one path
+    """
+    if "'" not in segment and '"' not in segment:
+        return segment
+    name, key_items = parse_key_predicate_items(segment)
+    return name + ''.join(f"[{key}={value}]" for key, value in key_items)
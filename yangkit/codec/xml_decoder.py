@@ -1,9 +1,28 @@
+import os
+import copy
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from lxml import etree
 from yangkit.types import YList
 from yangkit.utilities.logger import log
-from yangkit.types import Entity
-from yangkit.utilities.entity import get_internal_node, get_top_level_class, get_bundle_name, get_bundle_yang_ns, find_prefix_in_namespace_lookup
-from yangkit.errors import YCodecError
+from yangkit.types import Entity, EntityCollection, EntitySerializer
+from yangkit.types.types import create_entity
+from yangkit.utilities.entity import get_internal_node, get_top_level_class, get_bundle_name, get_bundle_yang_ns, find_prefix_in_namespace_lookup, \
+    find_prefix_of_namespace, get_ylist_entry, get_top_level_class_of_path, get_top_level_class_of_name, segmentalize
+from yangkit.utilities.schema_index import to_schema_path
+from yangkit.errors import YCodecError, YInvalidArgumentError
+from .projection import get_projection, SKIP
+from .xml_encoder import NETCONF_NS
+
+CHUNK_SIZE = 64 * 1024
+RPC_REPLY_TAG = '{' + NETCONF_NS + '}rpc-reply'
+# number of list entries decoded by a worker process at once
+PARALLEL_CHUNK_SIZE = 1000
+
+_parsers = threading.local()
+
+# kinds of the members resolved by _TagCache
+_LEAF, _LIST, _CONTAINER, _UNKNOWN = range(4)
 
 
 class XmlDecoder(object):
@@ -12,23 +31,26 @@ class XmlDecoder(object):
     """
 
     @staticmethod
-    def decode(payload, model):
+    def decode(payload, model, projection=None):
         """
         Converts an XML payload to the corresponding top-level class and returns
         a child container with the same absolute path as the provided model.
 
-        :param payload: XML Payload
+        :param payload: XML Payload; str, or utf-8 encoded bytes, bytearray or memoryview,
+                        or the lxml element of the top-level container, which is decoded as it is
         :param model: Entity object; required to find the bundle name
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
         """
 
         top_entity = get_top_level_class(model)
+        projection = get_projection(projection)
 
-        if payload:
-            payload_tree = etree.fromstring(payload.encode('utf-8'))
-            root = payload_tree.getroottree().getroot()
+        if etree.iselement(payload) or payload:
+            root = payload if etree.iselement(payload) else _parse(payload)
 
             try:
-                XmlDecoder._decode_helper(root, top_entity)
+                XmlDecoder._decode_helper(root, top_entity, None,
+                                          projection and projection.get_state(top_entity.get_absolute_path()))
             except Exception as error:
                 error.payload = payload
                 log.error(error)
@@ -45,12 +67,99 @@ class XmlDecoder(object):
 
         return internal_node
 
+    @staticmethod
+    def decode_many(payloads, model, projection=None):
+        """
+        Decodes a batch of rpc replies of the same model, each as Codec.decode does. The top-level class,
+        the namespace module of its bundle and the projection are resolved once for the batch; the
+        top-level entities are copies of the template of the class (see types.create_entity) instead of new
+        instances, and the members resolved by the _TagCache are shared by the payloads.
+
+        :param payloads: iterable of rpc replies; str, or utf-8 encoded bytes, bytearray or memoryview,
+                         or lxml elements
+        :param model: Entity object; required to find the bundle name
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+        :return: list of the decoded entities in payload order; the entity of a payload which cannot be
+                 decoded is replaced by its YCodecError, and the other payloads are still decoded
+        """
+        top_entity = get_top_level_class(model)
+        top_class = top_entity.__class__
+        top_path = top_entity.get_absolute_path()
+        model_path = model.get_absolute_path()
+        projection = get_projection(projection)
+        tag_cache = _TagCache(get_bundle_yang_ns(get_bundle_name(model)))
+        top_projection = projection and projection.get_state(top_path)
+
+        results = []
+        for payload in payloads:
+            try:
+                if not etree.iselement(payload) and not payload:
+                    raise YInvalidArgumentError("payload is empty")
+                top_entity = create_entity(top_class)
+                root = XmlDecoder.data_element_in_rpc_reply(payload)
+                if root is not None:
+                    XmlDecoder._decode_helper(root, top_entity, tag_cache, top_projection)
+                results.append(get_internal_node(top_entity, model_path))
+            except Exception as error:
+                error.payload = payload
+                log.error(error)
+                results.append(YCodecError(error))
+        return results
+
+    @staticmethod
+    def decode_all(payload, bundle_name, projection=None):
+        """
+        Decodes every top-level container of an XML payload, e.g. the reply of a full-datastore get-config,
+        from a single parse. The class of each container is looked up by namespace and name in the
+        bundle's ENTITY_LOOKUP; containers of modules which are not in the bundle are skipped.
+
+        :param payload: rpc-reply, or the '<data>' or '<config>' element holding the top-level containers;
+                        str, or utf-8 encoded bytes, bytearray or memoryview, or lxml element
+        :param bundle_name: bundle of the classes, e.g. 'cisco_ios_xr'
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+        :return: EntityCollection of the top-level entities, in payload order
+        """
+        entities = EntityCollection()
+        if not etree.iselement(payload) and not payload:
+            log.debug("payload is empty")
+            return entities
+
+        data = payload if etree.iselement(payload) else _parse(payload)
+        if data.tag == RPC_REPLY_TAG:
+            data = next(data.iterchildren(etree.Element), None)
+            if data is None:
+                return entities
+
+        projection = get_projection(projection)
+        tag_cache = _TagCache(get_bundle_yang_ns(bundle_name))
+        top_entities = {}
+        for root in data.iterchildren(etree.Element):
+            top_entity = top_entities.get(root.tag)
+            if top_entity is None:
+                name_space, yang_name = _split_tag(root.tag)
+                top_entity = get_top_level_class_of_name(bundle_name, name_space, yang_name)
+                if top_entity is None:
+                    log.debug(f"'{root.tag}' is not a top level container in bundle '{bundle_name}'; skipped")
+                    continue
+                top_entities[root.tag] = top_entity
+                entities.append(top_entity)
+
+            try:
+                XmlDecoder._decode_helper(root, top_entity, tag_cache,
+                                          projection and projection.get_state(top_entity.get_absolute_path()))
+            except Exception as error:
+                error.payload = payload
+                log.error(error)
+                raise YCodecError(error)
+
+        return entities
+
     @staticmethod
     def decode_action_response(payload, model):
         """
         decode wrapper to handle response in action operation
 
-        :param payload: XML Payload
+        :param payload: XML Payload; str, or utf-8 encoded bytes, bytearray or memoryview, or lxml element
         :param model: An instance of yangkit.types.Entity which contains decoded information
         """
 
@@ -58,12 +167,15 @@ class XmlDecoder(object):
             log.debug(f"model {model} has no attribute output")
             return
 
-        if not payload:
+        if not etree.iselement(payload) and not payload:
             log.debug("payload is empty")
             return
 
-        payload_tree = etree.fromstring(payload.encode('utf-8'))
-        data = payload_tree.getroottree().getroot()
+        if etree.iselement(payload):
+            # appending moves the element, which must not be taken out of the tree of the caller
+            data = copy.deepcopy(payload) if payload.getparent() is not None else payload
+        else:
+            data = _parse(payload)
 
         bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(model))
         nsp, ns = find_prefix_in_namespace_lookup(model.get_segment_path(), bundle_yang_ns)
@@ -82,49 +194,479 @@ class XmlDecoder(object):
         return model
 
     @staticmethod
-    def _decode_helper(root, entity):
+    def decode_parallel(payload, model, workers=None, chunk_size=PARALLEL_CHUNK_SIZE, executor=None,
+                        projection=None):
+        """
+        Decodes an XML payload as decode does, with the entries of the top-level lists
+        (e.g. the interface entries of interfaces) decoded in worker processes, in chunks of chunk_size entries.
+        The entries are sent back with EntitySerializer and appended in payload order under the top-level container;
+        the other children of the container are decoded in this process meanwhile.
+        Payloads with a single chunk are decoded in this process.
+
+        :param payload: XML Payload; str, or utf-8 encoded bytes, bytearray or memoryview, or lxml element
+        :param model: Entity object; required to find the bundle name
+        :param workers: number of worker processes of the pool; os.cpu_count() if None
+        :param chunk_size: number of list entries sent to a worker at once
+        :param executor: concurrent.futures.Executor to be used instead of a new process pool, e.g. a pool
+                         shared by several decodes; it is not shut down
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            error_msg = f"Invalid 'chunk_size' {chunk_size}. Expected a positive int"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        top_entity = get_top_level_class(model)
+        projection = get_projection(projection)
+        if not etree.iselement(payload) and not payload:
+            log.debug("payload is empty")
+            return get_internal_node(top_entity, model.get_absolute_path())
+
+        root = payload if etree.iselement(payload) else _parse(payload)
+        bundle_name = get_bundle_name(top_entity)
+        top_path = top_entity.get_absolute_path()
+        tag_cache = _TagCache(get_bundle_yang_ns(bundle_name))
+        top_projection = projection and projection.get_state(top_path)
+
+        # entries of the top-level lists, in chunks per list; the other children are decoded here
+        chunks, others, pending = [], [], {}
+        members = tag_cache.get_members(top_entity, root.tag)
+        for child_node in root:
+            tag = child_node.tag
+            if not isinstance(tag, str):
+                continue
+            member = members.get(tag)
+            if member is None:
+                member = members[tag] = tag_cache.resolve(top_entity, root.tag, tag)
+            if member[0] != _LIST or (top_projection is not None and top_projection.select(top_entity, tag) is SKIP):
+                others.append(child_node)
+                continue
+            entries = pending.setdefault(member[1], [])
+            entries.append(child_node)
+            if len(entries) == chunk_size:
+                chunks.append((member[1], entries))
+                pending[member[1]] = []
+        chunks.extend((attr, entries) for attr, entries in pending.items() if entries)
+
+        try:
+            if len(chunks) < 2 or workers == 1:
+                XmlDecoder._decode_helper(root, top_entity, tag_cache, top_projection)
+            else:
+                tasks = [(bundle_name, top_path, root.tag, attr,
+                          b''.join(etree.tostring(element, with_tail=False) for element in entries), projection)
+                         for attr, entries in chunks]
+                pool = executor if executor is not None else ProcessPoolExecutor(max_workers=workers)
+                try:
+                    results = pool.map(_decode_chunk, tasks)
+                    # the other children are decoded while the workers are busy
+                    XmlDecoder._decode_helper(root, top_entity, tag_cache, top_projection, others)
+                    for (attr, _), data in zip(chunks, results):
+                        top_entity.__dict__[attr].extend(EntitySerializer.loads(data).__dict__[attr].entities())
+                finally:
+                    if executor is None:
+                        pool.shutdown()
+        except Exception as error:
+            error.payload = payload
+            log.error(error)
+            raise YCodecError(error)
+
+        return get_internal_node(top_entity, model.get_absolute_path())
+
+    @staticmethod
+    def decode_stream(source, model, projection=None):
+        """
+        Decodes the entries of a list as they are parsed, yielding each entry as soon as its element closes.
+        The elements of yielded entries are cleared and the entries are not appended to a YList,
+        so memory is bounded by one entry, whatever the size of the payload.
+        Ancestors of the entries are created with their keys set, but hold no other data.
+
+        :param source: file path, utf-8 encoded bytes (bytearray, memoryview), binary file-like object,
+                       or iterable of bytes chunks; an rpc-reply or the data it contains
+        :param model: YList of the entries (e.g. Interfaces().interface) or an entry of the list
+                      attached to its parent; only its schema path is used
+        :param projection: Projection, or iterable of schema paths and leaf names; only they are decoded
+                           in the entries
+        """
+        if isinstance(model, YList):
+            entry_model = get_ylist_entry(model)
+        elif isinstance(model, Entity) and (model.ylist_key_names or model.ylist_key is not None):
+            entry_model = model
+        else:
+            error_msg = "Argument 'model' should be a YList or an entry of a list"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        bundle_name = get_bundle_name(entry_model)
+        bundle_yang_ns = get_bundle_yang_ns(bundle_name)
+        schema_path = to_schema_path(entry_model.get_absolute_path())
+        target = _get_qualified_names(schema_path, bundle_yang_ns)
+        entry_depth = len(target)
+        tag_cache = _TagCache(bundle_yang_ns)
+        projection = get_projection(projection)
+        entry_projection = projection and projection.get_state(schema_path)
+
+        parser = etree.XMLPullParser(events=('start', 'end'), huge_tree=True, resolve_entities=False)
+        # number of target segments matched by the path of each open element; -1 if it left the path
+        depths = []
+        ancestors = []
+        ancestor_entity = None
+
+        for event, element in _read_events(parser, source):
+            if event == 'start':
+                parent_depth = depths[-1] if depths else 0
+                if parent_depth == -1 or parent_depth >= entry_depth:
+                    depth = parent_depth
+                elif element.tag == target[parent_depth]:
+                    depth = parent_depth + 1
+                elif parent_depth == 0:
+                    # rpc-reply and data elements
+                    depth = 0
+                else:
+                    depth = -1
+                depths.append(depth)
+                if depth == entry_depth and parent_depth < entry_depth:
+                    path_elements = _get_path_elements(element, entry_depth)
+                    if not _is_same_path(path_elements, ancestors):
+                        ancestors = path_elements
+                        ancestor_entity = XmlDecoder._create_ancestors(ancestors, schema_path, bundle_name,
+                                                                       bundle_yang_ns)
+                continue
+
+            depth = depths.pop()
+            parent_depth = depths[-1] if depths else 0
+            if depth == entry_depth and parent_depth < entry_depth:
+                entry = XmlDecoder._decode_entry(element, ancestor_entity, schema_path, bundle_name,
+                                                 bundle_yang_ns, tag_cache, entry_projection)
+                _clear(element)
+                yield entry
+            elif depth == -1 and 0 < parent_depth < entry_depth:
+                # subtree next to the path; the leafs and preceding siblings are kept,
+                # as they may be keys of an ancestor
+                if len(element):
+                    element.clear()
+            elif depth < entry_depth:
+                # ancestor, or a subtree outside the path
+                _clear(element)
+
+    @staticmethod
+    def _create_ancestors(elements, schema_path, bundle_name, bundle_yang_ns):
+        """
+        Creates the ancestors of the entries of a list, with the keys of list ancestors set
+
+        :param elements: elements of the ancestors, from the top-level container
+        :param schema_path: schema path of the list
+        :return: parent entity of the entries; None if the list is a top-level list
+        """
+        if not elements:
+            return None
+
+        entity = get_top_level_class_of_path(bundle_name, schema_path)
+        for index in range(1, len(elements)):
+            yname = _get_yang_name(elements[index], elements[index - 1], bundle_yang_ns)
+            attr, child = entity.get_child_by_name(yname, "")
+            if attr is None or child is None:
+                return entity
+            if isinstance(getattr(entity, attr), YList):
+                for key_node in elements[index]:
+                    if not len(key_node):
+                        child.set_value(etree.QName(key_node).localname, key_node.text)
+            entity = child
+        return entity
+
+    @staticmethod
+    def _decode_entry(element, parent_entity, schema_path, bundle_name, bundle_yang_ns, tag_cache=None,
+                      projection=None):
+        """
+        Decodes the element of a list entry to a new entry of the list, whose parent is parent_entity
+        """
+        if parent_entity is None:
+            entry = get_top_level_class_of_path(bundle_name, schema_path)
+        else:
+            yname = _get_yang_name(element, element.getparent(), bundle_yang_ns)
+            _, entry = parent_entity.get_child_by_name(yname, "")
+
+        try:
+            XmlDecoder._decode_helper(element, entry, tag_cache, projection)
+        except Exception as error:
+            log.error(error)
+            raise YCodecError(error)
+        return entry
+
+    @staticmethod
+    def _decode_helper(root, entity, tag_cache=None, projection=None, children=None):
         """
         Populates the entity object by traversing the element tree in a reccursive manner
 
         :param root: root of the element tree
         :param entity: Enitity object
+        :param tag_cache: _TagCache of the decode; created for the bundle of entity if None
+        :param projection: ProjectionState of entity; None decodes the whole tree
+        :param children: child elements of root to be decoded; all of them if None
         """
         if root is None:
             return
 
-        qual_root = etree.QName(root)
-        root_namespace = qual_root.namespace
-        bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(entity))
+        if tag_cache is None:
+            tag_cache = _TagCache(get_bundle_yang_ns(get_bundle_name(entity)))
+        members = tag_cache.get_members(entity, root.tag)
 
-        for child_node in root.getchildren():
-            # separate element namespace and tag
-            qual_node = etree.QName(child_node)
-            namespace, yname = qual_node.namespace, qual_node.localname
+        for child_node in (root if children is None else children):
+            tag = child_node.tag
+            member = members.get(tag)
+            if member is None:
+                if not isinstance(tag, str):
+                    # comment or processing instruction
+                    continue
+                member = tag_cache.resolve(entity, root.tag, tag)
+                members[tag] = member
 
-            if root_namespace and namespace != root_namespace:
-                for name_space_prefix, name_space in bundle_yang_ns.NAMESPACE_LOOKUP.items():
-                    if name_space == namespace:
-                        yname = f"{name_space_prefix}:{yname}"
-                        break
-            
-            entity.set_value(yname, child_node.text)
+            kind, attr, value = member
+            child_projection = None
+            if projection is not None and kind != _UNKNOWN:
+                child_projection = projection.select(entity, tag)
+                if child_projection is SKIP:
+                    continue
 
-            attr, child = entity.get_child_by_name(yname, "")
-            if attr and child:
-                if isinstance(getattr(entity, attr), YList):
-                    XmlDecoder._decode_helper(child_node, child)
-                    getattr(entity, attr).append(child)
-                elif isinstance(child, Entity):
-                    XmlDecoder._decode_helper(child_node, child)
+            if kind == _LEAF:
+                for name in attr:
+                    entity.set_leaf_value(name, child_node.text)
+            elif kind == _LIST:
+                child = create_entity(value)
+                child.parent = entity
+                XmlDecoder._decode_helper(child_node, child, tag_cache, child_projection)
+                entity.__dict__[attr].append(child)
+            elif kind == _CONTAINER:
+                child = entity.__dict__[attr]
+                if child is None:
+                    _, child = entity.get_child_by_name(value, "")
+                if isinstance(child, Entity):
+                    XmlDecoder._decode_helper(child_node, child, tag_cache, child_projection)
+
+    @staticmethod
+    def data_element_in_rpc_reply(rpc_reply_xml):
+        """
+        Returns the first element inside the rpc reply (<rpc-reply>data</rpc-reply>) without serializing it;
+        None if the reply is empty. The reply is parsed once.
+
+        :param rpc_reply_xml: rpc reply xml; str, or utf-8 encoded bytes, bytearray or memoryview, or lxml element
+        """
+        data_tree = rpc_reply_xml if etree.iselement(rpc_reply_xml) else _parse(rpc_reply_xml)
+        # comments and processing instructions are skipped
+        return next(data_tree.iterchildren(etree.Element), None)
 
     @staticmethod
     def data_in_rpc_reply(rpc_reply_xml):
         """
-        Returns data inside the rpc reply (<rpc-reply>data</rpc-reply>)
+        Returns data inside the rpc reply (<rpc-reply>data</rpc-reply>).
+        The data is str for str rpc reply; utf-8 encoded bytes otherwise.
 
-        :param rpc_reply_xml: rpc reply xml
+        :param rpc_reply_xml: rpc reply xml; str, or utf-8 encoded bytes, bytearray or memoryview
         """
-        data_tree = etree.fromstring(rpc_reply_xml.encode('utf-8'))
+        data_tree = _parse(rpc_reply_xml)
+        if isinstance(rpc_reply_xml, str):
+            if len(data_tree):
+                return etree.tostring(data_tree[0], encoding='unicode', method='xml')
+            return ''
         if len(data_tree):
-            return etree.tostring(data_tree[0], encoding='utf-8', method='xml').decode('utf-8')
-        return ''
+            return etree.tostring(data_tree[0], encoding='utf-8', method='xml')
+        return b''
+
+
+def _get_qualified_names(schema_path, bundle_yang_ns):
+    """
+    Returns '{namespace}name' of every segment of a schema path; segments without prefix
+    are in the namespace of their parent
+
+    :param schema_path: absolute path without keys, e.g. "test-if:interfaces/interface"
+    """
+    names = []
+    name_space = None
+    for segment in segmentalize(schema_path):
+        if ':' in segment:
+            prefix, segment = segment.split(':', 1)
+            name_space = bundle_yang_ns.NAMESPACE_LOOKUP.get(prefix, name_space)
+        names.append(f'{{{name_space}}}{segment}' if name_space else segment)
+    return names
+
+
+def _get_path_elements(element, count):
+    """
+    Returns the 'count - 1' ancestors of element matching the schema path, from the top-level one
+    """
+    elements = []
+    for _ in range(count - 1):
+        element = element.getparent()
+        elements.append(element)
+    elements.reverse()
+    return elements
+
+
+def _is_same_path(elements, other):
+    return len(elements) == len(other) and all(a is b for a, b in zip(elements, other))
+
+
+class _TagCache(object):
+    """
+    Members of the entity classes decoded by one decode, keyed by the raw '{namespace}name' tag of the
+    child elements, so that the namespace lookup and the search of leafs and children are done once
+    per class and tag instead of once per element.
+    A member is (_LEAF, leaf attributes, None), (_LIST, attribute, class of the entries),
+    (_CONTAINER, attribute, YANG name) or (_UNKNOWN, None, None).
+    """
+
+    def __init__(self, bundle_yang_ns):
+        """
+        :param bundle_yang_ns: YANG namespace module of the bundle
+        """
+        self.bundle_yang_ns = bundle_yang_ns
+        self._members = {}
+
+    def get_members(self, entity, root_tag):
+        """
+        Returns the dict of the members resolved for the class of entity under an element tagged root_tag
+        """
+        key = (entity.__class__, root_tag)
+        members = self._members.get(key)
+        if members is None:
+            members = self._members[key] = {}
+        return members
+
+    def resolve(self, entity, root_tag, tag):
+        """
+        Resolves the member of entity matching a child element; its name is prefixed by its module
+        if its namespace differs from the one of the parent element
+        """
+        root_namespace, _ = _split_tag(root_tag)
+        namespace, yname = _split_tag(tag)
+        if root_namespace and namespace != root_namespace:
+            name_space_prefix = find_prefix_of_namespace(namespace, self.bundle_yang_ns)
+            if name_space_prefix:
+                yname = f"{name_space_prefix}:{yname}"
+
+        leaf_attrs = tuple(name for name, leaf in entity._leafs.items()
+                           if (leaf[0] if isinstance(leaf, tuple) else leaf).name == yname)
+        if leaf_attrs:
+            return _LEAF, leaf_attrs, None
+
+        if yname in entity._child_classes:
+            attr, clazz = entity._child_classes[yname]
+            if isinstance(getattr(entity, attr), YList):
+                return _LIST, attr, clazz
+            return _CONTAINER, attr, yname
+
+        for attr, child_name in entity._children_name_map.items():
+            if yname.split(":")[-1] == child_name:
+                return _CONTAINER, attr, yname
+        return _UNKNOWN, None, None
+
+
+def _split_tag(tag):
+    """
+    Returns (namespace, local name) of a raw '{namespace}name' lxml tag; namespace is None for unqualified tags
+    """
+    if tag[0] == '{':
+        namespace, _, name = tag[1:].partition('}')
+        return namespace, name
+    return None, tag
+
+
+def _get_yang_name(element, parent, bundle_yang_ns):
+    """
+    Returns the YANG name of element, prefixed by its module if its namespace differs from the one of parent
+    """
+    qual_node = etree.QName(element)
+    yname = qual_node.localname
+    if parent is not None and qual_node.namespace != etree.QName(parent).namespace:
+        name_space_prefix = find_prefix_of_namespace(qual_node.namespace, bundle_yang_ns)
+        if name_space_prefix:
+            yname = f"{name_space_prefix}:{yname}"
+    return yname
+
+
+def _decode_chunk(task):
+    """
+    Decodes a chunk of entries of a top-level list in a worker process of XmlDecoder.decode_parallel
+
+    :param task: tuple(bundle name, absolute path of the top-level container, tag of its element,
+                 attribute of the list, serialized entry elements, Projection or None)
+    :return: the top-level entity of the worker holding the entries, serialized with EntitySerializer
+    """
+    bundle_name, top_path, root_tag, attr, data, projection = task
+    top_entity = get_top_level_class_of_path(bundle_name, top_path)
+    root = etree.Element(root_tag)
+    root.extend(list(_parse(b'<chunk>' + data + b'</chunk>')))
+    XmlDecoder._decode_helper(root, top_entity, None, projection and projection.get_state(top_path))
+    return EntitySerializer.dumps(top_entity)
+
+
+def _clear(element):
+    """
+    Clears a parsed element and deletes its preceding siblings, which are already processed
+    """
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _read_events(parser, source):
+    """
+    Yields the events of an XMLPullParser fed with the chunks of source; parse errors are raised as YCodecError,
+    as in XmlDecoder.decode
+
+    :param parser: etree.XMLPullParser
+    :param source: source of the chunks, see _iter_chunks
+    """
+    try:
+        for chunk in _iter_chunks(source):
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+    except etree.XMLSyntaxError as error:
+        log.error(error)
+        raise YCodecError(error)
+
+
+def _iter_chunks(source):
+    """
+    Yields bytes chunks of an XML or JSON source
+
+    :param source: file path, bytes, bytearray, memoryview, binary file-like object or iterable of bytes chunks
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield view[start:start + CHUNK_SIZE].tobytes()
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as source_file:
+            yield from iter(lambda: source_file.read(CHUNK_SIZE), b'')
+    elif hasattr(source, 'read'):
+        yield from iter(lambda: source.read(CHUNK_SIZE), b'')
+    else:
+        for chunk in source:
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def get_parser():
+    """
+    Returns the XML parser of the current thread, as lxml parsers must not be shared between threads.
+    Large text nodes and deep trees are supported, entities are not resolved and
+    whitespace between elements is dropped.
+    """
+    parser = getattr(_parsers, 'parser', None)
+    if parser is None:
+        parser = etree.XMLParser(huge_tree=True, resolve_entities=False, no_network=True, remove_blank_text=True)
+        _parsers.parser = parser
+    return parser
+
+
+def _parse(payload):
+    """
+    Parses an XML payload. Encoded payloads are parsed as they are, without decoding to str.
+
+    :param payload: str, or utf-8 encoded bytes, bytearray or memoryview
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    return etree.fromstring(payload, get_parser())
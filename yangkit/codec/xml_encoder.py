@@ -1,13 +1,21 @@
 import re
+import copy
 import uuid
+import functools
+import contextlib
 from lxml import etree
 from yangkit.utilities.logger import log
 from yangkit.types import Entity, YList
 from yangkit.filters import YFilter
 from yangkit.errors import YInvalidArgumentError
+from yangkit.types.types import get_leaf_name_data
 from yangkit.utilities.entity import get_bundle_name, get_bundle_yang_ns, get_top_level_class, find_prefix_in_namespace_lookup, segmentalize
+from .encoder_plan import EncoderSource, ENCODER_GLOBALS, get_encoder, get_leaf_attributes, get_child_attributes, \
+    leaf_has_data, write_entity_has_data, get_fragment, set_fragment, mark_fragments
 
 NETCONF_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+OPERATION = '{' + NETCONF_NS + '}operation'
+_LEAF_LIST_VALUE = re.compile(r'\[.="')
 
 
 class XmlEncoder(object):
@@ -16,12 +24,109 @@ class XmlEncoder(object):
     """
 
     @staticmethod
-    def encode(entity, optype):
+    def encode(entity, optype, pretty_print=False, as_bytes=False, fragment_cache=False):
         """
         Converts an Entity object to xml payload
 
         :param entity: Entity Object
         :param optype: Operation type
+        :param pretty_print: indents the payload; compact otherwise
+        :param as_bytes: returns utf-8 encoded bytes instead of str
+        :param fragment_cache: reuses the elements of unchanged list entries, see encode_element
+        """
+        return XmlEncoder.to_string(XmlEncoder.encode_element(entity, optype, fragment_cache=fragment_cache),
+                                    pretty_print, as_bytes)
+
+    @staticmethod
+    def encode_payload(entity, optype, wrap_config=False, pretty_print=False, as_bytes=False, fragment_cache=False):
+        """
+        Converts an Entity object or a list of Entity objects to xml payload.
+        The '<config>' wrapper is built as an element of the same tree,
+        so the payload is serialized exactly once.
+
+        :param entity: Entity Object, YList or list of Entity Objects
+        :param optype: Operation type
+        :param wrap_config: wraps the payload in '<config>' element
+        :param pretty_print: indents the payload; compact otherwise
+        :param as_bytes: returns utf-8 encoded bytes instead of str
+        :param fragment_cache: reuses the elements of unchanged list entries, see encode_element
+        """
+        entities = entity if isinstance(entity, list) else [entity]
+
+        if wrap_config:
+            config = etree.Element('config')
+            for item in entities:
+                XmlEncoder.encode_element(item, optype, config, fragment_cache)
+            elements = [config]
+        else:
+            elements = [XmlEncoder.encode_element(item, optype, fragment_cache=fragment_cache) for item in entities]
+
+        separator = b'' if as_bytes else ''
+        return separator.join(XmlEncoder.to_string(element, pretty_print, as_bytes) for element in elements)
+
+    @staticmethod
+    def encode_element(entity, optype, parent=None, fragment_cache=False):
+        """
+        Converts an Entity object to an lxml element, which can be
+        appended to other elements (e.g. rpc envelope) without re-parsing
+
+        :param entity: Entity Object
+        :param optype: Operation type
+        :param parent: optional element (e.g. '<config>') the payload is built under. Prefer it to
+                       appending the returned element, which makes lxml drop the namespace declarations
+                       of the payload that duplicate the identityref prefixes declared on its top element.
+        :param fragment_cache: caches a copy of the element of every list entry on the entry, and copies it
+                               into the next payloads instead of encoding the entry again, until the entry
+                               or one of its descendants is assigned (see types.invalidate_fragments).
+                               Leaf-lists changed in place drop the cache too (see types.track_leaf_lists);
+                               in-place changes of Bits values are not detected, assign a new value instead.
+                               encoder_plan.clear_fragments releases the cache.
+        """
+        return XmlEncoder._encode_element(entity, optype, parent, _NamespaceContext(fragment_cache))
+
+    @staticmethod
+    def encode_many(entities, optype, wrap_config=False, pretty_print=False, as_bytes=False, fragment_cache=False):
+        """
+        Converts each Entity object or YList of a batch to its own xml payload, as encode_payload does.
+        The serializer, the YANG namespace modules of the bundles and the encoders of the entity classes
+        are resolved once for the batch.
+
+        :param entities: iterable of Entity Objects or YLists
+        :param optype: Operation type
+        :param wrap_config: wraps each payload in '<config>' element
+        :param pretty_print: indents the payloads; compact otherwise
+        :param as_bytes: returns utf-8 encoded bytes instead of str
+        :param fragment_cache: reuses the elements of unchanged list entries, see encode_element
+        :return: list of the payloads in entity order; the payload of an entity which cannot be encoded
+                 is replaced by the exception raised for it, and the other entities are still encoded
+        """
+        batch = _EncoderBatch(optype)
+        serialize = functools.partial(etree.tostring, method='xml', encoding='utf-8' if as_bytes else 'unicode',
+                                      pretty_print=pretty_print)
+
+        payloads = []
+        for entity in entities:
+            try:
+                ns_context = _NamespaceContext(fragment_cache, batch)
+                if wrap_config:
+                    config = etree.Element('config')
+                    XmlEncoder._encode_element(entity, optype, config, ns_context)
+                    payloads.append(serialize(config))
+                else:
+                    payloads.append(serialize(XmlEncoder._encode_element(entity, optype, None, ns_context)))
+            except Exception as error:
+                payloads.append(error)
+        return payloads
+
+    @staticmethod
+    def _encode_element(entity, optype, parent, ns_context):
+        """
+        Converts an Entity object to an lxml element, see encode_element
+
+        :param entity: Entity Object or YList
+        :param optype: Operation type
+        :param parent: optional element the payload is built under
+        :param ns_context: new _NamespaceContext of the document
         """
 
         if not isinstance(entity, (Entity, YList)):
@@ -30,55 +135,204 @@ class XmlEncoder(object):
             raise YInvalidArgumentError(error_msg)
 
         root = etree.Element('a')
-
-        if not entity.parent:
-            preamble = XmlEncoder._create_preamble(entity, root)
-        else:
-            if isinstance(entity, YList):
-                preamble = XmlEncoder._encode_ancestors(entity.parent, root, optype)
-            else:
-                preamble = XmlEncoder._encode_ancestors(entity.parent, root, optype, 
-                                                        entity.has_list_ancestor)
+        preamble = XmlEncoder._get_preamble(entity, root, optype, ns_context)
+        parent_ns = preamble.nsmap.get(None)
 
         is_filter = (optype == 'read' or optype == 'action')
 
         if isinstance(entity, YList):
             for item in entity:
                 original_yfilter = _attach_yfilter(item, optype)
-                XmlEncoder._encode_helper(item, preamble, optype, is_filter)
+                XmlEncoder._encode_helper(item, preamble, optype, is_filter, ns_context, parent_ns)
                 item.yfilter = original_yfilter
         else:
             original_yfilter = _attach_yfilter(entity, optype)
-            XmlEncoder._encode_helper(entity, preamble, optype, is_filter)
+            XmlEncoder._encode_helper(entity, preamble, optype, is_filter, ns_context, parent_ns)
             entity.yfilter = original_yfilter
 
         if optype == 'action':
             XmlEncoder._remove_input_node_in_action_rpc(root[0])
 
-        return etree.tostring(root[0],
-                              method='xml', pretty_print='True',
-                              encoding='utf-8').decode('utf-8')
+        if ns_context.identity_prefixes:
+            return XmlEncoder._declare_identity_prefixes(root[0], ns_context, parent)
+        if parent is not None:
+            parent.append(root[0])
+            return parent[-1]
+        return root[0]
 
     @staticmethod
-    def encode_list(entities, optype):
+    def encode_to_stream(sink, entity, optype, entries=None, wrap_config=False):
+        """
+        Writes the xml payload of an Entity object to sink using incremental serialization.
+        Elements are written as soon as they are encoded, so only the leafs of the entity
+        being written are held in memory, never the whole element tree or payload string.
+        The output is not pretty printed.
+
+        :param sink: file path or binary file-like object, e.g. open(path, 'wb') or socket.makefile('wb')
+        :param entity: Entity Object or YList
+        :param optype: Operation type, except 'action'
+        :param entries: optional iterable (e.g. generator) of list entries to be encoded under
+                        the ancestors of 'entity', which must be the YList they belong to.
+                        Entries are encoded one by one and are not appended to the YList.
+        :param wrap_config: wraps the payload in '<config>' element
+        """
+
+        if not isinstance(entity, (Entity, YList)):
+            error_msg = """Invalid 'entity' type. Expected types: yangkit.types.Entity; yangkit.types.YList; """
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if entries is not None and not isinstance(entity, YList):
+            error_msg = "Argument 'entity' should be the YList holding 'entries'"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if optype == 'action':
+            error_msg = "Streaming encode is not supported for 'action'"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        root = etree.Element('a')
+        preamble = XmlEncoder._get_preamble(entity, root, optype)
+        parent_ns = preamble.nsmap.get(None)
+
+        is_filter = (optype == 'read')
+
+        if entries is None:
+            entries = entity if isinstance(entity, YList) else [entity]
+
+        with etree.xmlfile(sink, encoding='utf-8') as xml_file:
+            with contextlib.ExitStack() as open_elements:
+                if wrap_config:
+                    open_elements.enter_context(xml_file.element('config'))
+                XmlEncoder._write_preamble(xml_file, open_elements, root, preamble)
+
+                for item in entries:
+                    detached = isinstance(entity, YList) and item.parent is None
+                    if detached:
+                        item.parent = entity.parent
+                    try:
+                        original_yfilter = _attach_yfilter(item, optype)
+                        XmlEncoder._write_helper(xml_file, item, optype, is_filter, parent_ns)
+                        item.yfilter = original_yfilter
+                    finally:
+                        if detached:
+                            # the entries are left detached, as they were passed
+                            item.parent = None
+
+    @staticmethod
+    def encode_list(entities, optype, pretty_print=False, as_bytes=False, fragment_cache=False):
         """
         Converts a list of entity objects to xml payload
 
         :param entity: Entity Object
         :param optype: Operation type
+        :param pretty_print: indents the payload; compact otherwise
+        :param as_bytes: returns utf-8 encoded bytes instead of str
+        :param fragment_cache: reuses the elements of unchanged list entries, see encode_element
         """
-        ret_xml_str = ""
-        for entity in entities:
-            ret_xml_str += XmlEncoder.encode(entity, object)
-        return ret_xml_str
+        return XmlEncoder.encode_payload(entities, optype, pretty_print=pretty_print, as_bytes=as_bytes,
+                                         fragment_cache=fragment_cache)
+
+    @staticmethod
+    def _get_preamble(entity, root, optype, ns_context=None):
+        """
+        Encodes the ancestors of 'entity' under root
+
+        :param entity: Entity Object or YList
+        :param root: root of element etree
+        :param optype: Operation type
+        :param ns_context: _NamespaceContext of the document; identityref prefixes are declared per leaf if None
+        :return: The element under which 'entity' is to be encoded.
+        """
+        if not entity.parent:
+            return XmlEncoder._create_preamble(entity, root, ns_context)
+        if isinstance(entity, YList):
+            return XmlEncoder._encode_ancestors(entity.parent, root, optype, ns_context=ns_context)
+        return XmlEncoder._encode_ancestors(entity.parent, root, optype,
+                                            entity.has_list_ancestor, ns_context)
+
+    @staticmethod
+    def _write_preamble(xml_file, open_elements, root, preamble):
+        """
+        Opens the preamble elements (ancestors) in xml_file; their key leafs are written right away.
+
+        :param xml_file: lxml.etree.xmlfile
+        :param open_elements: contextlib.ExitStack, closing the preamble elements on exit
+        :param root: root of element etree
+        :param preamble: element returned by _get_preamble
+        """
+        if preamble is root:
+            return
+
+        chain = [elem for elem in preamble.iterancestors() if elem is not root]
+        chain.reverse()
+        chain.append(preamble)
+
+        parent_nsmap = {}
+        for index, elem in enumerate(chain):
+            nsmap = {prefix: ns for prefix, ns in elem.nsmap.items() if parent_nsmap.get(prefix) != ns}
+            open_elements.enter_context(xml_file.element(elem.tag, elem.attrib, nsmap=nsmap))
+            if elem.text:
+                xml_file.write(elem.text)
+            next_elem = chain[index + 1] if index + 1 < len(chain) else None
+            for child in elem:
+                if child is not next_elem:
+                    # key leaf; copied so that the namespaces in scope are not redeclared
+                    child_nsmap = {prefix: ns for prefix, ns in child.nsmap.items() if elem.nsmap.get(prefix) != ns}
+                    leaf_ele = etree.Element(child.tag, child.attrib, nsmap=child_nsmap)
+                    leaf_ele.text = child.text
+                    xml_file.write(leaf_ele)
+            parent_nsmap = elem.nsmap
 
     @staticmethod
-    def _create_preamble(entity, root):
+    def _write_helper(xml_file, entity, optype, is_filter=False, parent_ns=None):
+        """
+        Writes the entity to xml_file in a reccursive manner, element by element
+
+        :param xml_file: lxml.etree.xmlfile
+        :param entity: Entity object to be encoded
+        :param optype: Operation type
+        :param is_filter: Bool
+        :param parent_ns: default namespace in effect at the parent element
+        """
+        if not is_filter and not entity.has_data():
+            return
+
+        bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(entity))
+        nsmap = _get_nsmap(entity.get_segment_path(), bundle_yang_ns, parent_ns)
+        elem_ns = nsmap.get(None, parent_ns)
+
+        attrib = {}
+        if optype != 'read' and entity.yfilter != YFilter.not_set and entity.yfilter != YFilter.merge:
+            attrib['{' + NETCONF_NS + '}operation'] = entity.yfilter.value
+
+        with xml_file.element(entity.yang_name, attrib, nsmap=nsmap):
+            # leaf elements are created under a detached element, which also receives
+            # the text of single key lists encoded as the text of the list element
+            elem = etree.Element(entity.yang_name)
+            leaf_elements = []
+            for name_value in entity.get_name_leaf_data():
+                leaf_ele = XmlEncoder._create_leaf_element(name_value, elem, entity, optype, parent_ns=elem_ns)
+                if leaf_ele is not None:
+                    leaf_elements.append(leaf_ele)
+
+            if elem.text:
+                xml_file.write(elem.text)
+            for leaf_ele in leaf_elements:
+                xml_file.write(leaf_ele)
+
+            for _, child in entity.get_children().items():
+                XmlEncoder._write_helper(xml_file, child, optype, parent_ns=elem_ns)
+
+    @staticmethod
+    def _create_preamble(entity, root, ns_context=None):
         """
         Creates XML tags for all the nodes the top-level container up until just before the 'entity'.
 
         :param entity: Entity object
         :param root: root of element etree
+        :param ns_context: _NamespaceContext of the document
         :return: The corresponding Element or SubElement of the parent of the specified entity.
         """
 
@@ -87,16 +341,14 @@ class XmlEncoder(object):
 
         segments = segmentalize(entity.get_absolute_path())
 
-        # fetching bundle name and corresponding _yang_ns module
-        bundle_name = get_bundle_name(entity)
-        bundle_yang_ns = get_bundle_yang_ns(bundle_name)
+        # fetching corresponding _yang_ns module of the bundle
+        bundle_yang_ns = _get_bundle_yang_ns(entity, ns_context)
 
         top_entity = get_top_level_class(entity)
 
-        nsp, ns = find_prefix_in_namespace_lookup(top_entity.get_segment_path(), bundle_yang_ns)
-        nsmap = {}
-        if nsp and ns: nsmap[None] = ns
+        nsmap = _get_nsmap(top_entity.get_segment_path(), bundle_yang_ns)
         root = etree.SubElement(root, top_entity.yang_name, nsmap=nsmap)
+        elem_ns = nsmap.get(None)
 
         elem = root
         curr_entity = top_entity
@@ -108,15 +360,14 @@ class XmlEncoder(object):
 
             curr_entity = child
 
-            nsp, ns = find_prefix_in_namespace_lookup(curr_entity.get_segment_path(), bundle_yang_ns)
-            nsmap = {}
-            if nsp and ns: nsmap[None] = ns
+            nsmap = _get_nsmap(curr_entity.get_segment_path(), bundle_yang_ns, elem_ns)
             elem = etree.SubElement(elem, curr_entity.yang_name, nsmap=nsmap)
+            elem_ns = nsmap.get(None, elem_ns)
 
         return elem
 
     @staticmethod
-    def _encode_ancestors(entity, root, optype, has_list_ancestor=False):
+    def _encode_ancestors(entity, root, optype, has_list_ancestor=False, ns_context=None):
         """
         Encodes ancestors of an entity and populates the root
 
@@ -124,61 +375,52 @@ class XmlEncoder(object):
         :param root: etree.Element object
         :param optype: Operation type
         :param has_list_ancestor: Bool
+        :param ns_context: _NamespaceContext of the document
         """
         if not entity.parent:
-            p_elem = XmlEncoder._create_preamble(entity, root)
+            p_elem = XmlEncoder._create_preamble(entity, root, ns_context)
         else:
-            p_elem = XmlEncoder._encode_ancestors(entity.parent, root, optype, entity.has_list_ancestor)
+            p_elem = XmlEncoder._encode_ancestors(entity.parent, root, optype, entity.has_list_ancestor, ns_context)
 
-        bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(entity))
-        nsp, ns = find_prefix_in_namespace_lookup(entity.get_segment_path(), bundle_yang_ns)
-        nsmap = {}
-        if nsp and ns: nsmap[None] = ns
+        bundle_yang_ns = _get_bundle_yang_ns(entity, ns_context)
+        parent_ns = p_elem.nsmap.get(None)
+        nsmap = _get_nsmap(entity.get_segment_path(), bundle_yang_ns, parent_ns)
         elem = etree.SubElement(p_elem, entity.yang_name, nsmap=nsmap)
+        elem_ns = nsmap.get(None, parent_ns)
 
         if has_list_ancestor:
-            # encode keys
-            for name_value in entity.get_name_leaf_data():
-                leaf_ele = XmlEncoder._create_leaf_element(name_value, elem, entity, optype)
-                if leaf_ele is not None and leaf_ele.tag.replace('-', '_') in entity.ylist_key_names:
-                    elem.append(leaf_ele)
+            # encode keys; the other leafs are not built, so that their identityref prefixes are not declared
+            for name in entity._leafs:
+                if name not in entity.ylist_key_names:
+                    continue
+                for name_value in get_leaf_name_data(entity._leafs[name], name, entity.__dict__[name], entity._logger):
+                    leaf_ele = XmlEncoder._create_leaf_element(name_value, elem, entity, optype, ns_context, elem_ns)
+                    if leaf_ele is not None:
+                        elem.append(leaf_ele)
 
         return elem
 
     @staticmethod
-    def _encode_helper(entity, root, optype, is_filter=False):
+    def _encode_helper(entity, root, optype, is_filter=False, ns_context=None, parent_ns=None):
         """
-        Populates the root element by parsing entity in a reccursive manner
+        Populates the root element with the encoder compiled for the class of entity,
+        which encodes its children in a reccursive manner
 
         :param entity: Entity object to be encoded
         :param root: root of element tree
         :param optype: Operation type
         :param is_filter: Bool
+        :param ns_context: _NamespaceContext of the document
+        :param parent_ns: default namespace in effect at root
         """
-        if not is_filter and not entity.has_data():
-            return
-
-        bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(entity))
-        nsp, ns = find_prefix_in_namespace_lookup(entity.get_segment_path(), bundle_yang_ns)
-        nsmap = {}
-        if nsp and ns: nsmap[None] = ns
-        elem = etree.SubElement(root, entity.yang_name, nsmap=nsmap)
-
-        # xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0" nc:operation="replace"
-        if optype != 'read' and entity.yfilter != YFilter.not_set and entity.yfilter != YFilter.merge:
-            elem.set('{' + NETCONF_NS + '}operation', entity.yfilter.value)
-
-        # create and append leaf elements
-        for name_value in entity.get_name_leaf_data():
-            leaf_ele = XmlEncoder._create_leaf_element(name_value, elem, entity, optype)
-            if leaf_ele is not None:
-                elem.append(leaf_ele)
-
-        for _, child in entity.get_children().items():
-            XmlEncoder._encode_helper(child, elem, optype)
+        if ns_context is not None and ns_context.batch is not None:
+            encode = ns_context.batch.get_encoder(entity)
+        else:
+            encode = get_encoder(entity, 'XML', optype, _compile_encoder)
+        encode(entity, root, ns_context, parent_ns, is_filter)
 
     @staticmethod
-    def _create_leaf_element(name_value, parent_elem, parent_entity, optype):
+    def _create_leaf_element(name_value, parent_elem, parent_entity, optype, ns_context=None, parent_ns=None):
         """
         Creates an XML element for a leaf
 
@@ -186,6 +428,8 @@ class XmlEncoder(object):
         :param parent_elem: XML Element of parent_entity
         :param parent_entity: parent of leaf
         :param optype: Operation type
+        :param ns_context: _NamespaceContext of the document; identityref prefixes are declared on the leaf if None
+        :param parent_ns: default namespace in effect at parent_elem
         """
         
         leaf_name = name_value[0]
@@ -194,17 +438,22 @@ class XmlEncoder(object):
         if not leaf_data.is_set and not leaf_data.yfilter != YFilter.not_set:
             return
         
-        bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(parent_entity))
+        bundle_yang_ns = _get_bundle_yang_ns(parent_entity, ns_context)
         nsp, ns = find_prefix_in_namespace_lookup(leaf_name, bundle_yang_ns)
         nsmap = {}
         if nsp and ns: 
-            nsmap[None] = ns
+            if ns != parent_ns:
+                nsmap[None] = ns
             leaf_name = leaf_name.split(':')[1]
 
         if leaf_data.name_space and leaf_data.name_space_prefix:
-            nsmap['idx'] = leaf_data.name_space
+            if ns_context is not None:
+                identity_prefix = ns_context.get_identity_prefix(leaf_data.name_space)
+            else:
+                identity_prefix = 'idx'
+                nsmap['idx'] = leaf_data.name_space
             if leaf_data.is_set and leaf_data.value.startswith(leaf_data.name_space_prefix):
-                leaf_data.value = leaf_data.value.replace(leaf_data.name_space_prefix, 'idx')
+                leaf_data.value = leaf_data.value.replace(leaf_data.name_space_prefix, identity_prefix)
 
         # Needed only for leaf-list types because get_name_leafdata for YLeafList provides
         # data in format {leaf_name_data[0]}[.="{val}"]'. ex: 'packagename[.="xr-rsvp-te"]'
@@ -232,6 +481,27 @@ class XmlEncoder(object):
         
         return leaf_ele
 
+    @staticmethod
+    def _declare_identity_prefixes(top, ns_context, parent=None):
+        """
+        Recreates the document with the identityref prefixes declared on the top element,
+        as lxml can not add namespace declarations to an existing element.
+
+        :param top: top element of the document
+        :param ns_context: _NamespaceContext of the document
+        :param parent: element the document is created under
+        :return: the new top element
+        """
+        nsmap = dict(top.nsmap)
+        for name_space, prefix in ns_context.identity_prefixes.items():
+            nsmap[prefix] = name_space
+
+        if parent is None:
+            parent = etree.Element('a')
+        new_top = etree.SubElement(parent, top.tag, top.attrib, nsmap=nsmap)
+        _copy_children(top, new_top, nsmap.get(None))
+        return new_top
+
     @staticmethod
     def _remove_input_node_in_action_rpc(root):
         """
@@ -242,14 +512,29 @@ class XmlEncoder(object):
             root.extend(input_node.getchildren())
             root.remove(input_node)
 
+    @staticmethod
+    def to_string(element, pretty_print=False, as_bytes=False):
+        """
+        Serializes an lxml element to xml string
+
+        :param element: lxml element
+        :param pretty_print: indents the payload; compact otherwise
+        :param as_bytes: returns utf-8 encoded bytes (without xml declaration) instead of str
+        """
+        encoding = 'utf-8' if as_bytes else 'unicode'
+        return etree.tostring(element, method='xml', encoding=encoding, pretty_print=pretty_print)
+
     @staticmethod
     def get_pretty(string):
         """
-        returns prettier xml
+        returns prettier xml; str for str input, utf-8 encoded bytes for bytes, bytearray or memoryview input
         """
         parser = etree.XMLParser(remove_blank_text=True)
-        element = etree.XML(string.encode('UTF-8'), parser)
-        return etree.tostring(element, encoding='UTF-8', pretty_print=True).decode('UTF-8')
+        if isinstance(string, str):
+            element = etree.XML(string.encode('UTF-8'), parser)
+            return etree.tostring(element, encoding='unicode', pretty_print=True)
+        element = etree.XML(string, parser)
+        return etree.tostring(element, encoding='UTF-8', pretty_print=True)
 
     @staticmethod
     def prepend_config(string):
@@ -259,12 +544,309 @@ class XmlEncoder(object):
         return f'''<config>{string}</config>'''
 
     @staticmethod
-    def create_rpc(string):
+    def create_rpc(payload, pretty_print=False, as_bytes=False):
         """
-        Converts xml string to a valid rpc request format
+        Converts xml payload to a valid rpc request format
+
+        :param payload: xml string, utf-8 encoded bytes, or lxml element (e.g. the operation element
+                        built around the output of encode_element) which is appended to the '<rpc>' element
+        :param pretty_print: indents the rpc, if payload is an element
+        :param as_bytes: if payload is an element, returns utf-8 encoded bytes instead of str.
+                         The rpc of bytes payload is always bytes.
         """
         message_id = f"urn:uuid:{uuid.uuid4()}"
-        return f'''<rpc xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="{message_id}">{string}</rpc>'''
+        if isinstance(payload, str):
+            return f'''<rpc xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="{message_id}">{payload}</rpc>'''
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            return b''.join([f'''<rpc xmlns="{NETCONF_NS}" message-id="{message_id}">'''.encode('utf-8'),
+                             payload, b'</rpc>'])
+
+        rpc = etree.Element('{' + NETCONF_NS + '}rpc', nsmap={None: NETCONF_NS})
+        rpc.set('message-id', message_id)
+        rpc.append(payload)
+        return XmlEncoder.to_string(rpc, pretty_print, as_bytes)
+
+
+class _NamespaceContext(object):
+    """
+    Namespaces of an xml document being encoded. Prefixes of identityref values are
+    allocated once per document ('idx', 'idx1', ..) and declared on the top element.
+    """
+
+    def __init__(self, fragment_cache=False, batch=None):
+        """
+        :param fragment_cache: True if the elements of list entries are cached; the identity
+                               namespaces used by each of them are then logged in identity_log
+        :param batch: _EncoderBatch of the documents encoded by XmlEncoder.encode_many
+        """
+        self.identity_prefixes = {}
+        self.fragment_cache = fragment_cache
+        self.identity_log = []
+        self.batch = batch
+
+    def get_identity_prefix(self, name_space):
+        """
+        Returns the prefix of an identity namespace, allocating it on first use
+
+        :param name_space: namespace of the identity
+        """
+        prefix = self.identity_prefixes.get(name_space)
+        if prefix is None:
+            prefix = f'idx{len(self.identity_prefixes)}' if self.identity_prefixes else 'idx'
+            self.identity_prefixes[name_space] = prefix
+        if self.fragment_cache:
+            self.identity_log.append(name_space)
+        return prefix
+
+
+class _EncoderBatch(object):
+    """
+    Lookups shared by the documents of XmlEncoder.encode_many: the YANG namespace module of each bundle
+    and the encoder of each entity class are resolved once per batch.
+    """
+
+    def __init__(self, optype):
+        """
+        :param optype: Operation type of the batch
+        """
+        self.optype = optype
+        self._bundle_yang_ns = {}
+        self._encoders = {}
+
+    def get_bundle_yang_ns(self, entity):
+        """
+        Returns the YANG namespace module of the bundle of entity
+
+        :param entity: Entity object
+        """
+        module_name = entity.__module__
+        if module_name not in self._bundle_yang_ns:
+            self._bundle_yang_ns[module_name] = get_bundle_yang_ns(get_bundle_name(entity))
+        return self._bundle_yang_ns[module_name]
+
+    def get_encoder(self, entity):
+        """
+        Returns the encoder compiled for the class of entity and the optype of the batch
+
+        :param entity: Entity object
+        """
+        clazz = entity.__class__
+        encode = self._encoders.get(clazz)
+        if encode is None:
+            encode = self._encoders[clazz] = get_encoder(entity, 'XML', self.optype, _compile_encoder)
+        return encode
+
+
+def _get_bundle_yang_ns(entity, ns_context=None):
+    """
+    Returns the YANG namespace module of the bundle of entity, from the batch of ns_context if any
+
+    :param entity: Entity object
+    :param ns_context: _NamespaceContext of the document, or None
+    """
+    if ns_context is not None and ns_context.batch is not None:
+        return ns_context.batch.get_bundle_yang_ns(entity)
+    return get_bundle_yang_ns(get_bundle_name(entity))
+
+
+def _get_nsmap(segment_path, bundle_yang_ns, parent_ns=None):
+    """
+    Returns the nsmap of an element; the default namespace is declared only when it
+    differs from the one in effect at the parent element.
+
+    :param segment_path: segment_path of a container
+    :param bundle_yang_ns: YANG namespace module for the bundle
+    :param parent_ns: default namespace in effect at the parent element
+    """
+    nsp, ns = find_prefix_in_namespace_lookup(segment_path, bundle_yang_ns)
+    if nsp and ns and ns != parent_ns:
+        return {None: ns}
+    return {}
+
+
+def _copy_children(source, target, parent_ns):
+    """
+    Copies text and child elements of source to target, declaring default namespaces where they change.
+    Elements are created in place rather than moved, since lxml merges the default namespace
+    declarations of moved elements into prefixed declarations of the same namespace in scope
+    (e.g. identityref prefixes), which changes the namespace of their unqualified descendants.
+
+    :param source: lxml element
+    :param target: lxml element
+    :param parent_ns: default namespace in effect at target
+    """
+    target.text = source.text
+    for child in source:
+        ns = child.nsmap.get(None)
+        nsmap = {None: ns} if ns and ns != parent_ns else {}
+        elem = etree.SubElement(target, child.tag, child.attrib, nsmap=nsmap)
+        elem.tail = child.tail
+        _copy_children(child, elem, ns)
+
+
+def _compile_encoder(entity, optype):
+    """
+    Compiles the encoder of the class of entity. Tag names, namespaces, leaf order and
+    child order are resolved once and hard-coded; the output is the one of the reflective
+    encoding of get_name_leaf_data() and get_children(). Entity.has_data() is computed
+    bottom-up while encoding, the element of an entity without data is removed.
+
+    :param entity: Entity object
+    :param optype: Operation type
+    :return: function(entity, parent, ns_context, parent_ns, is_filter) returning has_data
+    """
+    bundle_yang_ns = get_bundle_yang_ns(get_bundle_name(entity))
+    nsmap = _get_nsmap(entity.get_segment_path(), bundle_yang_ns)
+    ns = nsmap.get(None)
+    global_names = dict(ENCODER_GLOBALS,
+                        SubElement=etree.SubElement, OPERATION=OPERATION, OPTYPE=optype,
+                        IS_READ=(optype == 'read'), TAG=entity.yang_name, NS=ns, NSMAP=nsmap,
+                        _encode_leaf=_encode_leaf, _encode_child=_encode_child)
+
+    source = EncoderSource('def encode(entity, parent, ns_context, parent_ns, is_filter):')
+    source.writeln("d = entity.__dict__")
+    source.writeln("leafs = d['_leafs']")
+    source.writeln("logger = d['_logger']")
+    source.writeln("yfilter = d['yfilter']")
+    write_entity_has_data(source, entity)
+    if ns:
+        source.writeln("if parent_ns == NS:")
+        source.writeln("    elem = SubElement(parent, TAG)")
+        source.writeln("    elem_ns = parent_ns")
+        source.writeln("else:")
+        source.writeln("    elem = SubElement(parent, TAG, nsmap=NSMAP)")
+        source.writeln("    elem_ns = NS")
+    else:
+        source.writeln("elem = SubElement(parent, TAG)")
+        source.writeln("elem_ns = parent_ns")
+
+    if optype != 'read':
+        # xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0" nc:operation="replace"
+        source.writeln("if yfilter is not NOT_SET and yfilter is not MERGE:")
+        source.writeln("    elem.set(OPERATION, yfilter.value)")
+
+    key_names = entity.ylist_key_names
+    for index, name in enumerate(get_leaf_attributes(entity)):
+        leaf_tuple = entity._leafs[name]
+        leaf_name = (leaf_tuple[0] if isinstance(leaf_tuple, tuple) else leaf_tuple).name
+        nsp, leaf_ns = find_prefix_in_namespace_lookup(leaf_name, bundle_yang_ns)
+        if nsp and leaf_ns:
+            leaf_name = leaf_name.split(':')[1]
+        else:
+            leaf_ns = None
+        # single key lists encode the key as the text of the list element, if named the same
+        is_list_text = len(key_names) == 1 and leaf_name.replace('-', '_') == key_names[0] \
+            and leaf_name == entity.yang_name
+        global_names[f'LEAF_{index}'] = (leaf_name, leaf_ns, is_list_text)
+
+        source.writeln(f"value = d[{name!r}]")
+        source.writeln("if value is not None:")
+        source.writeln(f"    data = _encode_leaf(elem, leafs[{name!r}], {name!r}, value, LEAF_{index}, logger, "
+                       "ns_context, elem_ns, IS_READ) or data")
+
+    for name, is_list in get_child_attributes(entity):
+        if is_list:
+            source.writeln(f"for child in d[{name!r}]:")
+            source.writeln("    if isinstance(child, Entity):")
+            source.writeln("        data = _encode_child(child, elem, OPTYPE, ns_context, elem_ns) or data")
+        else:
+            source.writeln(f"value = d[{name!r}]")
+            source.writeln("if isinstance(value, Entity):")
+            source.writeln("    data = _encode_child(value, elem, OPTYPE, ns_context, elem_ns) or data")
+
+    source.writeln("if not data and not is_filter:")
+    source.writeln("    parent.remove(elem)")
+    source.writeln("return data")
+
+    clazz = entity.__class__
+    return source.compile(f'<XML {optype} encoder of {clazz.__module__}.{clazz.__qualname__}>', global_names)
+
+
+def _encode_child(child, parent, optype, ns_context, parent_ns):
+    """
+    Encodes a child entity with the encoder compiled for its class
+
+    :return: True if child has data
+    """
+    encode = get_encoder(child, 'XML', optype, _compile_encoder)
+    if ns_context is None or not ns_context.fragment_cache:
+        return encode(child, parent, ns_context, parent_ns, False)
+    if child.ylist_key is None:
+        data = encode(child, parent, ns_context, parent_ns, False)
+        mark_fragments(child)
+        return data
+
+    # list entry; its element is cached with the identity prefixes it was encoded with
+    key = ('XML', optype, parent_ns)
+    fragment = get_fragment(child, key)
+    if fragment is not None:
+        element, data, identity_prefixes = fragment
+        # allocating the prefixes in the order of the encoding gives the same prefixes, unless
+        # a namespace got a prefix before in this document
+        if all(ns_context.get_identity_prefix(name_space) == prefix for name_space, prefix in identity_prefixes):
+            if element is not None:
+                parent.append(copy.deepcopy(element))
+            return data
+
+    log_start = len(ns_context.identity_log)
+    data = encode(child, parent, ns_context, parent_ns, False)
+    element = copy.deepcopy(parent[-1]) if data else None
+    identity_prefixes = tuple((name_space, ns_context.identity_prefixes[name_space])
+                              for name_space in dict.fromkeys(ns_context.identity_log[log_start:]))
+    set_fragment(child, key, (element, data, identity_prefixes))
+    return data
+
+
+def _encode_leaf(elem, leaf_tuple, name, value, leaf_plan, logger, ns_context, elem_ns, is_read):
+    """
+    Creates the XML elements of a leaf or leaf-list attribute, as XmlEncoder._create_leaf_element
+
+    :param elem: XML Element of the entity
+    :param leaf_tuple: entry of Entity._leafs for the attribute
+    :param name: attribute name
+    :param value: attribute value, not None
+    :param leaf_plan: tuple(tag, namespace or None, is_list_text)
+    :param logger: logger of the entity
+    :param ns_context: _NamespaceContext of the document; identityref prefixes are declared on the leaf if None
+    :param elem_ns: default namespace in effect at elem
+    :param is_read: True if the operation type is 'read'
+    :return: True if the attribute makes the entity have data
+    """
+    tag, ns, is_list_text = leaf_plan
+    for leaf_name, leaf_data in get_leaf_name_data(leaf_tuple, name, value, logger):
+        if not leaf_data.is_set and leaf_data.yfilter == YFilter.not_set:
+            continue
+
+        nsmap = {None: ns} if ns and ns != elem_ns else {}
+        if leaf_data.name_space and leaf_data.name_space_prefix:
+            if ns_context is not None:
+                identity_prefix = ns_context.get_identity_prefix(leaf_data.name_space)
+            else:
+                identity_prefix = 'idx'
+                nsmap['idx'] = leaf_data.name_space
+            if leaf_data.is_set and leaf_data.value.startswith(leaf_data.name_space_prefix):
+                leaf_data.value = leaf_data.value.replace(leaf_data.name_space_prefix, identity_prefix)
+
+        # leaf-list values are provided in the name: 'packagename[.="xr-rsvp-te"]'
+        if leaf_data.is_set:
+            match = _LEAF_LIST_VALUE.search(leaf_name)
+            if match:
+                leaf_data.value = leaf_name[match.end():-2]
+
+        if is_list_text:
+            elem.text = leaf_data.value if leaf_data.is_set else None
+            continue
+
+        leaf_ele = etree.Element(tag, nsmap=nsmap)
+        if leaf_data.is_set:
+            leaf_ele.text = leaf_data.value
+
+        yfilter = leaf_data.yfilter
+        if not is_read and yfilter != YFilter.not_set and yfilter != YFilter.merge:
+            leaf_ele.set(OPERATION, yfilter.value)
+        elem.append(leaf_ele)
+
+    return leaf_has_data(leaf_tuple, value)
 
 
 def _is_edit_optype(optype):
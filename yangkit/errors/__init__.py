@@ -9,7 +9,7 @@ class YError(Exception):
         self.message = error_msg
 
     def __repr__(self):
-        return self.message
+        return str(self.message)
 
     def __str__(self):
         return self.__repr__()
@@ -3,6 +3,7 @@ from .types import Entity, EntityCollection, Config, Filter, YList, YLeafList, \
     Identity, LeafData, LeafDataList, YType, YLeaf
 
 from .types import get_entity_path
+from .serializer import EntitySerializer
 
 __all__ = [
     "YList",
@@ -15,6 +16,7 @@ __all__ = [
     "Entity",
     "EntityCollection",
     "EntityPath",
+    "EntitySerializer",
     "Enum",
     "Filter",
     "Identity",
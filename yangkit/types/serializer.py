@@ -0,0 +1,244 @@
+import pickle
+import importlib
+from collections import namedtuple
+from functools import reduce
+from yangkit.utilities.logger import log
+from yangkit.errors import YInvalidArgumentError
+from yangkit.filters import YFilter
+from .types import Entity, YList, Enum, create_entity
+
+SERIALIZER_VERSION = 1
+
+# reference to the literal of a generated Enum class, which is restored as the same object
+_EnumValue = namedtuple('_EnumValue', ['module', 'class_name', 'attr'])
+
+_enum_values = {}
+_enum_literals = {}
+
+
+class EntitySerializer(object):
+    """
+    Compact binary serialization of Entity trees, e.g. to pass decoded trees between processes
+    or to cache them on disk.
+
+    A tree is recorded as the table of its classes and, for every entity, the id of its class, its set leafs,
+    its list key and its children; containers without data are omitted. Parents, YLists and the schema
+    attributes are rebuilt on load, where entities are created with yangkit.types.types.create_entity.
+    The data is pickled: load only data from a trusted source.
+
+    Example:
+        data = EntitySerializer.dumps(interfaces)
+        interfaces = EntitySerializer.loads(data)
+    """
+
+    @staticmethod
+    def dumps(entity):
+        """
+        Returns the serialization of entity and its subtree; the ancestors of entity are not recorded
+
+        :param entity: Entity object
+        """
+        if not isinstance(entity, Entity):
+            error_msg = "Argument 'entity' should be an Entity object"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        classes, class_ids = [], {}
+        tree = _dump_node(entity, classes, class_ids)
+        class_names = tuple((clazz.__module__, clazz.__qualname__) for clazz in classes)
+        return pickle.dumps((SERIALIZER_VERSION, class_names, tree), pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(data):
+        """
+        Returns the entity serialized in data, without parent
+
+        :param data: bytes returned by dumps
+        """
+        try:
+            version, class_names, tree = pickle.loads(data)
+        except Exception as error:
+            error_msg = f"Invalid serialized entity: {error}"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        if version != SERIALIZER_VERSION:
+            error_msg = f"Unsupported serialized entity version {version}. Supported version: {SERIALIZER_VERSION}"
+            log.error(error_msg)
+            raise YInvalidArgumentError(error_msg)
+
+        classes = [_import_class(module, class_name) for module, class_name in class_names]
+        return _load_node(tree, classes)
+
+    @staticmethod
+    def dump(entity, file):
+        """
+        Writes the serialization of entity to a binary file object
+        """
+        file.write(EntitySerializer.dumps(entity))
+
+    @staticmethod
+    def load(file):
+        """
+        Returns the entity serialized in a binary file object
+        """
+        return EntitySerializer.loads(file.read())
+
+
+def _dump_node(entity, classes, class_ids):
+    """
+    Returns the node of entity: tuple(class id, list key, (leaf attribute, value, ...),
+    ((child attribute, node or (list of nodes, list counter)), ...), dict of the yfilters or None)
+    """
+    clazz = entity.__class__
+    class_id = class_ids.get(clazz)
+    if class_id is None:
+        class_id = class_ids[clazz] = len(classes)
+        classes.append(clazz)
+
+    d = entity.__dict__
+    leafs = []
+    yfilters = None
+    for name, leaf in d['_leafs'].items():
+        value = d[name]
+        if value is None or (isinstance(value, list) and not value):
+            continue
+        if isinstance(value, YFilter):
+            # the leaf object holds the previous value of the leaf
+            yfilters = yfilters or {}
+            yfilters[name] = leaf[0] if isinstance(leaf, tuple) else leaf
+        leafs.append(name)
+        leafs.append(_dump_value(entity, name, value))
+
+    children = []
+    for attr, _ in entity._child_classes.values():
+        value = d.get(attr)
+        if isinstance(value, YList):
+            if len(value):
+                nodes = [_dump_node(entry, classes, class_ids) for entry in value.entities()]
+                children.append((attr, (nodes, value.counter)))
+        elif isinstance(value, Entity):
+            node = _dump_node(value, classes, class_ids)
+            if node[2] or node[3] or node[4] is not None or _is_presence(value):
+                children.append((attr, node))
+
+    if d['yfilter'] != YFilter.not_set:
+        yfilters = yfilters or {}
+        yfilters[None] = d['yfilter']
+
+    return class_id, d.get('ylist_key'), tuple(leafs), tuple(children), yfilters
+
+
+def _load_node(node, classes, entity=None):
+    """
+    Populates entity, or a new entity of the class of node, with node
+    """
+    class_id, ylist_key, leafs, children, yfilters = node
+    if entity is None:
+        entity = create_entity(classes[class_id])
+
+    d = entity.__dict__
+    for index in range(0, len(leafs), 2):
+        d[leafs[index]] = _load_value(leafs[index + 1])
+
+    for attr, child in children:
+        if child[0].__class__ is list:
+            nodes, counter = child
+            ylist = d[attr]
+            entity_map = ylist._entity_map
+            for entry_node in nodes:
+                entry = _load_node(entry_node, classes)
+                entry.__dict__['parent'] = entity
+                entity_map[entry.ylist_key] = entry
+            ylist.counter = counter
+        else:
+            container = d.get(attr)
+            if container is None or container.__class__ is not classes[child[0]]:
+                container = create_entity(classes[child[0]])
+                container.__dict__['parent'] = entity
+                d[attr] = container
+            _load_node(child, classes, container)
+
+    if ylist_key is not None:
+        d['ylist_key'] = ylist_key
+    if yfilters:
+        for name, value in yfilters.items():
+            if name is None:
+                d['yfilter'] = value
+            elif isinstance(d['_leafs'][name], tuple):
+                d['_leafs'][name] = (value,) + d['_leafs'][name][1:]
+            else:
+                d['_leafs'][name] = value
+    return entity
+
+
+def _dump_value(entity, name, value):
+    """
+    Returns the serialized value of a leaf or leaf-list; enum literals are recorded by reference
+    """
+    if isinstance(value, list):
+        return [_dump_value(entity, name, item) for item in value]
+    if isinstance(value, Enum.YLeaf):
+        return _get_enum_value(entity, name, value)
+    return value
+
+
+def _load_value(value):
+    if value.__class__ is list:
+        return [_load_value(item) for item in value]
+    if value.__class__ is _EnumValue:
+        return _get_enum_literal(value)
+    return value
+
+
+def _get_enum_value(entity, name, literal):
+    """
+    Returns the _EnumValue of an enum literal, found in the Enum classes of the types of the leaf
+    """
+    enum_value = _enum_values.get(id(literal))
+    if enum_value is not None:
+        return enum_value
+
+    leaf = entity._leafs[name]
+    types = leaf[1] if isinstance(leaf, tuple) else []
+    for leaf_type in types:
+        # enum types are (module, class name, nested class name); identity types are (module, class name)
+        if not isinstance(leaf_type, tuple) or len(leaf_type) != 3:
+            continue
+        module, class_name, sub_class = leaf_type
+        if sub_class:
+            class_name = f'{class_name}.{sub_class}'
+        clazz = _import_class(module, class_name)
+        for attr, member in vars(clazz).items():
+            if member is literal:
+                # literals are class attributes, which live as long as the process
+                enum_value = _enum_values[id(literal)] = _EnumValue(module, class_name, attr)
+                return enum_value
+
+    error_msg = f"Enum value '{literal}' of '{name}' is not a literal of the types of the leaf"
+    log.error(error_msg)
+    raise YInvalidArgumentError(error_msg)
+
+
+def _get_enum_literal(enum_value):
+    literal = _enum_literals.get(enum_value)
+    if literal is None:
+        literal = _enum_literals[enum_value] = getattr(_import_class(enum_value.module, enum_value.class_name),
+                                                       enum_value.attr)
+    return literal
+
+
+def _import_class(module, class_name):
+    """
+    Returns the class named class_name (qualified name) of a module
+    """
+    try:
+        return reduce(getattr, class_name.split('.'), importlib.import_module(module))
+    except (ImportError, AttributeError) as error:
+        error_msg = f"Class '{module}.{class_name}' of the serialized entity is not found: {error}"
+        log.error(error_msg)
+        raise YInvalidArgumentError(error_msg)
+
+
+def _is_presence(entity):
+    return getattr(entity, 'is_presence_container', False)
@@ -1,14 +1,36 @@
+import copy
 from decimal import Decimal
 import enum
 from collections import OrderedDict
 import importlib
 import logging
+import weakref
 from functools import reduce
+from types import FunctionType, CellType
 from yangkit.filters import YFilter
 from yangkit.errors import YModelError, YInvalidArgumentError
 from yangkit.errors.error_handler import handle_type_error as _handle_type_error
 from yangkit.utilities.entity import get_bundle_name, get_bundle_yang_ns
 
+# name of the Entity attribute holding its cached encoded fragments
+FRAGMENTS_ATTRIBUTE = '_fragments'
+# name of the Entity attribute holding its cached gNMI path (see yangkit.codec.gnmi_path)
+GNMI_PATH_ATTRIBUTE = '_gnmi_path'
+# name of the Entity attribute holding its cached ancestor keys, pickled instead of the ancestors
+ANCESTORS_ATTRIBUTE = '_ancestors'
+# attributes of Entity restored from an instance of the class when unpickled
+_UNPICKLED_ATTRIBUTES = ('_segment_path', '_absolute_path', '_logger', 'parent', FRAGMENTS_ATTRIBUTE,
+                         GNMI_PATH_ATTRIBUTE, ANCESTORS_ATTRIBUTE)
+# attributes shared by the entities copied from an instance of the class; the schema is never modified
+_SHARED_ATTRIBUTES = ('_child_classes', 'ylist_key_names', '_logger')
+_MISSING = object()
+
+_templates = {}
+# ancestors of the unpickled entities, by id of their ancestor keys; see _get_ancestor_stub
+_ancestor_stubs = weakref.WeakValueDictionary()
+_template_plans = {}
+_other_type_classes = {}
+
 
 class EncodingFormat(enum.Enum):
     """
@@ -522,7 +544,8 @@ class Entity:
         if found:
             attr, clazz = self._child_classes[child_yang_name]
             is_list = isinstance(getattr(self, attr), YList)
-            child = clazz()
+            # decoders create a child per list entry; copying the class template is faster than __init__
+            child = create_entity(clazz)
             child.parent = self
             if not is_list:
                 self._children_name_map[attr] = child_yang_name
@@ -564,14 +587,25 @@ class Entity:
         """
         Sets the value of leaf with name matching "path"
         """
+        if FRAGMENTS_ATTRIBUTE in self.__dict__:
+            invalidate_fragments(self)
         for name, leaf in self._leafs.items():
             leaf = _get_leaf_object(leaf)
             if _leaf_name_matches(leaf, path):
-                v = _get_decoded_value_object(self._leafs[name], self, value)
-                if _is_yleaf(leaf):
-                    self._assign_yleaf(name, value, v)
-                elif isinstance(leaf, YLeafList):
-                    self._assign_yleaflist(name, value, v)
+                self.set_leaf_value(name, value)
+
+    def set_leaf_value(self, name, value):
+        """
+        Sets the value of the leaf or leaf-list attribute "name"; the value is decoded as in set_value
+        """
+        if FRAGMENTS_ATTRIBUTE in self.__dict__:
+            invalidate_fragments(self)
+        leaf = _get_leaf_object(self._leafs[name])
+        v = _get_decoded_value_object(self._leafs[name], self, value)
+        if _is_yleaf(leaf):
+            self._assign_yleaf(name, value, v)
+        elif isinstance(leaf, YLeafList):
+            self._assign_yleaflist(name, value, v)
 
     def get_name_leaf_data(self):
         """
@@ -580,26 +614,7 @@ class Entity:
         """
         leaf_name_data = LeafDataList()
         for name in self._leafs:
-            value = self.__dict__[name]
-            leaf = _get_leaf_object(self._leafs[name])
-            if isinstance(value, YFilter):
-                self._logger.debug(f"YFilter assigned to '{name}', '{value}'")
-                leaf.yfilter = value
-                if isinstance(leaf, YLeaf):
-                    leaf_name_data.append(leaf.get_name_leafdata())
-                elif isinstance(leaf, YLeafList):
-                    leaf_name_data.extend(leaf.get_name_leafdata())
-            elif value is not None and not isinstance(value, list):
-                leaf.set(value)
-                leaf_name_data.append(leaf.get_name_leafdata())
-            elif isinstance(value, list) and value:
-                leaf_list = YLeafList(YType.str, leaf.name)
-                for item in value:
-                    _validate_value(self._leafs[name], name, item, self._logger)
-                    if isinstance(item, bool):
-                        item = 'true' if item is True else 'false'
-                    leaf_list.append(item)
-                leaf_name_data.extend(leaf_list.get_name_leafdata())
+            leaf_name_data.extend(get_leaf_name_data(self._leafs[name], name, self.__dict__[name], self._logger))
         self._logger.debug(
             f"Get name leaf data for '{self.yang_name}'. Count: {len(leaf_name_data)}")
         for leaf in leaf_name_data:
@@ -671,6 +686,8 @@ class Entity:
         """
         This method sets the value "value" to attribute "name"
         """
+        if FRAGMENTS_ATTRIBUTE in self.__dict__:
+            invalidate_fragments(self)
         with _handle_type_error():
             if name == '_is_presence':
                 # support for Entity._is_presence = True
@@ -736,6 +753,368 @@ class Entity:
     def __str__(self):
         return f"{self.__class__.__module__}.{self.__class__.__name__}"
 
+    def __getstate__(self):
+        """
+        Returns the state pickled for the entity: the attributes which differ from a new instance of the class.
+        The path functions, the logger and the schema of the class are restored on load from an instance
+        of the class; cached fragments are dropped. Leaf objects are pickled only for the leafs
+        assigned a YFilter, as they hold the previous value of the leaf.
+        The parent is not pickled, so that pickling an entity does not pickle the rest of its tree: the classes
+        and keys of the ancestors are pickled instead (see _get_ancestor_keys), and the entity is loaded under
+        copies of its ancestors holding only their keys. The parent of the children is restored on load.
+        """
+        template = _get_template(self.__class__).__dict__
+        state = {}
+        parent = self.__dict__.get('parent')
+        if parent is not None:
+            state[ANCESTORS_ATTRIBUTE] = _get_ancestor_keys(parent)
+        for name, value in self.__dict__.items():
+            if name in _UNPICKLED_ATTRIBUTES or name in _SHARED_ATTRIBUTES:
+                continue
+            if name == '_leafs':
+                leafs = {leaf_name: leaf for leaf_name, leaf in value.items()
+                         if isinstance(self.__dict__.get(leaf_name), YFilter)}
+                if leafs:
+                    state[name] = leafs
+            elif not _is_template_value(value, template.get(name, _MISSING)):
+                state[name] = value
+        return state
+
+    def __setstate__(self, state):
+        _copy_template(self, False)
+        leafs = state.pop('_leafs', None)
+        ancestors = state.pop(ANCESTORS_ATTRIBUTE, None)
+        self.__dict__.update(state)
+        if leafs:
+            self._leafs.update(leafs)
+        if ancestors is not None:
+            self.__dict__['parent'] = _get_ancestor_stub(ancestors)
+            _attach_to_stub(self.__dict__['parent'], self)
+        # the children were loaded before the entity, under copies of their ancestors
+        for value in state.values():
+            if isinstance(value, Entity):
+                value.__dict__['parent'] = self
+            elif isinstance(value, YList):
+                value.__dict__['parent'] = self
+                for entry in value:
+                    entry.__dict__['parent'] = self
+
+
+def create_entity(clazz):
+    """
+    Creates an entity of an Entity class as a copy of a new instance of the class, with its containers,
+    without running the __init__ of the generated classes; much faster for large trees
+
+    :param clazz: Entity class
+    """
+    entity = clazz.__new__(clazz)
+    _copy_template(entity, True)
+    return entity
+
+
+def _get_ancestor_keys(entity):
+    """
+    Returns the ancestor keys of entity, pickled instead of entity by its children: tuple(ancestor keys of
+    the parent or None, class, key values, ylist_key). They are cached on entity while its parent and its keys
+    are the same, so that the children of an entity pickle them once.
+
+    :param entity: Entity object
+    """
+    d = entity.__dict__
+    parent = d.get('parent')
+    parent_keys = _get_ancestor_keys(parent) if parent is not None else None
+    key_values = tuple(d[name] for name in d['ylist_key_names']) if d['ylist_key_names'] else None
+    ylist_key = d.get('ylist_key')
+    cached = d.get(ANCESTORS_ATTRIBUTE)
+    if cached is not None and cached[0] is parent_keys and cached[2] == key_values and cached[3] == ylist_key:
+        return cached
+    ancestor_keys = d[ANCESTORS_ATTRIBUTE] = (parent_keys, entity.__class__, key_values, ylist_key)
+    return ancestor_keys
+
+
+def _get_ancestor_stub(ancestor_keys):
+    """
+    Returns an entity holding the keys of an unpickled ancestor, under the entities of its own ancestors, so that
+    the path of an unpickled entity is the one of the pickled entity. The stubs are shared by the entities
+    loaded with the same ancestor keys.
+
+    :param ancestor_keys: tuple returned by _get_ancestor_keys
+    """
+    stub = _ancestor_stubs.get(id(ancestor_keys))
+    if stub is not None and stub.__dict__.get(ANCESTORS_ATTRIBUTE) is ancestor_keys:
+        return stub
+
+    parent_keys, clazz, key_values, ylist_key = ancestor_keys
+    stub = clazz.__new__(clazz)
+    _copy_template(stub, False)
+    d = stub.__dict__
+    if key_values is not None:
+        d.update(zip(d['ylist_key_names'], key_values))
+    d['ylist_key'] = ylist_key
+    if parent_keys is not None:
+        d['parent'] = _get_ancestor_stub(parent_keys)
+    # the keys are also the cache of _get_ancestor_keys when the entity is pickled again
+    d[ANCESTORS_ATTRIBUTE] = ancestor_keys
+    _ancestor_stubs[id(ancestor_keys)] = stub
+    return stub
+
+
+def _attach_to_stub(stub, entity, ylist=None):
+    """
+    Sets an unpickled entity as the child of the stub of its parent, so that encoding the entity from its
+    ancestors (e.g. the list entry holding a container in JSON) encodes it
+
+    :param stub: entity returned by _get_ancestor_stub
+    :param entity: child of stub
+    :param ylist: YList of entity, set as the YList of stub; entity is added to the YList of stub if None
+    """
+    for attr, clazz in stub._child_classes.values():
+        if clazz is entity.__class__:
+            child = stub.__dict__.get(attr)
+            if ylist is not None:
+                stub.__dict__[attr] = ylist
+            elif isinstance(child, YList):
+                child._entity_map[entity.__dict__.get('ylist_key')] = entity
+            else:
+                stub.__dict__[attr] = entity
+            return
+
+
+def _get_template(clazz):
+    """
+    Returns the instance of an entity class copied by create_entity and unpickled entities.
+    Templates are never modified.
+    """
+    template = _templates.get(clazz)
+    if template is None:
+        template = _templates[clazz] = clazz()
+    return template
+
+
+def _get_template_plan(clazz):
+    """
+    Returns the attributes of the template of an entity class grouped by the way they are copied:
+    tuple(template, dict of the values assigned as they are, path functions, containers,
+    YLists, leaf objects, values copied, values deep-copied)
+    """
+    plan = _template_plans.get(clazz)
+    if plan is not None:
+        return plan
+
+    template = _get_template(clazz)
+    constants, functions, children, ylists, leafs, copies, deep_copies = {}, [], [], [], [], [], []
+    for name, value in template.__dict__.items():
+        if name == 'parent':
+            constants[name] = None
+        elif isinstance(value, FunctionType):
+            functions.append((name, value))
+        elif isinstance(value, Entity):
+            constants[name] = None
+            children.append((name, value.__class__))
+        elif isinstance(value, YList):
+            ylists.append(name)
+        elif name == '_leafs':
+            leafs = list(value.items())
+        elif name in _SHARED_ATTRIBUTES:
+            constants[name] = value
+        elif isinstance(value, (list, dict)):
+            copies.append((name, value))
+        elif isinstance(value, Bits):
+            deep_copies.append((name, value))
+        else:
+            constants[name] = value
+    plan = _template_plans[clazz] = (template, constants, functions, children, ylists, leafs, copies, deep_copies)
+    return plan
+
+
+def _copy_template(entity, create_children):
+    """
+    Sets the attributes of entity to copies of the ones of the template of its class
+
+    :param entity: Entity object without attributes
+    :param create_children: creates the containers of entity; they are None otherwise
+    """
+    template, constants, functions, children, ylists, leafs, copies, deep_copies = \
+        _get_template_plan(entity.__class__)
+    d = entity.__dict__
+    d.update(constants)
+    for name, function in functions:
+        # the path functions are closures over the entity they were created for
+        d[name] = _rebind_function(function, template, entity)
+    if create_children:
+        for name, clazz in children:
+            child = create_entity(clazz)
+            child.__dict__['parent'] = entity
+            d[name] = child
+    for name in ylists:
+        d[name] = YList(entity)
+    d['_leafs'] = OrderedDict([(leaf_name, _copy_leaf(leaf)) for leaf_name, leaf in leafs])
+    for name, value in copies:
+        d[name] = value.copy()
+    for name, value in deep_copies:
+        d[name] = copy.deepcopy(value)
+
+
+def _copy_leaf(leaf):
+    """
+    Returns a new leaf object like the one of an entry of Entity._leafs
+    """
+    if isinstance(leaf, tuple):
+        return (_copy_leaf(leaf[0]),) + leaf[1:]
+    if isinstance(leaf, YLeaf):
+        return YLeaf(leaf.type, leaf.name)
+    if isinstance(leaf, YLeafList):
+        return YLeafList(leaf.ytype, leaf.name)
+    return copy.deepcopy(leaf)
+
+
+def _is_template_value(value, template_value):
+    """
+    Returns True if an attribute of an entity needs not be pickled, as its value is the one
+    of a new instance of the class
+    """
+    if template_value is _MISSING:
+        return False
+    if isinstance(value, Entity):
+        return False
+    if isinstance(value, YList):
+        return not len(value) and value.counter == template_value.counter
+    if value is template_value:
+        return True
+    return type(value) is type(template_value) and value == template_value
+
+
+def _rebind_function(function, template, entity):
+    """
+    Returns a copy of a function of template whose closure refers to entity instead of template
+    """
+    closure = function.__closure__
+    if closure:
+        closure = tuple(CellType(entity) if cell.cell_contents is template else cell for cell in closure)
+    return FunctionType(function.__code__, function.__globals__, function.__name__, function.__defaults__, closure)
+
+
+def invalidate_fragments(entity):
+    """
+    Drops the encoded fragments cached for entity and its ancestors (see Codec.encode(fragment_cache=True)).
+    Entities holding cached fragments are closed under descendants, so the walk stops
+    at the first ancestor without cached fragments.
+
+    :param entity: Entity object or None
+    """
+    while entity is not None and entity.__dict__.pop(FRAGMENTS_ATTRIBUTE, None) is not None:
+        entity = entity.__dict__.get('parent')
+
+
+def track_leaf_lists(entity):
+    """
+    Replaces the leaf-list values of entity by lists which drop the fragments of entity and its ancestors
+    when they are changed in place (append, extend, item assignment, ..). Called when entity is marked as
+    being below a cached fragment; the values assigned later are tracked when entity is marked again.
+
+    :param entity: Entity object
+    """
+    d = entity.__dict__
+    for name in d['_leafs']:
+        value = d.get(name)
+        if isinstance(value, list) and not (value.__class__ is _TrackedLeafList and value.entity is entity):
+            d[name] = _TrackedLeafList(value, entity)
+
+
+class _TrackedLeafList(list):
+    """
+    Leaf-list value of an entity holding cached fragments, see track_leaf_lists.
+    It is pickled and copied as a plain list.
+    """
+    __slots__ = ('entity',)
+
+    def __init__(self, values, entity):
+        super().__init__(values)
+        self.entity = entity
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def append(self, value):
+        invalidate_fragments(self.entity)
+        super().append(value)
+
+    def extend(self, values):
+        invalidate_fragments(self.entity)
+        super().extend(values)
+
+    def insert(self, index, value):
+        invalidate_fragments(self.entity)
+        super().insert(index, value)
+
+    def remove(self, value):
+        invalidate_fragments(self.entity)
+        super().remove(value)
+
+    def pop(self, index=-1):
+        invalidate_fragments(self.entity)
+        return super().pop(index)
+
+    def clear(self):
+        invalidate_fragments(self.entity)
+        super().clear()
+
+    def sort(self, *, key=None, reverse=False):
+        invalidate_fragments(self.entity)
+        super().sort(key=key, reverse=reverse)
+
+    def reverse(self):
+        invalidate_fragments(self.entity)
+        super().reverse()
+
+    def __setitem__(self, index, value):
+        invalidate_fragments(self.entity)
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        invalidate_fragments(self.entity)
+        super().__delitem__(index)
+
+    def __iadd__(self, values):
+        invalidate_fragments(self.entity)
+        return super().__iadd__(values)
+
+    def __imul__(self, count):
+        invalidate_fragments(self.entity)
+        return super().__imul__(count)
+
+
+def get_leaf_name_data(leaf_tuple, name, value, logger):
+    """
+    Returns the list of tuple(leaf_name, LeafData) of a leaf or leaf-list attribute of an entity.
+    The leaf object is updated with the value, as in Entity.get_name_leaf_data.
+
+    :param leaf_tuple: entry of Entity._leafs for the attribute
+    :param name: attribute name
+    :param value: attribute value
+    :param logger: logger of the entity
+    """
+    leaf = _get_leaf_object(leaf_tuple)
+    if isinstance(value, YFilter):
+        logger.debug(f"YFilter assigned to '{name}', '{value}'")
+        leaf.yfilter = value
+        if isinstance(leaf, YLeaf):
+            return [leaf.get_name_leafdata()]
+        elif isinstance(leaf, YLeafList):
+            return leaf.get_name_leafdata()
+    elif value is not None and not isinstance(value, list):
+        leaf.set(value)
+        return [leaf.get_name_leafdata()]
+    elif isinstance(value, list) and value:
+        leaf_list = YLeafList(YType.str, leaf.name)
+        for item in value:
+            _validate_value(leaf_tuple, name, item, logger)
+            if isinstance(item, bool):
+                item = 'true' if item is True else 'false'
+            leaf_list.append(item)
+        return leaf_list.get_name_leafdata()
+    return []
+
 
 def get_entity_path(entity, parent=None):
     """
@@ -882,7 +1261,7 @@ class EntityCollection(object):
         return list(self._entity_map.keys())
 
     def has_key(self, key):
-        return key in self.keys()
+        return key in self._entity_map
 
     def get(self, item):
         return self.__getitem__(item)
@@ -993,6 +1372,23 @@ class YList(EntityCollection):
                 e.yfilter = value
         super().__setattr__(name, value)
 
+    def __getstate__(self):
+        """
+        Returns the state pickled for the YList; its parent is pickled as its ancestor keys, see Entity.__getstate__
+        """
+        state = self.__dict__.copy()
+        if self.parent is not None:
+            state['parent'] = _get_ancestor_keys(self.parent)
+        return state
+
+    def __setstate__(self, state):
+        if state['parent'] is not None:
+            state['parent'] = _get_ancestor_stub(state['parent'])
+        self.__dict__.update(state)
+        entries = self.entities()
+        if self.parent is not None and entries:
+            _attach_to_stub(self.parent, entries[0], self)
+
     def _key(self, entity):
         key_list = []
         if hasattr(entity, 'ylist_key_names'):
@@ -1017,6 +1413,7 @@ class YList(EntityCollection):
         return key
 
     def append(self, entity):
+        invalidate_fragments(self.parent)
         entity.parent = self.parent
         if entity is None:
             self._log_error_and_raise_exception(
@@ -1037,8 +1434,13 @@ class YList(EntityCollection):
         """
         Deletes all the members of collection
         """
+        invalidate_fragments(self.parent)
         self._entity_map.clear()
 
+    def pop(self, item=None):
+        invalidate_fragments(self.parent)
+        return super().pop(item)
+
     def keys(self):
         return list(self._entity_map.keys())
 
@@ -1211,8 +1613,7 @@ def _validate_other_type_value_object(typ, value):
         return True
     if typ == 'int' and isinstance(value, int):
         return True
-    typ = eval(typ)
-    return isinstance(value, typ)
+    return isinstance(value, _get_other_type_class(typ))
 
 
 def _decode_other_type_value_object(typ, value):
@@ -1221,7 +1622,7 @@ def _decode_other_type_value_object(typ, value):
         return True if value == 'true' else False
     elif typ == 'Empty':
         return Empty()
-    typ = eval(typ)
+    typ = _get_other_type_class(typ)
     try:
         value_object = typ(value)
     except:
@@ -1229,6 +1630,16 @@ def _decode_other_type_value_object(typ, value):
     return value_object
 
 
+def _get_other_type_class(typ):
+    """
+    Returns the class named by a type of Entity._leafs, e.g. 'int' or 'Decimal64'; evaluated once per name
+    """
+    clazz = _other_type_classes.get(typ)
+    if clazz is None:
+        clazz = _other_type_classes[typ] = eval(typ)
+    return clazz
+
+
 def _get_leaf_object(leaf):
     # Backward compatibility
     if isinstance(leaf, tuple):
@@ -1,8 +1,12 @@
 import re
 import importlib
 from yangkit.utilities.logger import log
+from yangkit.utilities import schema_index
 from yangkit.errors import YInvalidArgumentError
 
+_KEY_PREDICATE = re.compile(r"""\[([^\[\]=]+)=(?:'([^']*)'|"([^"]*)"|([^\]]*))\]""")
+_BOOLEAN_KEYS = {'true': 'True', 'false': 'False'}
+
 
 def segmentalize(absolute_path):
     """
@@ -38,15 +42,12 @@ def get_internal_node(entity, absolute_path):
 
     for segment in segments[1:]:
         if '[' in segment:
-            attr, child = entity.get_child_by_name(segment.split('[')[0], "")
+            yang_name, key_values = parse_key_predicates(segment)
+            attr, child = entity.get_child_by_name(yang_name, "")
             ylist = getattr(entity, attr)
 
-            found = False
-            for ylist_item in ylist:
-                if ylist_item.ylist_key_names and ylist_item.get_segment_path() == segment:
-                    found = True
-                    break
-            if found:
+            ylist_item = _find_ylist_entry(ylist, key_values)
+            if ylist_item is not None:
                 entity = ylist_item
             elif segment == segments[-1]:
                 # fair assumption
@@ -59,6 +60,84 @@ def get_internal_node(entity, absolute_path):
     return entity
 
 
+def parse_key_predicates(segment):
+    """
+    Splits a list segment into YANG name and key values.
+    Quoted (name='v', name="v") and unquoted (name=v) predicates are supported.
+
+    :param segment: segment path, e.g. "address[ip='10.0.0.1'][prefix-len='24']"
+    :return (yang_name, [key_value, ..]); key values are empty for keyless list entries
+    """
+    yang_name, key_items = parse_key_predicate_items(segment)
+    return yang_name, [key_value for _, key_value in key_items]
+
+
+def parse_key_predicate_items(segment):
+    """
+    Splits a list segment into YANG name and key name/value pairs
+
+    :param segment: segment path, e.g. "address[ip='10.0.0.1'][prefix-len='24']"
+    :return (yang_name, [(key_name, key_value), ..])
+    """
+    yang_name = segment.split('[', 1)[0]
+    key_items = []
+    for match in _KEY_PREDICATE.finditer(segment, len(yang_name)):
+        key_name, single_quoted, double_quoted, unquoted = match.group(1, 2, 3, 4)
+        if single_quoted is not None:
+            key_items.append((key_name.strip(), single_quoted))
+        elif double_quoted is not None:
+            key_items.append((key_name.strip(), double_quoted))
+        else:
+            key_items.append((key_name.strip(), unquoted))
+    return yang_name, key_items
+
+
+def _find_ylist_entry(ylist, key_values):
+    """
+    Returns the YList entry stored under key_values or None.
+    Keys are built the same way as YList._key, so the lookup is a single dict access.
+    Keyless list entries are positional and never match.
+
+    :param ylist: YList object
+    :param key_values: key values as returned by parse_key_predicates
+    """
+    non_empty_values = [value for value in key_values if value]
+    if not non_empty_values:
+        return None
+
+    candidates = [non_empty_values]
+    # boolean keys are formatted as 'true'/'false' in paths but stored as 'True'/'False'
+    if any(value in _BOOLEAN_KEYS for value in non_empty_values):
+        candidates.append([_BOOLEAN_KEYS.get(value, value) for value in non_empty_values])
+
+    for values in candidates:
+        key = values[0] if len(values) == 1 else tuple(values)
+        if ylist.has_key(key):
+            ylist_item = ylist[key]
+            if ylist_item.ylist_key_names:
+                return ylist_item
+    return None
+
+
+def get_ylist_entry(ylist):
+    """
+    Returns a new entry of ylist, whose parent is the parent of ylist. The entry is not appended to ylist.
+
+    :param ylist: YList object
+    """
+    parent = ylist.parent
+    if parent is not None:
+        for _, (attr, clazz) in parent._child_classes.items():
+            if parent.__dict__.get(attr) is ylist:
+                entry = clazz()
+                entry.parent = parent
+                return entry
+
+    err_msg = "YList is not a child of its parent"
+    log.error(err_msg)
+    raise YInvalidArgumentError(err_msg)
+
+
 def get_bundle_name(entity):
     """
     This method finds the bundle name for provided entity object
@@ -89,15 +168,51 @@ def get_top_level_class(entity):
     :param entity: Entity object
     """
     segments = segmentalize(entity.get_absolute_path())
-    root_segment_path = segments[0]
+    return get_top_level_class_of_path(get_bundle_name(entity), segments[0])
+
+
+def get_top_level_class_of_path(bundle_name, absolute_path):
+    """
+    Returns a new instance of the top level container class of absolute_path
+
+    :param bundle_name: bundle name
+    :param absolute_path: absolute path, e.g. "Cisco-IOS-XR-ifmgr-cfg:interface-configurations/.."
+    """
+    root_segment_path = segmentalize(absolute_path)[0]
+
+    top_entity = None
+    if root_segment_path.count(":") == 1:
+        root_parent_name, root_name = root_segment_path.split(":")
+        top_entity = get_top_level_class_of_name(bundle_name, root_parent_name, root_name)
+    if top_entity is None:
+        err_msg = f"'{root_segment_path}' is not a top level container in bundle '{bundle_name}'"
+        log.error(err_msg)
+        raise YInvalidArgumentError(err_msg)
+    return top_entity
+
+
+def get_top_level_class_of_name(bundle_name, module_or_namespace, yang_name):
+    """
+    Returns a new instance of a top level container class, looked up in the bundle's schema index,
+    or in its ENTITY_LOOKUP for a namespace or a bundle without schema index;
+    None if the bundle has no such container
+
+    :param bundle_name: bundle name
+    :param module_or_namespace: YANG module name or XML namespace of the container, e.g. "Cisco-IOS-XR-ifmgr-cfg"
+    :param yang_name: YANG name of the container, e.g. "interface-configurations"
+    """
+    bundle_schema_index = schema_index.get_schema_index(bundle_name)
+    if bundle_schema_index is not None:
+        path = f'{module_or_namespace}:{yang_name}'
+        if bundle_schema_index.get_node(path) is not None:
+            return bundle_schema_index.get_class(path)()
 
-    # fetching bundle name and corresponding _yang_ns module
-    bundle_name = get_bundle_name(entity)
     bundle_yang_ns = get_bundle_yang_ns(bundle_name)
+    try:
+        module_name, clazz_name = bundle_yang_ns.ENTITY_LOOKUP[(module_or_namespace, yang_name)].split('.')
+    except (AttributeError, ValueError, KeyError):
+        return None
 
-    root_parent_name, root_name = root_segment_path.split(":")
-    module_name, clazz_name = bundle_yang_ns.ENTITY_LOOKUP[(root_parent_name,
-                                                            root_name)].split('.')
     clazz = getattr(importlib.import_module(
         f'yangkit.models.{bundle_name}.{module_name}'), clazz_name)
     return clazz()
@@ -113,10 +228,28 @@ def find_prefix_in_namespace_lookup(segment_path, bundle_yang_ns):
     """
     try:
         prefix, _ = re.split(r":(?![^\[]*\])", segment_path)
-        for name_space_prefix, name_space in bundle_yang_ns.NAMESPACE_LOOKUP.items():
-            if prefix == name_space_prefix:
-                return name_space_prefix, name_space
+        if prefix in bundle_yang_ns.NAMESPACE_LOOKUP:
+            return prefix, bundle_yang_ns.NAMESPACE_LOOKUP[prefix]
     except:
         pass
 
     return None, None
+
+
+def find_prefix_of_namespace(name_space, bundle_yang_ns):
+    """
+    Returns the prefix (module name) of a namespace in the bundle's YANG namespace lookup
+
+    :param name_space: XML namespace
+    :param bundle_yang_ns: YANG namespace module for the bundle
+    :return prefix if the namespace is present in the namespace_lookup; None otherwise
+    """
+    namespace_prefix_lookup = getattr(bundle_yang_ns, 'NAMESPACE_PREFIX_LOOKUP', None)
+    if namespace_prefix_lookup is not None:
+        return namespace_prefix_lookup.get(name_space)
+
+    # bundles generated without the reverse index
+    for name_space_prefix, ns in bundle_yang_ns.NAMESPACE_LOOKUP.items():
+        if ns == name_space:
+            return name_space_prefix
+    return None
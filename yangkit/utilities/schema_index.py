@@ -0,0 +1,147 @@
+import marshal
+import pkgutil
+import importlib
+from functools import reduce
+from collections import namedtuple
+from yangkit.utilities.logger import log
+# imported as a module, as yangkit.utilities.entity resolves the top-level classes with the schema index
+from yangkit.utilities import entity as _entity
+from yangkit.errors import YInvalidArgumentError
+
+SCHEMA_INDEX_FILE = '_schema_index.marshal'
+SCHEMA_INDEX_VERSION = 1
+
+SchemaNode = namedtuple('SchemaNode', ['path', 'py_mod_name', 'clazz_name', 'keyword', 'module_name',
+                                       'namespace', 'keys', 'leafs', 'children'])
+SchemaLeaf = namedtuple('SchemaLeaf', ['name', 'attr', 'ytype', 'is_leaf_list'])
+
+_schema_indexes = {}
+
+
+class SchemaIndex(object):
+    """
+    Compiled schema of a bundle, generated as yangkit/models/<bundle>/_schema_index.marshal.
+    Paths are resolved in O(depth) without importing or instantiating model classes.
+    """
+
+    def __init__(self, bundle_name, nodes):
+        self.bundle_name = bundle_name
+        self._nodes = nodes
+        self._resolved = {}
+
+    def __contains__(self, path):
+        return self.get_node(path) is not None
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def paths(self):
+        """
+        Returns the list of all schema paths in the bundle
+        """
+        return list(self._nodes.keys())
+
+    def get_node(self, path):
+        """
+        Returns SchemaNode for a container or list path; None if the path is not in the schema.
+        Key predicates in path are ignored, e.g. "a:b/c[name='x']/d" resolves "a:b/c/d".
+
+        :param path: absolute path or schema path
+        """
+        schema_path = to_schema_path(path)
+        node = self._resolved.get(schema_path)
+        if node is None:
+            record = self._nodes.get(schema_path)
+            if record is None:
+                return None
+            node = SchemaNode(schema_path, *record)
+            self._resolved[schema_path] = node
+        return node
+
+    def get_leaf(self, path):
+        """
+        Returns SchemaLeaf for a leaf or leaf-list path; None if the path is not in the schema.
+
+        :param path: absolute path of the leaf, e.g. "a:b/c[name='x']/mtu"
+        """
+        segments = _entity.segmentalize(path)
+        if len(segments) < 2:
+            return None
+        node = self.get_node('/'.join(segments[:-1]))
+        if node is None:
+            return None
+        leaf_name = segments[-1].split('[')[0]
+        leaf = node.leafs.get(leaf_name)
+        if leaf is None:
+            return None
+        return SchemaLeaf(leaf_name, *leaf)
+
+    def validate_path(self, path):
+        """
+        Returns SchemaNode or SchemaLeaf for path and raises YInvalidArgumentError if path is not in the schema.
+
+        :param path: absolute path
+        """
+        schema_object = self.get_node(path) or self.get_leaf(path)
+        if schema_object is None:
+            err_msg = f"'{path}' is not a valid schema path in bundle '{self.bundle_name}'"
+            log.error(err_msg)
+            raise YInvalidArgumentError(err_msg)
+        return schema_object
+
+    def get_class(self, path):
+        """
+        Returns the generated class of a container or list path.
+        Only the python module holding the class is imported.
+
+        :param path: absolute path
+        """
+        node = self.validate_path(path)
+        if not isinstance(node, SchemaNode):
+            err_msg = f"'{path}' is a leaf, not a container or list"
+            log.error(err_msg)
+            raise YInvalidArgumentError(err_msg)
+        return reduce(getattr, node.clazz_name.split('.'), importlib.import_module(node.py_mod_name))
+
+
+def to_schema_path(path):
+    """
+    Strips key predicates from all the segments of path
+
+    :param path: absolute path
+    """
+    if '[' not in path:
+        return path
+    return '/'.join(segment.split('[')[0] for segment in _entity.segmentalize(path))
+
+
+def get_schema_index(bundle_name):
+    """
+    Returns SchemaIndex for provided bundle; None if the bundle was generated without a schema index.
+    The index is loaded once per process.
+
+    :param bundle_name: bundle name
+    """
+    if bundle_name in _schema_indexes:
+        return _schema_indexes[bundle_name]
+
+    schema_index = None
+    package = f'yangkit.models.{bundle_name}'
+    try:
+        data = pkgutil.get_data(package, SCHEMA_INDEX_FILE)
+    except ImportError as error:
+        log.error(f"Schema index of {package} errored: {error}")
+    except OSError:
+        # bundles generated without a schema index are resolved by their ENTITY_LOOKUP
+        log.debug(f"Schema index of {package} not found")
+    else:
+        content = marshal.loads(data) if data else {}
+        if not content:
+            log.error(f"Schema index of {package} not found")
+        elif content.get('version') != SCHEMA_INDEX_VERSION:
+            log.error(f"Schema index of {package} has unsupported version {content.get('version')}")
+        else:
+            schema_index = SchemaIndex(bundle_name, content['nodes'])
+
+    _schema_indexes[bundle_name] = schema_index
+    return schema_index
@@ -0,0 +1,87 @@
+import importlib
+from abc import abstractmethod
+from collections.abc import Mapping
+from yangkit.utilities.logger import log
+
+SHARDS_PACKAGE = '_yang_ns_shards'
+
+
+class ShardedLookup(Mapping):
+    """
+    Read-only lookup table of a bundle's _yang_ns module, split into one shard per YANG module.
+    A shard module is imported the first time one of its keys is looked up,
+    so only the tables of the modules actually used are loaded.
+
+    Iterating or taking len() loads all the shards.
+    """
+
+    def __init__(self, package, table_name, shards, namespace_prefix_lookup):
+        """
+        :param package: package of the bundle, e.g. 'yangkit.models.cisco_ios_xr'
+        :param table_name: name of the table in the shard modules, e.g. 'ENTITY_LOOKUP'
+        :param shards: dict{module_name: shard_module_name}
+        :param namespace_prefix_lookup: dict{namespace: module_name}
+        """
+        self._package = package
+        self._table_name = table_name
+        self._shards = shards
+        self._namespace_prefix_lookup = namespace_prefix_lookup
+        self._loaded = {}
+
+    @abstractmethod
+    def _get_module_name(self, key):
+        """
+        Returns the name of the YANG module whose shard holds key; None if key cannot be in the table
+        """
+
+    def _get_shard(self, module_name):
+        shard = self._loaded.get(module_name)
+        if shard is None:
+            shard_name = self._shards.get(module_name)
+            if shard_name is None:
+                return None
+            shard_path = f'{self._package}.{SHARDS_PACKAGE}.{shard_name}'
+            log.debug(f"Loading {self._table_name} shard {shard_path}")
+            shard = getattr(importlib.import_module(shard_path), self._table_name)
+            self._loaded[module_name] = shard
+        return shard
+
+    def __getitem__(self, key):
+        module_name = self._get_module_name(key)
+        shard = self._get_shard(module_name) if module_name is not None else None
+        if shard is None:
+            raise KeyError(key)
+        return shard[key]
+
+    def __iter__(self):
+        for module_name in self._shards:
+            yield from self._get_shard(module_name)
+
+    def __len__(self):
+        return sum(len(self._get_shard(module_name)) for module_name in self._shards)
+
+
+class EntityLookup(ShardedLookup):
+    """
+    ENTITY_LOOKUP: {(namespace or module_name, top-level yang_name): 'module.Class'}
+    """
+
+    def _get_module_name(self, key):
+        try:
+            module_or_namespace = key[0]
+        except (TypeError, IndexError):
+            return None
+        if module_or_namespace in self._shards:
+            return module_or_namespace
+        return self._namespace_prefix_lookup.get(module_or_namespace)
+
+
+class IdentityLookup(ShardedLookup):
+    """
+    IDENTITY_LOOKUP: {'module_name:identity': (python module, class name)}
+    """
+
+    def _get_module_name(self, key):
+        if not isinstance(key, str) or ':' not in key:
+            return None
+        return key.split(':', 1)[0]